@@ -0,0 +1,150 @@
+"""
+    Access log recorder of the Web service 'Article Gate': a sample of
+    served requests is written as JSON Lines, one request per line,
+    for replay by `app/replay.py`. Every worker process writes its own file.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+import urllib.parse
+
+# Query parameters never written to the log.
+REDACTED_PARAMS = frozenset(("password", "client_secret"))
+
+
+def redact_query(query: str) -> str:
+    """
+        Query string without secret parameters.
+    """
+    if not query:
+        return query
+    pairs = urllib.parse.parse_qsl(query, keep_blank_values=True)
+    return urllib.parse.urlencode([(key, value) for key, value in pairs
+                                   if key not in REDACTED_PARAMS])
+
+
+def worker_path(path: str, pid: int) -> str:
+    """
+        Log file of worker process `pid`: 'access.jsonl' -> 'access.<pid>.jsonl'.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.{pid}{ext}"
+
+
+class AccessLogRecorder:
+    """
+        Writes every request with probability `sample_rate` to JSON Lines
+        file `path` with the process ID in its name, so workers never
+        append to one file. Records are buffered and appended `buffer_size`
+        at a time in a worker thread, so the log costs one write per batch
+        instead of one per request and never blocks the event loop.
+    """
+
+    def __init__(self, path: str, sample_rate: float = 1.0, buffer_size: int = 100,
+                 seed=None):
+        self.path = worker_path(path, os.getpid())
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self.recorded = 0
+        self.skipped = 0
+        self._random = random.Random(seed)
+        self._buffer = []
+        self._write_lock = asyncio.Lock()
+        self._writes = set()
+
+    def sampled(self) -> bool:
+        """
+            Decide whether the next request is recorded.
+        """
+        if self.sample_rate >= 1.0 or self._random.random() < self.sample_rate:
+            return True
+        self.skipped += 1
+        return False
+
+    def record(self, entry: dict):
+        """
+            Add a request to the log.
+        """
+        self.recorded += 1
+        self._buffer.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        if len(self._buffer) >= self.buffer_size:
+            lines, self._buffer = self._buffer, []
+            task = asyncio.create_task(self._write(lines))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    def _append(self, lines: list[str]):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.writelines(lines)
+
+    async def _write(self, lines: list[str]):
+        """
+            Append records in a thread. Batches are written in order.
+        """
+        async with self._write_lock:
+            await asyncio.to_thread(self._append, lines)
+
+    async def flush(self):
+        """
+            Append buffered records and wait for batches being written.
+        """
+        lines, self._buffer = self._buffer, []
+        if lines:
+            await self._write(lines)
+        await asyncio.gather(*self._writes)
+
+    def snapshot(self) -> dict:
+        """
+            Current state for the metrics endpoint.
+        """
+        return {
+            "path": self.path,
+            "sample_rate": self.sample_rate,
+            "recorded": self.recorded,
+            "skipped": self.skipped,
+        }
+
+
+class AccessLogMiddleware:
+    """
+        ASGI middleware recording sampled HTTP requests with their
+        status and latency to AccessLogRecorder.
+    """
+
+    def __init__(self, app, recorder: AccessLogRecorder, exempt_paths=()):
+        self.app = app
+        self.recorder = recorder
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["path"] in self.exempt_paths
+                or not self.recorder.sampled()):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+        stamp = time.time()
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, recording_send)
+        finally:
+            route = scope.get("route")
+            self.recorder.record({
+                "ts": round(stamp, 6),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", scope["path"]),
+                "query": redact_query(scope["query_string"].decode("latin-1")),
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            })
@@ -0,0 +1,279 @@
+"""
+    Admission control of the Web service 'Article Gate':
+    per-client and per-route token buckets and a bounded
+    number of in-flight DB requests.
+"""
+
+import asyncio
+import collections
+import json
+import math
+import time
+
+from starlette.routing import Match
+
+
+class TokenBucket:
+    """
+        Classic token bucket refilled with `rate` tokens per second
+        up to `capacity` tokens.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def wait(self, now: float) -> float:
+        """
+            Seconds until a token is available, 0 if it is available now.
+            No token is taken.
+        """
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self, now: float) -> float:
+        """
+            Take one token. Returns 0 on success or
+            the number of seconds until a token is available.
+        """
+        if self.wait(now) == 0.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class BucketRegistry:
+    """
+        Token buckets by key. Least recently used buckets are
+        evicted so the registry can not grow without bound.
+    """
+
+    def __init__(self, rate: float, capacity: float, max_keys: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def wait(self, key: str, now: float) -> float:
+        """
+            Seconds until the bucket of `key` has a token, nothing is taken.
+            Keys without a bucket have a full one.
+        """
+        bucket = self._buckets.get(key)
+        return 0.0 if bucket is None else bucket.wait(now)
+
+    def take(self, key: str, now: float) -> float:
+        """
+            Take one token from the bucket of `key`.
+        """
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+
+class AdmissionController:
+    """
+        Decides whether a request may be processed right now.
+        Rate limits are checked first (429), then the request
+        waits for one of `max_inflight` slots in a bounded queue (503).
+    """
+
+    def __init__(self, *,
+                 max_inflight: int,
+                 max_queue: int,
+                 queue_timeout: float,
+                 client_rate: float,
+                 client_burst: float,
+                 route_rate: float,
+                 route_burst: float,
+                 max_clients: int = 10000,
+                 max_routes: int = 1000,
+                 clock=time.monotonic):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.clients = BucketRegistry(client_rate, client_burst, max_clients)
+        self.routes = BucketRegistry(route_rate, route_burst, max_routes)
+        self.clock = clock
+
+        self.inflight = 0
+        self._waiters = collections.deque()
+        self.counters = collections.Counter()
+
+    @property
+    def queued(self) -> int:
+        """
+            Number of requests waiting for a slot.
+        """
+        return sum(1 for fut in self._waiters if not fut.done())
+
+    def check_rate(self, client: str, route: str) -> tuple[int, float]:
+        """
+            Check rate limits of the client and of the route.
+            Tokens are taken only when both limits pass, so a request
+            rejected by one limit does not use up the other.
+            Returns (0, 0) on success or (429, retry_after).
+        """
+        now = self.clock()
+        wait = self.clients.wait(client, now)
+        if wait > 0:
+            self.counters["rejected_client_rate"] += 1
+            return 429, wait
+        wait = self.routes.wait(route, now)
+        if wait > 0:
+            self.counters["rejected_route_rate"] += 1
+            return 429, wait
+        self.clients.take(client, now)
+        self.routes.take(route, now)
+        return 0, 0.0
+
+    async def acquire(self) -> bool:
+        """
+            Acquire an in-flight slot. Returns False when
+            the request has to be shed.
+        """
+        if self.inflight < self.max_inflight and self.queued == 0:
+            self._waiters.clear()
+            self.inflight += 1
+            self.counters["admitted"] += 1
+            return True
+
+        if self.queued >= self.max_queue:
+            self.counters["shed_queue_full"] += 1
+            return False
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait({fut}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                fut.cancel()
+            raise
+
+        if fut.done() and not fut.cancelled():
+            self.counters["admitted"] += 1
+            self.counters["admitted_after_wait"] += 1
+            return True
+
+        fut.cancel()
+        self.counters["shed_queue_timeout"] += 1
+        return False
+
+    def release(self):
+        """
+            Release an in-flight slot, handing it over
+            to the oldest waiting request if there is one.
+        """
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(True)
+                return
+        self.inflight -= 1
+
+    def snapshot(self) -> dict:
+        """
+            Current state for the metrics endpoint.
+        """
+        return {
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "tracked_clients": len(self.clients),
+            "tracked_routes": len(self.routes),
+            **self.counters,
+        }
+
+
+def route_template(routes, scope) -> str:
+    """
+        Path template of the route matching the request,
+        so all requests of one endpoint share a route bucket.
+    """
+    partial = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or "<unmatched>"
+
+
+class AdmissionMiddleware:
+    """
+        ASGI middleware applying AdmissionController to HTTP requests.
+        Route limits are keyed by the path template of the matching route
+        of `router`, or by the request path when no router is given.
+    """
+
+    def __init__(self, app, controller: AdmissionController, exempt_paths=(), router=None):
+        self.app = app
+        self.controller = controller
+        self.exempt_paths = frozenset(exempt_paths)
+        self.router = router
+
+    def route_key(self, scope) -> str:
+        """
+            Key of the route bucket of the request.
+        """
+        if self.router is None:
+            return scope["path"]
+        return route_template(self.router.routes, scope)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope["client"][0] if scope.get("client") else "unknown"
+        status, retry_after = self.controller.check_rate(client, self.route_key(scope))
+        if status:
+            await self._reject(send, status, retry_after, "Too many requests")
+            return
+
+        if not await self.controller.acquire():
+            retry_after = self.controller.queue_timeout
+            await self._reject(send, 503, retry_after, "Service is overloaded")
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    @staticmethod
+    async def _reject(send, status: int, retry_after: float, detail: str):
+        """
+            Send error response with Retry-After header.
+        """
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,697 @@
+"""
+    Analytics snapshot of the Web service 'Article Gate': the catalogue tables
+    are kept as Parquet files and ad-hoc read-only SQL queries run on them with
+    DuckDB, apart from the SQLite shards serving online requests.
+    With a refresh schedule, triggers on every shard record keys of changed
+    rows, so a refresh reads only those rows and appends them as a delta part;
+    without one every refresh rebuilds the snapshot and shards carry no
+    triggers. Parts are merged on read and compacted into one base part
+    per shard. One process at a time
+    refreshes a snapshot directory. Run from the `src` directory:
+    `python -m app.analytics refresh`, `python -m app.analytics query "SELECT ..."`.
+    DuckDB is an optional dependency (`duckdb` package).
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import importlib.util
+import os
+import re
+import sqlite3
+import time
+import uuid
+
+from . import config
+from .backup import copy_database, database_path
+from .periodic import FileLock, PeriodicTask
+from .sharding import ShardRouter
+
+CHANGE_TABLE = "analytics_change"
+PART_SUFFIX = ".parquet"
+# Parts are named '<shard>-<version>-<kind>-<writer>.parquet', where
+# the random writer suffix keeps names of different processes apart.
+PART_NAME = re.compile(
+    r"^(?P<shard>.+)-(?P<version>\d{10})-(?P<kind>base|delta)-[0-9a-f]{8}\.parquet$")
+# Lock files in the snapshot directory: refresh in progress,
+# owner of the refresh schedule.
+REFRESH_LOCK_FILE = ".refresh.lock"
+SCHEDULE_LOCK_FILE = ".schedule.lock"
+
+
+@dataclasses.dataclass(frozen=True)
+class SnapshotTable:
+    """
+        Catalogue table in the snapshot. `select` reads integer `keys` of the
+        source rows (alias `src`) followed by the public `columns`.
+    """
+
+    name: str
+    keys: tuple
+    columns: dict
+    select: str
+
+
+TABLES = (
+    SnapshotTable(
+        "article", ("id",),
+        {"doi": "VARCHAR", "title": "VARCHAR", "posting_date": "VARCHAR"},
+        "SELECT src.id, src.doi, src.title, src.posting_date FROM article AS src",
+    ),
+    SnapshotTable(
+        "author", ("id",),
+        {"id": "BIGINT", "name": "VARCHAR", "affiliation_org_id": "BIGINT"},
+        "SELECT src.id, src.id, src.name, src.affiliation_org_id FROM author AS src",
+    ),
+    SnapshotTable(
+        "organisation", ("id",),
+        {"id": "BIGINT", "title": "VARCHAR", "location": "VARCHAR"},
+        "SELECT src.id, src.id, src.title, src.location FROM organisation AS src",
+    ),
+    # Article keys are local to a shard, bindings are shown with the DOI.
+    SnapshotTable(
+        "article_to_author", ("article_id", "author_id"),
+        {"doi": "VARCHAR", "author_id": "BIGINT", "place": "INTEGER"},
+        "SELECT src.article_id, src.author_id, article.doi, src.author_id, src.place "
+        "FROM article_to_author AS src JOIN article ON article.id = src.article_id",
+    ),
+)
+
+CHANGE_TABLE_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {CHANGE_TABLE} (
+        seq INTEGER PRIMARY KEY,
+        table_name TEXT NOT NULL,
+        key1 INTEGER NOT NULL,
+        key2 INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (table_name, key1, key2)
+    )"""
+
+
+def _key_values(table: SnapshotTable, row: str) -> str:
+    keys = [f"{row}.{key}" for key in table.keys] + ["0"] * (2 - len(table.keys))
+    return f"'{table.name}', {', '.join(keys)}"
+
+
+def capture_triggers(table: SnapshotTable) -> dict[str, str]:
+    """
+        Triggers recording keys of inserted, updated and deleted rows.
+        Updates record both keys, as merges of authors re-key bindings.
+    """
+    insert = f"INSERT OR REPLACE INTO {CHANGE_TABLE} (table_name, key1, key2) VALUES"
+    return {
+        f"analytics_{table.name}_ai": f"""
+            CREATE TRIGGER IF NOT EXISTS analytics_{table.name}_ai
+            AFTER INSERT ON {table.name} BEGIN
+                {insert} ({_key_values(table, "NEW")});
+            END""",
+        f"analytics_{table.name}_au": f"""
+            CREATE TRIGGER IF NOT EXISTS analytics_{table.name}_au
+            AFTER UPDATE ON {table.name} BEGIN
+                {insert} ({_key_values(table, "OLD")});
+                {insert} ({_key_values(table, "NEW")});
+            END""",
+        f"analytics_{table.name}_ad": f"""
+            CREATE TRIGGER IF NOT EXISTS analytics_{table.name}_ad
+            AFTER DELETE ON {table.name} BEGIN
+                {insert} ({_key_values(table, "OLD")});
+            END""",
+    }
+
+
+TRIGGERS = {name: sql for table in TABLES for name, sql in capture_triggers(table).items()}
+
+
+def available() -> bool:
+    """
+        DuckDB is installed.
+    """
+    return importlib.util.find_spec("duckdb") is not None
+
+
+def _duckdb():
+    """
+        Import DuckDB, LookupError when it is not installed.
+    """
+    if not available():
+        raise LookupError("Analytics engine 'duckdb' is not installed")
+    import duckdb  # pylint: disable=import-outside-toplevel
+    return duckdb
+
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def capture_installed(conn: sqlite3.Connection) -> bool:
+    """
+        Change table and all capture triggers exist in the database.
+    """
+    names = {name for name, in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    return CHANGE_TABLE in names and set(TRIGGERS) <= names
+
+
+def install_capture(conn: sqlite3.Connection):
+    """
+        Create change table and capture triggers.
+    """
+    with conn:
+        conn.execute(CHANGE_TABLE_DDL)
+        for statement in TRIGGERS.values():
+            conn.execute(statement)
+
+
+def remove_capture(conn: sqlite3.Connection) -> bool:
+    """
+        Drop capture triggers and change table, if any of them exists.
+        Returns True if something was dropped.
+    """
+    names = {name for name, in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    if not names & {CHANGE_TABLE, *TRIGGERS}:
+        return False
+    with conn:
+        for name in TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"DROP TABLE IF EXISTS {CHANGE_TABLE}")
+    return True
+
+
+def list_parts(directory: str, table: str) -> list[tuple[str, int, str, str]]:
+    """
+        Parts of the table as (shard, version, kind, path), oldest first.
+    """
+    folder = os.path.join(directory, table)
+    if not os.path.isdir(folder):
+        return []
+    parts = []
+    for file in os.listdir(folder):
+        match = PART_NAME.match(file)
+        if match:
+            parts.append((match["shard"], int(match["version"]), match["kind"],
+                          os.path.join(folder, file)))
+    return sorted(parts, key=lambda part: part[1])
+
+
+def current_parts(directory: str, table: str, shard: str = None) -> list:
+    """
+        Parts of the table without the ones replaced by a newer base part
+        of their shard (kept until running queries finish, see remove_retired()).
+    """
+    parts = [part for part in list_parts(directory, table) if shard is None or part[0] == shard]
+    bases = {}
+    for part_shard, version, kind, _ in parts:
+        if kind == "base":
+            bases[part_shard] = max(version, bases.get(part_shard, 0))
+    return [part for part in parts if part[1] >= bases.get(part[0], 0)]
+
+
+def next_version(directory: str) -> int:
+    """
+        Version of the next written part: parts are ordered by it on merge.
+    """
+    versions = [part[1] for table in TABLES for part in list_parts(directory, table.name)]
+    return max(versions, default=0) + 1
+
+
+def part_path(directory: str, table: str, shard: str, version: int, kind: str) -> str:
+    """
+        Path of a new part of the table.
+    """
+    name = f"{shard}-{version:010d}-{kind}-{uuid.uuid4().hex[:8]}{PART_SUFFIX}"
+    return os.path.join(directory, table, name)
+
+
+def _remove(*paths: str):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def write_part(directory: str, table: SnapshotTable, shard: str, version: int, kind: str,
+               batches, deleted: list = ()) -> tuple[str, int]:
+    """
+        Write batches of rows (keys then public columns) and deleted keys
+        as a Parquet part. Batches are staged in an on-disk DuckDB table,
+        so one batch at a time is held in memory.
+        Returns the part path and number of rows.
+    """
+    duckdb = _duckdb()
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    path = part_path(directory, table.name, shard, version, kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial, staging = path + ".partial", path + ".staging"
+
+    width = len(table.keys)
+    names = ["_key1", "_key2", "_deleted", *table.columns]
+    casts = ", ".join(f"CAST({name} AS {sql_type})" for name, sql_type in table.columns.items())
+    columns = ", ".join(table.columns)
+    conn = duckdb.connect(staging)
+
+    def stage(records: list):
+        conn.register("batch", {name: np.array([record[idx] for record in records], dtype=object)
+                                for idx, name in enumerate(names)})
+        conn.execute(f"INSERT INTO part SELECT CAST(_key1 AS BIGINT), CAST(_key2 AS BIGINT), "
+                     f"CAST(_deleted AS BOOLEAN), {casts} FROM batch")
+        conn.unregister("batch")
+
+    rows = 0
+    try:
+        conn.execute("CREATE TABLE part (_key1 BIGINT, _key2 BIGINT, _deleted BOOLEAN, "
+                     + ", ".join(f"{name} {sql_type}" for name, sql_type in table.columns.items())
+                     + ")")
+        for batch in batches:
+            stage([(*row[:width], *([0] * (2 - width)), False, *row[width:]) for row in batch])
+            rows += len(batch)
+        if deleted:
+            stage([(key1, key2, True, *([None] * len(table.columns))) for key1, key2 in deleted])
+        conn.execute(
+            f"COPY (SELECT {_sql_string(shard)} AS _shard, _key1, _key2, {version} AS _version, "
+            f"_deleted, {columns} FROM part) TO {_sql_string(partial)} (FORMAT PARQUET)")
+        os.replace(partial, path)
+    finally:
+        conn.close()
+        _remove(partial, staging, staging + ".wal")
+    return path, rows
+
+
+def full_build(path: str, shard: str, directory: str, version: int, pages: int = 256,
+               pause: float = 0.005, batch_size: int = 1000, capture: bool = True) -> int:
+    """
+        Install change capture (or remove it, if `capture` is off), then write
+        base parts of all tables from a copy of the database taken with
+        the backup API, so the shard is not locked while the tables are read.
+        Rows are read and written in batches of `batch_size`.
+        Returns the number of rows.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        if capture:
+            install_capture(conn)
+        else:
+            remove_capture(conn)
+    finally:
+        conn.close()
+
+    copy = os.path.join(directory, f".{shard}-{version:010d}-{uuid.uuid4().hex[:8]}.sqlite3")
+    os.makedirs(directory, exist_ok=True)
+    try:
+        copy_database(path, copy, pages, pause)
+        conn = sqlite3.connect(copy)
+        try:
+            upper = 0
+            if capture:
+                # Changes up to this sequence number are contained in the copy.
+                upper = conn.execute(
+                    f"SELECT coalesce(max(seq), 0) FROM {CHANGE_TABLE}").fetchone()[0]
+            total = 0
+            for table in TABLES:
+                cursor = conn.execute(table.select)
+                _, rows = write_part(directory, table, shard, version, "base",
+                                     iter(lambda cursor=cursor: cursor.fetchmany(batch_size), []))
+                total += rows
+        finally:
+            conn.close()
+    finally:
+        _remove(copy)
+
+    if capture:
+        _forget_changes(path, upper)
+    return total
+
+
+def _forget_changes(path: str, upper: int):
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.execute(f"DELETE FROM {CHANGE_TABLE} WHERE seq <= ?", (upper,))
+    finally:
+        conn.close()
+
+
+def apply_changes(path: str, shard: str, directory: str, version: int,
+                  batch_size: int = 1000, pause: float = 0.005) -> int:
+    """
+        Write changed rows recorded by the capture triggers as delta parts.
+        Changes are read in short transactions of `batch_size` keys with
+        `pause` seconds between them. Returns the number of changes.
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        upper = conn.execute(f"SELECT coalesce(max(seq), 0) FROM {CHANGE_TABLE}").fetchone()[0]
+        changed = {table.name: ([], []) for table in TABLES}
+        last, total = 0, 0
+        while last < upper:
+            conn.execute("BEGIN")
+            try:
+                changes = conn.execute(
+                    f"SELECT seq, table_name, key1, key2 FROM {CHANGE_TABLE} "
+                    f"WHERE seq > ? AND seq <= ? ORDER BY seq LIMIT ?",
+                    (last, upper, batch_size)).fetchall()
+                if not changes:
+                    break
+                high = changes[-1][0]
+                for table in TABLES:
+                    src_keys = [f"src.{key}" for key in table.keys] + ["0"] * (2 - len(table.keys))
+                    rows = conn.execute(
+                        f"{table.select} JOIN {CHANGE_TABLE} AS change "
+                        f"ON change.table_name = ? AND change.key1 = {src_keys[0]} "
+                        f"AND change.key2 = {src_keys[1]} WHERE change.seq > ? AND change.seq <= ?",
+                        (table.name, last, high)).fetchall()
+                    found = {(row[0], row[1] if len(table.keys) == 2 else 0) for row in rows}
+                    changed[table.name][0].extend(rows)
+                    changed[table.name][1].extend(
+                        (key1, key2) for _, name, key1, key2 in changes
+                        if name == table.name and (key1, key2) not in found)
+            finally:
+                conn.execute("COMMIT")
+            last, total = high, total + len(changes)
+            time.sleep(pause)
+    finally:
+        conn.close()
+
+    for table in TABLES:
+        rows, deleted = changed[table.name]
+        if rows or deleted:
+            write_part(directory, table, shard, version, "delta", [rows], deleted)
+    _forget_changes(path, upper)
+    return total
+
+
+def _merged_select(table: SnapshotTable, parts: list) -> str:
+    """
+        Current rows of the table: base rows not changed by any delta and the
+        latest version of every changed row, without deleted ones.
+    """
+    base = [part[3] for part in parts if part[2] == "base"]
+    deltas = [part[3] for part in parts if part[2] == "delta"]
+    columns = ", ".join(table.columns)
+    keys = "_shard, _key1, _key2"
+    if not deltas:
+        return f"SELECT {keys}, {columns} FROM read_parquet([{', '.join(map(_sql_string, base))}])"
+    delta_source = f"read_parquet([{', '.join(map(_sql_string, deltas))}])"
+    latest = (f"SELECT * FROM {delta_source} "
+              f"QUALIFY row_number() OVER (PARTITION BY {keys} ORDER BY _version DESC) = 1")
+    query = f"SELECT {keys}, {columns} FROM ({latest}) WHERE NOT _deleted"
+    if base:
+        query = (f"SELECT {keys}, {columns} FROM "
+                 f"read_parquet([{', '.join(map(_sql_string, base))}]) "
+                 f"ANTI JOIN (SELECT DISTINCT {keys} FROM {delta_source}) USING ({keys}) "
+                 f"UNION ALL {query}")
+    return query
+
+
+def compact(directory: str, table: SnapshotTable, shard: str, version: int) -> str:
+    """
+        Merge base and delta parts of the shard into a new base part.
+        Returns the new part path.
+    """
+    duckdb = _duckdb()
+    parts = current_parts(directory, table.name, shard)
+    path = part_path(directory, table.name, shard, version, "base")
+    partial = path + ".partial"
+    columns = ", ".join(table.columns)
+    conn = duckdb.connect()
+    try:
+        conn.execute(
+            f"COPY (SELECT _shard, _key1, _key2, {version} AS _version, false AS _deleted, "
+            f"{columns} FROM ({_merged_select(table, parts)})) "
+            f"TO {_sql_string(partial)} (FORMAT PARQUET)")
+        os.replace(partial, path)
+    finally:
+        conn.close()
+        _remove(partial)
+    return path
+
+
+def remove_retired(directory: str, grace: float) -> list[str]:
+    """
+        Delete parts replaced by a base part written more than `grace`
+        seconds ago. Queries of every process read the parts current at
+        their start, so the grace must exceed the longest query.
+        Returns deleted paths.
+    """
+    removed = []
+    now = time.time()
+    for table in TABLES:
+        parts = list_parts(directory, table.name)
+        newest = {part[0]: part for part in parts if part[2] == "base"}
+        for shard, version, _, path in parts:
+            base = newest.get(shard)
+            if base is None or version >= base[1]:
+                continue
+            try:
+                if now - os.path.getmtime(base[3]) > grace:
+                    os.remove(path)
+                    removed.append(path)
+            except FileNotFoundError:
+                continue
+    return removed
+
+
+class QueryTimeout(Exception):
+    """
+        Analytics query was interrupted after the time limit.
+    """
+
+
+class AnalyticsSnapshot(PeriodicTask):
+    """
+        Parquet snapshot of the shards in `directory`, refreshed every
+        `interval` seconds by the owner of the schedule lock,
+        and read-only DuckDB queries on it. Replaced parts are deleted
+        `retire_after` seconds later, when queries reading them are over.
+        Changes are captured only with a schedule: otherwise nothing
+        would read them and every write would pay for the triggers.
+    """
+
+    title = "Analytics snapshot refresh"
+
+    def __init__(self, router: ShardRouter, directory: str, interval: float = 0.0,
+                 max_parts: int = 8, batch_size: int = 1000, pause: float = 0.005,
+                 threads: int = 2, memory_limit: str = "512MB",
+                 query_timeout: float = 10.0, max_rows: int = 10000):
+        self.directory = os.path.abspath(directory)
+        super().__init__(interval, os.path.join(self.directory, SCHEDULE_LOCK_FILE))
+        self.router = router
+        self.max_parts = max_parts
+        self.batch_size = batch_size
+        self.pause = pause
+        self.threads = threads
+        self.memory_limit = memory_limit
+        self.query_timeout = query_timeout
+        self.max_rows = max_rows
+        self.retire_after = 2 * query_timeout
+        self.last_refresh = None
+        self.queries = 0
+        self.timeouts = 0
+
+    async def run_once(self):
+        """
+            Scheduled refresh.
+        """
+        await self.refresh()
+
+    def _file_shards(self) -> list[tuple[str, str]]:
+        shards = [(shard.name, database_path(shard.url)) for shard in self.router.shards]
+        return [(name, path) for name, path in shards if path is not None]
+
+    def _refresh_shard(self, name: str, path: str) -> dict:
+        version = next_version(self.directory)
+        conn = sqlite3.connect(path)
+        try:
+            captured = capture_installed(conn)
+        finally:
+            conn.close()
+        has_base = all(any(part[2] == "base" for part in
+                           current_parts(self.directory, table.name, name))
+                       for table in TABLES)
+
+        capture = self.interval > 0
+        if not capture or not captured or not has_base:
+            rows = full_build(path, name, self.directory, version,
+                              config.BACKUP_PAGES, self.pause, self.batch_size, capture)
+            return {"mode": "full", "rows": rows}
+
+        changes = apply_changes(path, name, self.directory, version, self.batch_size, self.pause)
+        for table in TABLES:
+            deltas = [part for part in current_parts(self.directory, table.name, name)
+                      if part[2] == "delta"]
+            if len(deltas) >= self.max_parts:
+                compact(self.directory, table, name, next_version(self.directory))
+        return {"mode": "incremental", "changes": changes}
+
+    async def refresh(self, progress=None) -> dict:
+        """
+            Refresh the snapshot from every file-backed shard in a worker thread.
+            Waits while another process refreshes the same directory.
+            Returns shard name -> refresh summary.
+        """
+        _duckdb()
+        shards = self._file_shards()
+        summary = {}
+        async with FileLock(os.path.join(self.directory, REFRESH_LOCK_FILE)):
+            for idx, (name, path) in enumerate(shards):
+                if progress is not None:
+                    progress(idx / len(shards), f"Refreshing {name}")
+                summary[name] = await asyncio.to_thread(self._refresh_shard, name, path)
+            await asyncio.to_thread(remove_retired, self.directory, self.retire_after)
+        self.last_refresh = time.time()
+        return summary
+
+    async def remove_unscheduled_capture(self) -> list[str]:
+        """
+            Without a schedule drop capture triggers and change table
+            left on the shards by an earlier schedule.
+            Returns names of the shards they were dropped from.
+        """
+        if self.interval > 0:
+            return []
+
+        def remove(path: str) -> bool:
+            conn = sqlite3.connect(path)
+            try:
+                return remove_capture(conn)
+            finally:
+                conn.close()
+
+        return [name for name, path in self._file_shards()
+                if await asyncio.to_thread(remove, path)]
+
+    def _connect(self, duckdb):
+        """
+            DuckDB connection with views of the snapshot tables,
+            limited to reading the snapshot directory.
+        """
+        conn = duckdb.connect(config={"threads": self.threads,
+                                      "memory_limit": self.memory_limit})
+        try:
+            for table in TABLES:
+                parts = current_parts(self.directory, table.name)
+                if not parts:
+                    raise LookupError("Analytics snapshot is not built yet")
+                conn.execute(f"CREATE VIEW {table.name} AS SELECT {', '.join(table.columns)} "
+                             f"FROM ({_merged_select(table, parts)})")
+            conn.execute(f"SET allowed_directories = [{_sql_string(self.directory + os.sep)}]")
+            conn.execute("SET enable_external_access = false")
+            conn.execute("SET lock_configuration = true")
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    async def query(self, sql: str, max_rows: int = 0, timeout: float = 0.0) -> dict:
+        """
+            Run one read-only SELECT statement on the snapshot.
+            At most `max_rows` rows are returned, the query is interrupted
+            after `timeout` seconds. Raises LookupError without a snapshot,
+            ValueError for wrong or not read-only queries, QueryTimeout.
+        """
+        duckdb = _duckdb()
+        max_rows = min(max_rows or self.max_rows, self.max_rows)
+        timeout = min(timeout or self.query_timeout, self.query_timeout)
+
+        self.queries += 1
+        started = time.perf_counter()
+        conn = await asyncio.to_thread(self._connect, duckdb)
+
+        def run():
+            try:
+                statements = conn.extract_statements(sql)
+            except duckdb.Error as exc:
+                raise ValueError(str(exc)) from exc
+            if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+                raise ValueError("Exactly one SELECT statement is expected")
+            try:
+                cursor = conn.execute(sql)
+                rows = cursor.fetchmany(max_rows + 1)
+            except duckdb.InterruptException:
+                raise
+            except duckdb.Error as exc:
+                raise ValueError(str(exc)) from exc
+            return [column[0] for column in cursor.description], rows
+
+        future = asyncio.ensure_future(asyncio.to_thread(run))
+        try:
+            columns, rows = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError as exc:
+            self.timeouts += 1
+            raise QueryTimeout(f"Analytics query exceeded {timeout} s") from exc
+        finally:
+            # Timed out or cancelled: stop the query before closing the connection.
+            if not future.done():
+                conn.interrupt()
+                await asyncio.gather(future, return_exceptions=True)
+            conn.close()
+        return {
+            "columns": columns,
+            "rows": [list(row) for row in rows[:max_rows]],
+            "truncated": len(rows) > max_rows,
+            "elapsed": time.perf_counter() - started,
+        }
+
+    def snapshot(self) -> dict:
+        """
+            Current state for the metrics endpoint.
+        """
+        return {
+            "available": available(),
+            "interval": self.interval,
+            "owner": self.owner,
+            "last_refresh": self.last_refresh,
+            "failures": self.failures,
+            "queries": self.queries,
+            "timeouts": self.timeouts,
+        }
+
+
+def make_snapshot(router: ShardRouter) -> AnalyticsSnapshot:
+    """
+        Snapshot with the configured parameters.
+    """
+    return AnalyticsSnapshot(
+        router,
+        config.ANALYTICS_DIR,
+        interval=config.ANALYTICS_INTERVAL,
+        max_parts=config.ANALYTICS_MAX_PARTS,
+        batch_size=config.ANALYTICS_BATCH_SIZE,
+        pause=config.ANALYTICS_PAUSE,
+        threads=config.ANALYTICS_THREADS,
+        memory_limit=config.ANALYTICS_MEMORY_LIMIT,
+        query_timeout=config.ANALYTICS_QUERY_TIMEOUT,
+        max_rows=config.ANALYTICS_MAX_ROWS,
+    )
+
+
+async def main():
+    """
+        Refresh the snapshot or run a query on it.
+    """
+    parser = argparse.ArgumentParser(description="Analytics snapshot of the catalogue.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("refresh", help="refresh snapshot from every shard")
+    query = commands.add_parser("query", help="run a read-only SELECT on the snapshot")
+    query.add_argument("sql")
+    args = parser.parse_args()
+
+    router = ShardRouter.from_config(
+        config.DB_SHARDS, config.DB_SHARD_PREFIXES, config.DB_SHARD_DEFAULT
+    )
+    snapshot = make_snapshot(router)
+    try:
+        if args.command == "refresh":
+            for name, result in (await snapshot.refresh()).items():
+                print(f"{name}: {result}")
+        else:
+            result = await snapshot.query(args.sql)
+            print("\t".join(result["columns"]))
+            for row in result["rows"]:
+                print("\t".join(map(str, row)))
+            if result["truncated"]:
+                print(f"... truncated to {len(result['rows'])} rows")
+    finally:
+        await router.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
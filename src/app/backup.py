@@ -0,0 +1,243 @@
+"""
+    Online backup of the Web service 'Article Gate': consistent snapshots of
+    the SQLite shards taken with the SQLite backup API in small page batches,
+    so readers and writers are not blocked. Run from the `src` directory:
+    `python -m app.backup snapshot`, `python -m app.backup verify FILE`,
+    `python -m app.backup restore FILE --shard main`.
+    Snapshots into one directory are taken by one process at a time.
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import sqlite3
+import time
+
+from sqlalchemy.engine import make_url
+
+from . import config
+from .periodic import FileLock, PeriodicTask
+from .sharding import ShardRouter
+
+SUFFIX = ".sqlite3"
+STAMP_FORMAT = "%Y%m%dT%H%M%S%f"
+# Lock files in the backup directory: snapshot and retention in progress,
+# owner of the snapshot schedule.
+LOCK_FILE = ".snapshot.lock"
+SCHEDULE_LOCK_FILE = ".schedule.lock"
+
+
+def database_path(url: str):
+    """
+        File of the SQLite database URL, None for other or in-memory databases.
+    """
+    url = make_url(url)
+    if not url.get_backend_name() == "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    return url.database
+
+
+def copy_database(source: str, target: str, pages: int = 256, pause: float = 0.005,
+                  progress=None):
+    """
+        Copy SQLite database `source` into `target` with the backup API,
+        `pages` pages per step with `pause` seconds between steps.
+        `progress(copied, total)` is called after every step.
+    """
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        # The 'sleep' argument of backup() only applies when a step
+        # hits a busy or locked database, so the pause is taken here.
+        def report(_status, remaining, total):
+            if progress is not None:
+                progress(total - remaining, total)
+            if remaining and pause > 0:
+                time.sleep(pause)
+
+        src.backup(dst, pages=pages, progress=report)
+    finally:
+        dst.close()
+        src.close()
+
+
+def verify_snapshot(path: str) -> bool:
+    """
+        Run SQLite integrity check of the snapshot.
+    """
+    if not os.path.isfile(path):
+        return False
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute("PRAGMA integrity_check").fetchall() == [("ok",)]
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+
+
+def take_snapshot(source: str, directory: str, name: str, pages: int = 256,
+                  pause: float = 0.005, progress=None) -> str:
+    """
+        Snapshot database `source` into `directory` as `<name>-<timestamp>.sqlite3`.
+        The copy is written to a temporary file, checked and then renamed,
+        so a listed snapshot is always complete.
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime(STAMP_FORMAT)
+    path = os.path.join(directory, f"{name}-{stamp}{SUFFIX}")
+    partial = path + ".partial"
+    try:
+        copy_database(source, partial, pages, pause, progress)
+        if not verify_snapshot(partial):
+            raise RuntimeError(f"Snapshot of {source} failed integrity check")
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return path
+
+
+def list_snapshots(directory: str, name: str) -> list[str]:
+    """
+        Snapshots of shard `name`, oldest first.
+    """
+    if not os.path.isdir(directory):
+        return []
+    prefix = f"{name}-"
+    return sorted(
+        os.path.join(directory, file) for file in os.listdir(directory)
+        if file.startswith(prefix) and file.endswith(SUFFIX)
+        and file[len(prefix):-len(SUFFIX)].isalnum()
+    )
+
+
+def prune_snapshots(directory: str, name: str, keep: int) -> list[str]:
+    """
+        Delete all but `keep` newest snapshots of shard `name`.
+        Returns deleted paths.
+    """
+    snapshots = list_snapshots(directory, name)
+    removed = snapshots[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def restore_snapshot(snapshot: str, target: str, pages: int = 256, pause: float = 0.0):
+    """
+        Overwrite database `target` with a verified snapshot.
+        Connections to the target see the restored content afterwards,
+        writes made to the target meanwhile are lost.
+    """
+    if not verify_snapshot(snapshot):
+        raise ValueError(f"Snapshot {snapshot} failed integrity check")
+    copy_database(snapshot, target, pages, pause)
+
+
+async def snapshot_shards(router: ShardRouter, directory: str, keep: int = 0,
+                          pages: int = 256, pause: float = 0.005, progress=None) -> dict:
+    """
+        Snapshot every file-backed shard in a worker thread and apply retention.
+        Waits while another process snapshots into the same directory.
+        Returns shard name -> snapshot path.
+        `progress(fraction)` reports overall progress from 0 to 1.
+    """
+    shards = [(shard.name, database_path(shard.url)) for shard in router.shards]
+    shards = [(name, path) for name, path in shards if path is not None]
+    taken = {}
+    async with FileLock(os.path.join(directory, LOCK_FILE)):
+        for idx, (name, path) in enumerate(shards):
+            def report(copied, total, idx=idx):
+                if progress is not None and total:
+                    progress((idx + copied / total) / len(shards))
+
+            taken[name] = await asyncio.to_thread(
+                take_snapshot, path, directory, name, pages, pause, report)
+            if keep:
+                await asyncio.to_thread(prune_snapshots, directory, name, keep)
+    return taken
+
+
+class BackupScheduler(PeriodicTask):
+    """
+        Takes snapshots of all shards every `interval` seconds
+        and keeps the `keep` newest ones per shard. With several workers
+        only the owner of the schedule lock in `directory` takes them.
+    """
+
+    title = "Scheduled snapshot"
+
+    def __init__(self, router: ShardRouter, directory: str, interval: float, keep: int,
+                 pages: int = 256, pause: float = 0.005):
+        super().__init__(interval, os.path.join(directory, SCHEDULE_LOCK_FILE),
+                         run_at_start=False)
+        self.router = router
+        self.directory = directory
+        self.keep = keep
+        self.pages = pages
+        self.pause = pause
+        self.last_snapshot = None
+
+    async def run_once(self):
+        """
+            Snapshot the shards and apply retention.
+        """
+        self.last_snapshot = await snapshot_shards(
+            self.router, self.directory, self.keep, self.pages, self.pause)
+
+    def snapshot(self) -> dict:
+        """
+            Current state for the metrics endpoint.
+        """
+        return {
+            "interval": self.interval,
+            "owner": self.owner,
+            "last_snapshot": self.last_snapshot,
+            "failures": self.failures,
+        }
+
+
+def main():
+    """
+        Take, verify or restore snapshots of the configured shards.
+    """
+    parser = argparse.ArgumentParser(description="Online backup of the catalogue shards.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot = commands.add_parser("snapshot", help="snapshot every shard")
+    snapshot.add_argument("--dir", default=config.BACKUP_DIR)
+    snapshot.add_argument("--keep", type=int, default=config.BACKUP_KEEP)
+    verify = commands.add_parser("verify", help="check snapshots integrity")
+    verify.add_argument("snapshots", nargs="+")
+    restore = commands.add_parser("restore", help="restore shard from a snapshot")
+    restore.add_argument("snapshot")
+    restore.add_argument("--shard", default="", help="shard name, default shard if not given")
+    args = parser.parse_args()
+
+    router = ShardRouter.from_config(
+        config.DB_SHARDS, config.DB_SHARD_PREFIXES, config.DB_SHARD_DEFAULT
+    )
+    if args.command == "snapshot":
+        taken = asyncio.run(snapshot_shards(
+            router, args.dir, args.keep, config.BACKUP_PAGES, config.BACKUP_PAUSE))
+        for name, path in taken.items():
+            print(f"{name}: {path}")
+    elif args.command == "verify":
+        failed = [path for path in args.snapshots if not verify_snapshot(path)]
+        for path in args.snapshots:
+            print(f"{path}: {'failed' if path in failed else 'ok'}")
+        raise SystemExit(1 if failed else 0)
+    else:
+        if args.shard and args.shard not in router.by_name:
+            parser.error(f"unknown shard {args.shard}")
+        shard = router.by_name[args.shard] if args.shard else router.default
+        target = database_path(shard.url)
+        if target is None:
+            parser.error(f"shard {shard.name} is not an SQLite database file")
+        restore_snapshot(args.snapshot, target, config.BACKUP_PAGES)
+        print(f"{shard.name} restored from {args.snapshot}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+    Response compression (gzip, brotli, zstd) of the Web service 'Article Gate'.
+    Brotli and zstd are used only when listed in the configured encodings
+    and the `brotli` and `zstandard` packages are installed.
+"""
+
+import importlib
+import importlib.util
+import zlib
+
+
+class _GzipCompressor:
+    """
+        Streaming gzip compressor.
+    """
+
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        """
+            Compress next chunk.
+        """
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        """
+            Finish the stream.
+        """
+        return self._obj.flush()
+
+
+class _BrotliCompressor:
+    """
+        Streaming brotli compressor.
+    """
+
+    def __init__(self, level: int):
+        self._obj = importlib.import_module("brotli").Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        """
+            Compress next chunk.
+        """
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        """
+            Finish the stream.
+        """
+        return self._obj.finish()
+
+
+class _ZstdCompressor:
+    """
+        Streaming zstd compressor.
+    """
+
+    def __init__(self, level: int):
+        self._obj = importlib.import_module("zstandard").ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        """
+            Compress next chunk.
+        """
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        """
+            Finish the stream.
+        """
+        return self._obj.flush()
+
+
+# Content-coding -> (compressor class, module required, default level)
+CODECS = {
+    "br": (_BrotliCompressor, "brotli", 4),
+    "zstd": (_ZstdCompressor, "zstandard", 3),
+    "gzip": (_GzipCompressor, None, 6),
+}
+
+
+def available_encodings(wanted) -> list[str]:
+    """
+        Keep only those of `wanted` encodings, that can be produced here.
+        Order of `wanted` is the server preference order.
+    """
+    encodings = []
+    for name in wanted:
+        if name not in CODECS:
+            raise ValueError(f"Unsupported response encoding {name}")
+        module = CODECS[name][1]
+        # Module itself is imported lazily by the first compressor.
+        if module is None or importlib.util.find_spec(module) is not None:
+            encodings.append(name)
+    return encodings
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """
+        Parse Accept-Encoding header into {coding: q-value}.
+    """
+    accepted = {}
+    for item in header.split(","):
+        coding, *params = item.strip().split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+        ASGI middleware compressing response bodies of at least
+        `minimum_size` bytes with the first of `encodings` accepted by the client.
+    """
+
+    def __init__(self, app, encodings=("gzip",), minimum_size: int = 512, levels=None):
+        self.app = app
+        self.encodings = available_encodings(encodings)
+        self.minimum_size = minimum_size
+        self.levels = levels or {}
+
+    def choose_encoding(self, header: str):
+        """
+            Select content-coding for Accept-Encoding header value.
+        """
+        accepted = parse_accept_encoding(header)
+        wildcard = accepted.get("*", 0.0)
+        for name in self.encodings:
+            if accepted.get(name, wildcard) > 0:
+                return name
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = self.choose_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(send, encoding, self)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    """
+        Send wrapper of a single response.
+    """
+
+    def __init__(self, send, encoding: str, middleware: CompressionMiddleware):
+        self._send = send
+        self.encoding = encoding
+        self.middleware = middleware
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    def _make_compressor(self):
+        codec, _, level = CODECS[self.encoding]
+        return codec(self.middleware.levels.get(self.encoding, level))
+
+    def _compressed_headers(self) -> list:
+        headers = [
+            (key, value) for key, value in self.start["headers"]
+            if key not in (b"content-length", b"vary")
+        ]
+        vary = [value for key, value in self.start["headers"] if key == b"vary"]
+        vary.append(b"Accept-Encoding")
+        headers.append((b"vary", b", ".join(vary)))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        return headers
+
+    async def send(self, message):
+        """
+            Intercept response messages and compress body.
+        """
+        if message["type"] == "http.response.start":
+            self.start = dict(message)
+            self.start["headers"] = list(message.get("headers", []))
+            self.passthrough = any(
+                key == b"content-encoding" for key, _ in self.start["headers"]
+            )
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+
+            self.compressor = self._make_compressor()
+            self.start["headers"] = self._compressed_headers()
+            if not more_body:
+                body = self.compressor.compress(body) + self.compressor.flush()
+                self.start["headers"].append((b"content-length", str(len(body)).encode()))
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            await self._send(self.start)
+
+        data = self.compressor.compress(body)
+        if not more_body:
+            data += self.compressor.flush()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
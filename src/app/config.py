@@ -0,0 +1,138 @@
+"""
+    Service tuning parameters of the Web service 'Article Gate'.
+    Every value may be overridden by the environment variable
+    with the same name.
+"""
+
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    """
+        Read integer parameter from the environment.
+    """
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    """
+        Read float parameter from the environment.
+    """
+    return float(os.getenv(name, str(default)))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """
+        Read boolean parameter from the environment.
+    """
+    return os.getenv(name, str(int(default))).lower() in ("1", "true", "yes", "on")
+
+
+def _cpu_count() -> int:
+    """
+        Number of CPUs available to this process.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# DB connection pool. SQLite serialises writers anyway,
+# so the pool is kept small and the admission control
+# below never lets more requests in than there are connections.
+DB_URL = os.getenv("DB_URL", "sqlite+aiosqlite:///app/article_gate.sqlite3")
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 10)
+DB_MAX_CONNECTIONS = DB_POOL_SIZE + DB_MAX_OVERFLOW
+
+# Catalogue shards as "name=url;name=url". Articles and their bindings are
+# routed by DOI prefix ("prefix=name;..."), other DOIs go to DB_SHARD_DEFAULT
+# (the first shard if empty). By default the catalogue is one DB_URL file.
+DB_SHARDS = os.getenv("DB_SHARDS", f"main={DB_URL}")
+DB_SHARD_PREFIXES = os.getenv("DB_SHARD_PREFIXES", "")
+DB_SHARD_DEFAULT = os.getenv("DB_SHARD_DEFAULT", "")
+
+# Admission control: defaults are derived from the pool size.
+ADMISSION_ENABLED = _env_bool("ADMISSION_ENABLED", True)
+ADMISSION_MAX_INFLIGHT = _env_int("ADMISSION_MAX_INFLIGHT", DB_MAX_CONNECTIONS)
+ADMISSION_MAX_QUEUE = _env_int("ADMISSION_MAX_QUEUE", 2 * ADMISSION_MAX_INFLIGHT)
+ADMISSION_QUEUE_TIMEOUT = _env_float("ADMISSION_QUEUE_TIMEOUT", 1.0)
+ADMISSION_CLIENT_RATE = _env_float("ADMISSION_CLIENT_RATE", 4.0 * ADMISSION_MAX_INFLIGHT)
+ADMISSION_CLIENT_BURST = _env_float("ADMISSION_CLIENT_BURST", 8.0 * ADMISSION_MAX_INFLIGHT)
+ADMISSION_ROUTE_RATE = _env_float("ADMISSION_ROUTE_RATE", 8.0 * ADMISSION_MAX_INFLIGHT)
+ADMISSION_ROUTE_BURST = _env_float("ADMISSION_ROUTE_BURST", 16.0 * ADMISSION_MAX_INFLIGHT)
+ADMISSION_MAX_CLIENTS = _env_int("ADMISSION_MAX_CLIENTS", 10000)
+ADMISSION_MAX_ROUTES = _env_int("ADMISSION_MAX_ROUTES", 1000)
+
+# Request coalescing of identical concurrent reads.
+SINGLE_FLIGHT_ENABLED = _env_bool("SINGLE_FLIGHT_ENABLED", True)
+
+# Response compression. Encodings are listed in server preference order,
+# gzip only by default; "br" and "zstd" may be added and are skipped
+# when their packages are not installed.
+COMPRESSION_ENABLED = _env_bool("COMPRESSION_ENABLED", True)
+COMPRESSION_ENCODINGS = tuple(
+    name.strip() for name in os.getenv("COMPRESSION_ENCODINGS", "gzip").split(",")
+    if name.strip()
+)
+COMPRESSION_MINIMUM_SIZE = _env_int("COMPRESSION_MINIMUM_SIZE", 512)
+
+# Production serving profile, see app/serve.py.
+SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = _env_int("SERVE_PORT", 8000)
+SERVE_WORKERS = _env_int("SERVE_WORKERS", _cpu_count())
+SERVE_KEEP_ALIVE = _env_int("SERVE_KEEP_ALIVE", 15)
+SERVE_BACKLOG = _env_int("SERVE_BACKLOG", 2048)
+SERVE_ACCESS_LOG = _env_bool("SERVE_ACCESS_LOG", False)
+
+# Warm up pooled connections and statement caches before serving.
+STARTUP_WARM_UP = _env_bool("STARTUP_WARM_UP", True)
+
+# Similar articles index is rebuilt in background when older than this (seconds).
+RECOMMEND_MAX_AGE = _env_float("RECOMMEND_MAX_AGE", 3600.0)
+# How often (seconds) the index is checked against the data changed by
+# other workers and author merges.
+RECOMMEND_CHECK_INTERVAL = _env_float("RECOMMEND_CHECK_INTERVAL", 60.0)
+
+# Background jobs (app/jobs.py). Job state is kept in its own SQLite database.
+JOBS_DB_URL = os.getenv("JOBS_DB_URL", "sqlite+aiosqlite:///app/jobs.sqlite3")
+JOBS_MAX_RUNNING = _env_int("JOBS_MAX_RUNNING", 2)
+JOBS_PROCESS_WORKERS = _env_int("JOBS_PROCESS_WORKERS", max(1, _cpu_count() // 2))
+JOBS_FLUSH_INTERVAL = _env_float("JOBS_FLUSH_INTERVAL", 1.0)
+JOBS_STALE_AFTER = _env_float("JOBS_STALE_AFTER", 30.0)
+# Share of wall time a job may spend on catalogue queries, the rest is left to requests.
+JOBS_DUTY_CYCLE = _env_float("JOBS_DUTY_CYCLE", 0.5)
+JOBS_BATCH_SIZE = _env_int("JOBS_BATCH_SIZE", 1000)
+JOBS_EXPORT_DIR = os.getenv("JOBS_EXPORT_DIR", "app/exports")
+
+# Online backup (app/backup.py): snapshots are copied BACKUP_PAGES pages
+# at a time with BACKUP_PAUSE seconds between steps. Scheduled snapshots
+# are off unless BACKUP_INTERVAL (seconds) is set.
+BACKUP_DIR = os.getenv("BACKUP_DIR", "app/backups")
+BACKUP_INTERVAL = _env_float("BACKUP_INTERVAL", 0.0)
+BACKUP_KEEP = _env_int("BACKUP_KEEP", 7)
+BACKUP_PAGES = _env_int("BACKUP_PAGES", 256)
+BACKUP_PAUSE = _env_float("BACKUP_PAUSE", 0.005)
+
+# Access log for traffic replay (app/access_log.py, app/replay.py): a share
+# ACCESS_LOG_SAMPLE of requests is appended to ACCESS_LOG_PATH (with the worker
+# PID added to the name) as JSON Lines in batches of ACCESS_LOG_BUFFER records.
+# Off unless the path is set.
+ACCESS_LOG_PATH = os.getenv("ACCESS_LOG_PATH", "")
+ACCESS_LOG_SAMPLE = _env_float("ACCESS_LOG_SAMPLE", 1.0)
+ACCESS_LOG_BUFFER = _env_int("ACCESS_LOG_BUFFER", 100)
+
+# Analytics snapshot (app/analytics.py): Parquet copy of the catalogue
+# refreshed every ANALYTICS_INTERVAL seconds (off unless set) by changed rows,
+# delta parts of a shard are compacted when there are ANALYTICS_MAX_PARTS.
+# Without the schedule changes are not captured and refreshes rebuild it.
+# Queries run on it with DuckDB under the thread, memory, time and row limits.
+ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", "app/analytics")
+ANALYTICS_INTERVAL = _env_float("ANALYTICS_INTERVAL", 0.0)
+ANALYTICS_MAX_PARTS = _env_int("ANALYTICS_MAX_PARTS", 8)
+ANALYTICS_BATCH_SIZE = _env_int("ANALYTICS_BATCH_SIZE", 1000)
+ANALYTICS_PAUSE = _env_float("ANALYTICS_PAUSE", 0.005)
+ANALYTICS_THREADS = _env_int("ANALYTICS_THREADS", 2)
+ANALYTICS_MEMORY_LIMIT = os.getenv("ANALYTICS_MEMORY_LIMIT", "512MB")
+ANALYTICS_QUERY_TIMEOUT = _env_float("ANALYTICS_QUERY_TIMEOUT", 10.0)
+ANALYTICS_MAX_ROWS = _env_int("ANALYTICS_MAX_ROWS", 10000)
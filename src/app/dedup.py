@@ -0,0 +1,393 @@
+"""
+    Author name disambiguation and deduplication of the Web service 'Article Gate'.
+    Authors are grouped into blocks by a precomputed key (surname and first
+    initial of the normalised name), candidates are compared only inside
+    their block and scored by name, co-authors and affiliation.
+    Run the batch job from the `src` directory: `python -m app.dedup [--apply]`.
+"""
+
+import argparse
+import asyncio
+import collections
+import dataclasses
+import re
+import unicodedata
+
+import sqlalchemy as sqla
+from sqlalchemy.orm import aliased
+
+from . import config, startup
+from .models.base import BaseModel
+from .models.author import AuthorModel
+from .models.article import ArticleModel
+from .models.article_to_author import ArticleToAuthorModel
+from .models.author_name_key import AuthorNameKeyModel
+# Registers 'organisation' in the metadata, 'author' references it.
+from .models.organisation import OrganisationModel  # pylint: disable=unused-import
+from .sharding import ShardRouter, ShardSession
+
+# Weights of the candidate score components.
+NAME_WEIGHT = 0.6
+COAUTHOR_WEIGHT = 0.25
+AFFILIATION_WEIGHT = 0.15
+
+DEFAULT_THRESHOLD = 0.6
+# Blocks larger than this (very common names) are skipped,
+# comparison inside a block is quadratic.
+MAX_BLOCK_SIZE = 200
+BATCH_SIZE = 500
+
+_JOINERS = re.compile(r"[-'’‐‑]")
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalise_name(name: str) -> str:
+    """
+        Case-fold name, strip diacritics, join hyphenated parts
+        and split initials: 'Leon M.J. Mugenzi' -> 'leon m j mugenzi'.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    plain = "".join(char for char in decomposed if not unicodedata.combining(char))
+    plain = _JOINERS.sub("", plain.casefold())
+    return " ".join(_SEPARATORS.sub(" ", plain).split())
+
+
+def block_key(norm_name: str) -> str:
+    """
+        Blocking key of normalised name: surname and first initial.
+    """
+    tokens = norm_name.split()
+    if not tokens:
+        return ""
+    if len(tokens) == 1:
+        return tokens[0]
+    return f"{tokens[-1]}:{tokens[0][0]}"
+
+
+def _compatible(token_a: str, token_b: str) -> bool:
+    """
+        Given names match exactly or one of them is the initial of the other.
+    """
+    if len(token_a) == 1 or len(token_b) == 1:
+        return token_a[0] == token_b[0]
+    return token_a == token_b
+
+
+def name_similarity(norm_a: str, norm_b: str) -> float:
+    """
+        Similarity of two normalised names of the same block, from 0 to 1.
+        First given names must be compatible, middle names and initials of
+        the shorter name must be found in the longer one in the same order.
+    """
+    if norm_a == norm_b:
+        return 1.0
+
+    tokens_a, tokens_b = norm_a.split(), norm_b.split()
+    if tokens_a[-1] != tokens_b[-1]:
+        return 0.0
+    given_a, given_b = tokens_a[:-1], tokens_b[:-1]
+    if len(given_a) > len(given_b):
+        given_a, given_b = given_b, given_a
+    if not given_a:
+        return 0.5
+    if not _compatible(given_a[0], given_b[0]):
+        return 0.0
+
+    initials = int(given_a[0] != given_b[0])
+    position = 1
+    for token in given_a[1:]:
+        while position < len(given_b) and not _compatible(token, given_b[position]):
+            position += 1
+        if position == len(given_b):
+            return 0.0
+        initials += token != given_b[position]
+        position += 1
+
+    extra = len(given_b) - len(given_a)
+    return max(0.5, 1.0 - 0.1 * initials - 0.1 * extra)
+
+
+@dataclasses.dataclass
+class AuthorEntry:
+    """
+        Author data needed to score duplicate candidates.
+    """
+
+    id: int
+    norm_name: str
+    affiliation_org_id: int
+    coauthors: set = dataclasses.field(default_factory=set)
+
+
+@dataclasses.dataclass
+class DuplicateCandidate:
+    """
+        Proposed merge of `duplicate_id` into `keep_id`.
+    """
+
+    keep_id: int
+    duplicate_id: int
+    score: float
+    name_score: float
+    coauthor_score: float
+    same_affiliation: bool
+
+
+def score_pair(entry_a: AuthorEntry, entry_b: AuthorEntry) -> DuplicateCandidate:
+    """
+        Score two authors of one block. Co-author overlap is normalised
+        by the smaller co-author set.
+    """
+    name_score = name_similarity(entry_a.norm_name, entry_b.norm_name)
+    smaller = min(len(entry_a.coauthors), len(entry_b.coauthors))
+    shared = len(entry_a.coauthors & entry_b.coauthors)
+    coauthor_score = shared / smaller if smaller else 0.0
+    same_affiliation = entry_a.affiliation_org_id == entry_b.affiliation_org_id
+
+    score = NAME_WEIGHT * name_score + COAUTHOR_WEIGHT * coauthor_score \
+        + AFFILIATION_WEIGHT * same_affiliation
+    if name_score == 0.0:
+        score = 0.0
+
+    keep, duplicate = sorted((entry_a.id, entry_b.id))
+    return DuplicateCandidate(keep, duplicate, round(score, 4), round(name_score, 4),
+                              round(coauthor_score, 4), same_affiliation)
+
+
+def key_values(author_id: int, name: str) -> dict:
+    """
+        Row of 'author_name_key' for the author.
+    """
+    norm_name = normalise_name(name)
+    return {"author_id": author_id, "name": name,
+            "norm_name": norm_name, "block_key": block_key(norm_name)}
+
+
+async def update_author_key(shard_session, author_id: int, name):
+    """
+        Replace the key of a created, renamed (or, with `name` None, deleted)
+        author in the transaction of the author write.
+    """
+    await shard_session.execute(
+        sqla.delete(AuthorNameKeyModel).where(AuthorNameKeyModel.author_id == author_id))
+    if name is not None:
+        await shard_session.execute(sqla.insert(AuthorNameKeyModel),
+                                    [key_values(author_id, name)])
+
+
+async def refresh_key_index(session: ShardSession) -> int:
+    """
+        Bring 'author_name_key' of every shard up to date with 'author':
+        compute keys of new and renamed authors, drop keys of deleted ones.
+        Write handlers keep keys current, this catches up with authors
+        written by other means (imports, older versions) before a search job.
+        The table is created by the schema bootstrap.
+        Returns number of (re)computed keys.
+    """
+    stale_query = sqla.select(AuthorModel.id, AuthorModel.name)\
+        .outerjoin(AuthorNameKeyModel, AuthorNameKeyModel.author_id == AuthorModel.id)\
+        .where(AuthorNameKeyModel.author_id.is_(None)
+               | (AuthorNameKeyModel.name != AuthorModel.name))
+    orphans = sqla.delete(AuthorNameKeyModel)\
+        .where(AuthorNameKeyModel.author_id.not_in(sqla.select(AuthorModel.id)))
+
+    async def refresh_shard(shard_session) -> int:
+        await shard_session.execute(orphans)
+        rows = (await shard_session.execute(stale_query)).all()
+        for start in range(0, len(rows), BATCH_SIZE):
+            values = [key_values(author_id, name)
+                      for author_id, name in rows[start:start + BATCH_SIZE]]
+            await shard_session.execute(sqla.delete(AuthorNameKeyModel).where(
+                AuthorNameKeyModel.author_id.in_([value["author_id"] for value in values])))
+            await shard_session.execute(sqla.insert(AuthorNameKeyModel), values)
+        return len(rows)
+
+    sessions = [session.on(shard) for shard in session.router.shards]
+    refreshed = await asyncio.gather(*(refresh_shard(shard_session) for shard_session in sessions))
+    await session.commit()
+    return sum(refreshed)
+
+
+async def _bindings_where_in(session: ShardSession, column, values: list) -> list:
+    """
+        (doi, author_id) bindings with `column` in `values` from all shards.
+        Values are sent in chunks to stay below SQLite variables limit.
+    """
+    bindings = []
+    for start in range(0, len(values), BATCH_SIZE):
+        query = sqla.select(ArticleModel.doi, ArticleToAuthorModel.author_id)\
+            .join(ArticleModel, ArticleModel.id == ArticleToAuthorModel.article_id)\
+            .where(column.in_(values[start:start + BATCH_SIZE]))
+        for result in await session.execute_all(query):
+            bindings.extend(result.all())
+    return bindings
+
+
+async def _load_entries(session: ShardSession, keys: list) -> dict:
+    """
+        Load authors of the blocks with their co-authors.
+        Returns {block_key: [AuthorEntry]}.
+    """
+    authors_query = sqla.select(AuthorNameKeyModel.block_key, AuthorModel.id,
+                                AuthorNameKeyModel.norm_name, AuthorModel.affiliation_org_id)\
+        .join(AuthorModel, AuthorModel.id == AuthorNameKeyModel.author_id)\
+        .where(AuthorNameKeyModel.block_key.in_(keys))
+    entries = {}
+    blocks = collections.defaultdict(list)
+    for result in await session.execute_all(authors_query):
+        for key, author_id, norm_name, org_id in result.all():
+            entries[author_id] = AuthorEntry(author_id, norm_name, org_id)
+            blocks[key].append(entries[author_id])
+
+    dois = collections.defaultdict(set)
+    for doi, author_id in await _bindings_where_in(session, ArticleToAuthorModel.author_id,
+                                                   list(entries)):
+        dois[doi].add(author_id)
+
+    article_authors = collections.defaultdict(set)
+    for doi, author_id in await _bindings_where_in(session, ArticleModel.doi,
+                                                   list(dois)):
+        article_authors[doi].add(author_id)
+
+    for doi, author_ids in dois.items():
+        for author_id in author_ids:
+            entries[author_id].coauthors |= article_authors[doi] - {author_id}
+    return blocks
+
+
+async def find_duplicates(session: ShardSession, threshold: float = DEFAULT_THRESHOLD,
+                          limit: int = 0) -> list[DuplicateCandidate]:
+    """
+        Propose duplicate pairs with score not less than `threshold`,
+        best first. Only authors sharing a block key are compared.
+        Read-only: the key index is maintained by author writes
+        and refresh_key_index().
+    """
+
+    sizes = collections.Counter()
+    sizes_query = sqla.select(AuthorNameKeyModel.block_key, sqla.func.count())\
+        .group_by(AuthorNameKeyModel.block_key)
+    for result in await session.execute_all(sizes_query):
+        for key, count in result.all():
+            sizes[key] += count
+    keys = [key for key, size in sizes.items() if 1 < size <= MAX_BLOCK_SIZE]
+
+    candidates = []
+    for start in range(0, len(keys), BATCH_SIZE):
+        blocks = await _load_entries(session, keys[start:start + BATCH_SIZE])
+        for block in blocks.values():
+            for idx, entry_a in enumerate(block):
+                for entry_b in block[idx + 1:]:
+                    candidate = score_pair(entry_a, entry_b)
+                    if candidate.score >= threshold:
+                        candidates.append(candidate)
+
+    candidates.sort(key=lambda candidate: (-candidate.score, candidate.keep_id))
+    return candidates[:limit] if limit else candidates
+
+
+def merge_plan(pairs, keep_smallest: bool = True) -> dict[int, int]:
+    """
+        Resolve (keep_id, duplicate_id) pairs transitively with union-find.
+        Proposed clusters are merged into their smallest ID; with
+        `keep_smallest` False the pairs are applied as given, the duplicate
+        (and everything merged into it) goes to the kept author.
+        Returns {duplicate_id: keep_id}.
+    """
+    parent = {}
+
+    def find(ident):
+        parent.setdefault(ident, ident)
+        while parent[ident] != ident:
+            parent[ident] = parent[parent[ident]]
+            ident = parent[ident]
+        return ident
+
+    for keep_id, duplicate_id in pairs:
+        root_a, root_b = find(keep_id), find(duplicate_id)
+        if root_a == root_b:
+            continue
+        if keep_smallest:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+        else:
+            parent[root_b] = root_a
+
+    return {ident: find(ident) for ident in list(parent) if find(ident) != ident}
+
+
+async def merge_duplicates(session: ShardSession, pairs, batch_size: int = BATCH_SIZE,
+                           keep_smallest: bool = True) -> dict:
+    """
+        Merge duplicate authors: rewrite their article bindings to the kept
+        author and delete them. Each batch is one transaction per shard.
+        `keep_smallest` is passed to merge_plan().
+        Returns counts of rewritten bindings and deleted authors.
+    """
+    plan = merge_plan(pairs, keep_smallest)
+    counts = collections.Counter()
+    binding = ArticleToAuthorModel
+
+    async def merge_batch(shard_session, batch):
+        # One binding per article and kept author survives: the kept author's own
+        # binding, else the one of the smallest duplicate ID. Others are dropped,
+        # so rewriting them would not produce equal primary keys.
+        other = aliased(binding)
+        collisions = sqla.select(other.article_id).where(
+            (other.article_id == binding.article_id)
+            & (sqla.case(batch, value=other.author_id, else_=other.author_id)
+               == sqla.case(batch, value=binding.author_id))
+            & (other.author_id.not_in(list(batch)) | (other.author_id < binding.author_id)))
+        await shard_session.execute(sqla.delete(binding).where(
+            binding.author_id.in_(list(batch)) & collisions.exists()))
+        rewritten = await shard_session.execute(
+            sqla.update(binding)
+            .where(binding.author_id.in_(list(batch)))
+            .values(author_id=sqla.case(batch, value=binding.author_id))
+        )
+        deleted = await shard_session.execute(
+            sqla.delete(AuthorModel).where(AuthorModel.id.in_(list(batch))))
+        await shard_session.execute(
+            sqla.delete(AuthorNameKeyModel).where(AuthorNameKeyModel.author_id.in_(list(batch))))
+        await shard_session.commit()
+        return rewritten.rowcount, deleted.rowcount
+
+    items = list(plan.items())
+    sessions = [session.on(shard) for shard in session.router.shards]
+    for start in range(0, len(items), batch_size):
+        batch = dict(items[start:start + batch_size])
+        for rewritten, deleted in await asyncio.gather(
+                *(merge_batch(shard_session, batch) for shard_session in sessions)):
+            counts["bindings_rewritten"] += rewritten
+            counts["authors_deleted"] += deleted
+    return dict(counts)
+
+
+async def main():
+    """
+        Batch job: propose duplicates and optionally merge them.
+    """
+    parser = argparse.ArgumentParser(description="Find and merge duplicate authors.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--apply", action="store_true", help="merge proposed duplicates")
+    args = parser.parse_args()
+
+    router = ShardRouter.from_config(
+        config.DB_SHARDS, config.DB_SHARD_PREFIXES, config.DB_SHARD_DEFAULT
+    )
+    try:
+        await asyncio.gather(*(startup.bootstrap_schema(shard.engine, BaseModel.metadata)
+                               for shard in router.shards))
+        async with router.session() as session:
+            await refresh_key_index(session)
+            candidates = await find_duplicates(session, args.threshold)
+            for candidate in candidates:
+                print(f"{candidate.duplicate_id} -> {candidate.keep_id}: {candidate.score}")
+            if args.apply:
+                pairs = [(candidate.keep_id, candidate.duplicate_id) for candidate in candidates]
+                print(await merge_duplicates(session, pairs))
+    finally:
+        await router.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
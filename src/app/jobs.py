@@ -0,0 +1,418 @@
+"""
+    Background jobs of the Web service 'Article Gate': long running catalogue
+    operations run as asyncio tasks, their CPU-bound parts in a bounded
+    process pool. Job state is persisted in a SQLite database, progress is
+    written in batches at most once per flush interval.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+
+import sqlalchemy as sqla
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from . import startup
+from .models.job import JobBaseModel, JobModel
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """
+        Raised inside a job, which was asked to stop.
+    """
+
+
+class JobContext:
+    """
+        Interface of a running job to the runner: progress reports,
+        cancellation checks and CPU-bound work offloading.
+    """
+
+    def __init__(self, runner: "JobRunner", job_id: str):
+        self.runner = runner
+        self.job_id = job_id
+        self.progress = 0.0
+        self.message = ""
+        self.cancel_requested = False
+        self.dirty = False
+
+    def report(self, progress: float, message: str = ""):
+        """
+            Report progress from 0 to 1. Kept in memory and
+            persisted by the runner at most once per flush interval.
+        """
+        self.progress = min(1.0, max(0.0, progress))
+        self.message = message
+        self.dirty = True
+
+    async def throttle(self, busy: float):
+        """
+            Pause after `busy` seconds of catalogue work, so the job uses
+            at most the runner duty cycle of DB time. Also a cancellation point.
+        """
+        self.check_cancelled()
+        duty = self.runner.duty_cycle
+        if 0.0 < duty < 1.0:
+            await asyncio.sleep(busy * (1.0 - duty) / duty)
+        else:
+            await asyncio.sleep(0)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        """
+            Stop the job if cancellation was requested.
+        """
+        if self.cancel_requested:
+            raise JobCancelled(self.job_id)
+
+    async def run_cpu(self, func, *args, **kwargs):
+        """
+            Run picklable `func` in the process pool.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self.runner.process_pool()
+        try:
+            return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+        except BrokenProcessPool:
+            # A pool process died: the pool is unusable, the next call
+            # gets a new one. Only jobs with work in the pool fail.
+            self.runner.reset_pool(pool)
+            raise
+
+
+def job_to_dict(job: JobModel) -> dict:
+    """
+        Public representation of the job.
+    """
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "params": json.loads(job.params),
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "result": json.loads(job.result) if job.result is not None else None,
+        "error": job.error,
+        "cancel_requested": job.cancel_requested,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class JobRunner:
+    """
+        Runs registered job kinds. At most `max_running` jobs of this process
+        run at once, others wait in the queue. Job state writes are batched
+        per `flush_interval`, job catalogue work is paced by `duty_cycle`.
+        Jobs of a dead process are claimed by a live one after `stale_after`
+        seconds without heartbeat and restarted (or failed, if their kind
+        is not restartable).
+    """
+
+    def __init__(self, db_url: str, *, max_running: int = 2, process_workers: int = 2,
+                 flush_interval: float = 1.0, stale_after: float = 30.0,
+                 duty_cycle: float = 0.5, max_attempts: int = 3):
+        self.engine = create_async_engine(db_url)
+        self.make_session = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.max_running = max_running
+        self.process_workers = process_workers
+        self.flush_interval = flush_interval
+        self.stale_after = stale_after
+        self.duty_cycle = duty_cycle
+        self.max_attempts = max_attempts
+
+        self.kinds = {}
+        self._tasks = {}
+        self._contexts = {}
+        self._slots = None
+        self._pool = None
+        self._supervisor = None
+        self._stopping = False
+
+    def register(self, kind: str, func, restartable: bool = True):
+        """
+            Register job kind: `func(context, **params)` coroutine function.
+            Restartable jobs are idempotent and rerun after a crash.
+        """
+        self.kinds[kind] = (func, restartable)
+
+    def process_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        """
+            Process pool for CPU-bound work, created on first use.
+        """
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def reset_pool(self, pool: concurrent.futures.ProcessPoolExecutor):
+        """
+            Shut down broken process pool `pool`, if it is still the current one.
+        """
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def running(self) -> int:
+        """
+            Number of jobs running in this process.
+        """
+        return len(self._contexts)
+
+    async def start(self):
+        """
+            Prepare jobs database and start supervising.
+        """
+        self._stopping = False
+        self._slots = asyncio.Semaphore(self.max_running)
+        await startup.bootstrap_schema(self.engine, JobBaseModel.metadata)
+        await self.recover()
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        """
+            Stop supervising and running jobs. Interrupted jobs keep
+            their state and are recovered by another (or restarted) process.
+        """
+        self._stopping = True
+        tasks = list(self._tasks.values())
+        if self._supervisor is not None:
+            tasks.append(self._supervisor)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._supervisor = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        await self.engine.dispose()
+
+    async def submit(self, kind: str, params: dict) -> dict:
+        """
+            Create a queued job and schedule it in this process.
+            Raises KeyError for unknown kind, TypeError for wrong parameters.
+        """
+        func, _ = self.kinds[kind]
+        inspect.signature(func).bind(None, **params)
+        job = JobModel(
+            id=uuid.uuid4().hex, kind=kind, params=json.dumps(params), status=QUEUED,
+            progress=0.0, message="", owner=self.owner, cancel_requested=False,
+            attempts=0, created_at=time.time(), heartbeat_at=time.time(),
+        )
+        async with self.make_session() as session:
+            session.add(job)
+            await session.commit()
+        self._schedule(job.id, kind, params)
+        return job_to_dict(job)
+
+    async def get(self, job_id: str):
+        """
+            Job state or None. Progress of local jobs is taken from memory.
+        """
+        async with self.make_session() as session:
+            job = await session.get(JobModel, job_id)
+        if job is None:
+            return None
+        state = job_to_dict(job)
+        context = self._contexts.get(job_id)
+        if context is not None and state["status"] in ACTIVE_STATUSES:
+            state["progress"], state["message"] = context.progress, context.message
+        return state
+
+    async def cancel(self, job_id: str):
+        """
+            Request job cancellation. Queued jobs are cancelled at once,
+            running jobs of other processes stop at their next flush.
+        """
+        async with self.make_session() as session:
+            job = await session.get(JobModel, job_id)
+            if job is None:
+                return None
+            if job.status in ACTIVE_STATUSES:
+                job.cancel_requested = True
+                await session.commit()
+
+        context = self._contexts.get(job_id)
+        if context is not None:
+            context.cancel_requested = True
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return await self.get(job_id)
+
+    def _schedule(self, job_id: str, kind: str, params: dict):
+        task = asyncio.create_task(self._run(job_id, kind, params))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _finish(self, job_id: str, status: str, **fields):
+        async with self.make_session() as session:
+            await session.execute(
+                sqla.update(JobModel).where(JobModel.id == job_id)
+                .values(status=status, finished_at=time.time(), heartbeat_at=time.time(),
+                        **fields)
+            )
+            await session.commit()
+
+    async def _run(self, job_id: str, kind: str, params: dict):
+        """
+            Wait for a free slot, then run the job and persist its outcome.
+        """
+        func, _ = self.kinds[kind]
+        context = JobContext(self, job_id)
+        try:
+            async with self._slots:
+                async with self.make_session() as session:
+                    job = await session.get(JobModel, job_id)
+                    if job.cancel_requested:
+                        raise JobCancelled(job_id)
+                    job.status, job.started_at = RUNNING, time.time()
+                    job.attempts += 1
+                    await session.commit()
+
+                self._contexts[job_id] = context
+                result = await func(context, **params)
+            await self._finish(job_id, SUCCEEDED, progress=1.0, message=context.message,
+                               result=json.dumps(result))
+        except (JobCancelled, asyncio.CancelledError):
+            if self._stopping:
+                raise
+            await self._finish(job_id, CANCELLED, progress=context.progress,
+                               message=context.message)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            await self._finish(job_id, FAILED, progress=context.progress,
+                               message=context.message, error=repr(exc))
+        finally:
+            self._contexts.pop(job_id, None)
+
+    async def flush(self):
+        """
+            Persist progress and heartbeat of local jobs in one transaction
+            and pick up cancellation requested by other processes.
+        """
+        now = time.time()
+        async with self.make_session() as session:
+            for job_id, context in list(self._contexts.items()):
+                if context.dirty:
+                    context.dirty = False
+                    await session.execute(
+                        sqla.update(JobModel)
+                        .where((JobModel.id == job_id) & JobModel.status.in_(ACTIVE_STATUSES))
+                        .values(progress=context.progress, message=context.message)
+                    )
+            await session.execute(
+                sqla.update(JobModel)
+                .where((JobModel.owner == self.owner) & JobModel.status.in_(ACTIVE_STATUSES))
+                .values(heartbeat_at=now)
+            )
+            cancelled = await session.execute(
+                sqla.select(JobModel.id)
+                .where((JobModel.owner == self.owner) & JobModel.cancel_requested
+                       & JobModel.status.in_(ACTIVE_STATUSES))
+            )
+            await session.commit()
+
+        for job_id in cancelled.scalars().all():
+            context = self._contexts.get(job_id)
+            if context is not None and not context.cancel_requested:
+                context.cancel_requested = True
+                task = self._tasks.get(job_id)
+                if task is not None:
+                    task.cancel()
+
+    async def recover(self):
+        """
+            Claim active jobs of processes without heartbeat for `stale_after`
+            seconds and reschedule them here.
+        """
+        stale = time.time() - self.stale_after
+        async with self.make_session() as session:
+            orphans = (await session.execute(
+                sqla.select(JobModel)
+                .where(JobModel.status.in_(ACTIVE_STATUSES)
+                       & (JobModel.owner != self.owner)
+                       & (JobModel.heartbeat_at < stale))
+            )).scalars().all()
+
+            claimed = []
+            for job in orphans:
+                # Conditional update: only one process wins the claim.
+                result = await session.execute(
+                    sqla.update(JobModel)
+                    .where((JobModel.id == job.id) & (JobModel.owner == job.owner)
+                           & (JobModel.heartbeat_at == job.heartbeat_at))
+                    .values(owner=self.owner, heartbeat_at=time.time())
+                )
+                if result.rowcount == 1:
+                    claimed.append(job)
+            await session.commit()
+
+        for job in claimed:
+            _, restartable = self.kinds.get(job.kind, (None, False))
+            if job.cancel_requested:
+                await self._finish(job.id, CANCELLED)
+            elif not restartable or job.attempts >= self.max_attempts:
+                await self._finish(job.id, FAILED, error="Interrupted by process restart")
+            else:
+                await self._reset(job.id)
+                self._schedule(job.id, job.kind, json.loads(job.params))
+
+    async def _reset(self, job_id: str):
+        async with self.make_session() as session:
+            await session.execute(
+                sqla.update(JobModel).where(JobModel.id == job_id)
+                .values(status=QUEUED, progress=0.0, message="Restarted")
+            )
+            await session.commit()
+
+    async def _supervise(self):
+        """
+            Flush progress every `flush_interval`, recover orphans every `stale_after`.
+        """
+        last_recovery = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - last_recovery >= self.stale_after:
+                    last_recovery = time.monotonic()
+                    await self.recover()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Jobs supervisor iteration failed")
+
+    def snapshot(self) -> dict:
+        """
+            Current state for the metrics endpoint.
+        """
+        return {
+            "running": self.running,
+            "scheduled": len(self._tasks),
+            "max_running": self.max_running,
+            "kinds": sorted(self.kinds),
+        }
@@ -3,6 +3,10 @@
     of the Web service 'Article Gate'.
 """
 
+import asyncio
+import json
+import os
+import time
 from typing import Annotated
 from contextlib import asynccontextmanager
 
@@ -10,16 +14,12 @@ from authx import AuthX, AuthXConfig
 from fastapi import FastAPI, Depends, HTTPException, Response
 from fastapi.security import OAuth2PasswordRequestForm
 import sqlalchemy as sqla
-from sqlalchemy.ext.asyncio import(
-    create_async_engine,
-    async_sessionmaker,
-    AsyncSession,
-)
 from .models.base import BaseModel
 from .models.article import ArticleModel
 from .models.author import AuthorModel
 from .models.organisation import OrganisationModel
 from .models.article_to_author import ArticleToAuthorModel
+from .models.author_name_key import AuthorNameKeyModel  # pylint: disable=unused-import
 from .schemas import (
     AuthorIdSchema,
     ArticleDOISchema,
@@ -29,15 +29,144 @@ from .schemas import (
     OrganisationFullSchema,
     AuthorFullSchema,
     ArticleToAuthorFullSchema,
+    AuthorMergeSchema,
+    DuplicateSearchSchema,
+    SimilarArticlesSchema,
+    JobSubmitSchema,
+    ProjectionSchema,
+    AnalyticsQuerySchema,
+)
+from .admission import AdmissionController, AdmissionMiddleware
+from .singleflight import SingleFlight
+from .compression import CompressionMiddleware
+from .access_log import AccessLogRecorder, AccessLogMiddleware
+from .sharding import ShardRouter, ShardSession
+from .recommend import SimilarArticles
+from .jobs import JobRunner
+from .backup import BackupScheduler
+from . import analytics, app_admin, backup, config, dedup, migrate_keys, projection, startup
+
+
+# General objects: application and DB shards router,
+# that are required for the application processing.
+shard_router = ShardRouter.from_config(
+    config.DB_SHARDS,
+    config.DB_SHARD_PREFIXES,
+    config.DB_SHARD_DEFAULT,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
 )
-from . import app_admin
+db_engine = shard_router.default.engine
 
 
-# General objects: application and DB engine/session maker,
-# that are required for the application processing.
-db_engine = create_async_engine("sqlite+aiosqlite:///app/article_gate.sqlite3")
-new_session = async_sessionmaker(db_engine, expire_on_commit=False)
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+        Prepare DB on application start up: create schema if its version
+        marker is outdated, warm up the connection pool and start
+        the background jobs runner and snapshots schedules.
+    """
+    shards = shard_router.shards
+    # Databases still keyed by DOI are migrated before the schema bootstrap.
+    await asyncio.gather(*(migrate_keys.migrate(shard.engine) for shard in shards))
+    await asyncio.gather(*(
+        startup.bootstrap_schema(shard.engine, BaseModel.metadata) for shard in shards
+    ))
+    if config.STARTUP_WARM_UP:
+        tables = BaseModel.metadata.sorted_tables
+        await asyncio.gather(
+            startup.warm_up(shard_router.session, WARM_UP_READS, config.DB_POOL_SIZE),
+            *(startup.prewarm_tables(shard.make_session, tables) for shard in shards),
+        )
+    await analytics_snapshot.remove_unscheduled_capture()
+    await job_runner.start()
+    backup_scheduler.start()
+    analytics_snapshot.start()
+    yield
+    await analytics_snapshot.stop()
+    await backup_scheduler.stop()
+    await job_runner.stop()
+    if access_log is not None:
+        await access_log.flush()
+    await shard_router.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Admission control: shed load with 429/503 instead of
+# queueing requests in front of the DB connection pool.
+admission = AdmissionController(
+    max_inflight=config.ADMISSION_MAX_INFLIGHT,
+    max_queue=config.ADMISSION_MAX_QUEUE,
+    queue_timeout=config.ADMISSION_QUEUE_TIMEOUT,
+    client_rate=config.ADMISSION_CLIENT_RATE,
+    client_burst=config.ADMISSION_CLIENT_BURST,
+    route_rate=config.ADMISSION_ROUTE_RATE,
+    route_burst=config.ADMISSION_ROUTE_BURST,
+    max_clients=config.ADMISSION_MAX_CLIENTS,
+    max_routes=config.ADMISSION_MAX_ROUTES,
+)
+if config.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission,
+        exempt_paths=("/", "/metrics", "/docs", "/redoc", "/openapi.json"),
+        router=app.router,
+    )
+
+# Sampled access log for traffic replay, app/replay.py. Outside admission
+# control, so requests rejected with 429/503 are recorded too.
+access_log = None
+if config.ACCESS_LOG_PATH:
+    access_log = AccessLogRecorder(
+        config.ACCESS_LOG_PATH,
+        sample_rate=config.ACCESS_LOG_SAMPLE,
+        buffer_size=config.ACCESS_LOG_BUFFER,
+    )
+    app.add_middleware(
+        AccessLogMiddleware,
+        recorder=access_log,
+        exempt_paths=("/auth", "/metrics", "/docs", "/redoc", "/openapi.json"),
+    )
+
+# Compression of large (list) responses. Added last to be the outermost
+# middleware, so every response including rejected ones passes it.
+if config.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=config.COMPRESSION_ENCODINGS,
+        minimum_size=config.COMPRESSION_MINIMUM_SIZE,
+    )
+
+# Concurrent identical read requests share one DB fetch.
+read_flight = SingleFlight(enabled=config.SINGLE_FLIGHT_ENABLED)
+
+# Similar articles index of this worker, built on the first request.
+similar_articles = SimilarArticles(max_age=config.RECOMMEND_MAX_AGE,
+                                   check_interval=config.RECOMMEND_CHECK_INTERVAL)
+
+# Background jobs: long operations run outside request handlers.
+job_runner = JobRunner(
+    config.JOBS_DB_URL,
+    max_running=config.JOBS_MAX_RUNNING,
+    process_workers=config.JOBS_PROCESS_WORKERS,
+    flush_interval=config.JOBS_FLUSH_INTERVAL,
+    stale_after=config.JOBS_STALE_AFTER,
+    duty_cycle=config.JOBS_DUTY_CYCLE,
+)
+
+# Scheduled online snapshots of the shards.
+backup_scheduler = BackupScheduler(
+    shard_router,
+    config.BACKUP_DIR,
+    interval=config.BACKUP_INTERVAL,
+    keep=config.BACKUP_KEEP,
+    pages=config.BACKUP_PAGES,
+    pause=config.BACKUP_PAUSE,
+)
+
+# Parquet snapshot of the catalogue for analytics queries, refreshed on schedule.
+analytics_snapshot = analytics.make_snapshot(shard_router)
 
 # Security config for authentification and access cookie
 ACCESS_COOKIE_NAME = app_admin.ACCESS_COOKIE
@@ -50,28 +179,17 @@ security_config.JWT_CSRF_METHODS = []
 security = AuthX(config=security_config)
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """
-        Prepare DB on application start up
-    """
-    async with db_engine.begin() as conn:
-        await conn.run_sync(BaseModel.metadata.create_all)
-    yield
-    return
-
-
 async def make_new_session():
     """
-        Asynchronously get new session to DB.
+        Asynchronously get new session to DB shards.
     """
-    async with new_session() as session:
+    async with shard_router.session() as session:
         yield session
 
 
 # Dependency injection of make_new_session to avoid
 # its explicit calls in handlers.
-SessionDep = Annotated[AsyncSession, Depends(make_new_session)]
+SessionDep = Annotated[ShardSession, Depends(make_new_session)]
 
 # Security access token dependency
 AccessDeps = [Depends(security.access_token_required)]
@@ -88,72 +206,273 @@ async def root():
     return {"ServiceInfo": welcome_msg}
 
 
+@app.get("/metrics", tags=["service"])
+async def metrics():
+    """
+        Handler for service state metrics.
+    """
+
+    return {
+        "admission": admission.snapshot(),
+        "single_flight": read_flight.snapshot(),
+        "similar_articles": similar_articles.snapshot(),
+        "jobs": job_runner.snapshot(),
+        "backup": backup_scheduler.snapshot(),
+        "analytics": analytics_snapshot.snapshot(),
+        "access_log": access_log.snapshot() if access_log is not None else None,
+    }
+
+
+async def read_author(session: ShardSession, author_id: int):
+    """
+        Read author by ID.
+    """
+
+    query = sqla.select(AuthorModel).where(AuthorModel.id == author_id)
+    return await session.first(query)
+
+
+# Public fields of articles and bindings: bindings are stored with the integer
+# article key, but are shown with the article DOI.
+ARTICLE_FIELDS = (ArticleModel.doi, ArticleModel.title, ArticleModel.posting_date)
+BINDING_FIELDS = (ArticleModel.doi, ArticleToAuthorModel.author_id, ArticleToAuthorModel.place)
+
+
+def article_id_of(doi: str):
+    """
+        Scalar subquery of the article key by DOI.
+    """
+
+    return sqla.select(ArticleModel.id).where(ArticleModel.doi == doi).scalar_subquery()
+
+
+def select_bindings():
+    """
+        Bindings query with article DOI.
+    """
+
+    return sqla.select(*BINDING_FIELDS)\
+        .join(ArticleModel, ArticleModel.id == ArticleToAuthorModel.article_id)
+
+
+async def read_article(session: ShardSession, doi: str):
+    """
+        Read article by DOI.
+    """
+
+    query = sqla.select(*ARTICLE_FIELDS).where(ArticleModel.doi == doi)
+    results = await session.for_doi(doi).execute(query)
+    row = results.first()
+    return row._asdict() if row is not None else None
+
+
+async def read_articles_by_author(session: ShardSession, author_id: int):
+    """
+        Read article to author bindings by author ID.
+    """
+
+    query = select_bindings().where(ArticleToAuthorModel.author_id == author_id)
+    return [row._asdict() for row in await session.all_rows(query)]
+
+
+async def read_authors_of_article(session: ShardSession, doi: str):
+    """
+        Read article to author bindings by article DOI
+        together with authors information.
+        Authors may be stored on any shard, so they are fetched
+        by one fan-out query.
+    """
+
+    general_query = select_bindings()\
+        .where(ArticleModel.doi == doi)\
+        .order_by(ArticleToAuthorModel.place.asc())
+
+    results = await session.for_doi(doi).execute(general_query)
+    results = results.all()
+
+    author_ids = {elem.author_id for elem in results}
+    authors_query = sqla.select(AuthorModel).where(AuthorModel.id.in_(author_ids))
+    authors = {author.id: author for author in await session.all_scalars(authors_query)}
+
+    return [dict(elem._asdict(), author_info=authors.get(elem.author_id)) for elem in results]
+
+
+async def read_org(session: ShardSession, org_id: int):
+    """
+        Read organisation by ID.
+    """
+
+    query = sqla.select(OrganisationModel).where(OrganisationModel.id == org_id)
+    return await session.first(query)
+
+
+async def read_projection(session: ShardSession, resource: str, field: str, value,
+                          fields: str, include: str):
+    """
+        Read `resource` objects with `field` equal to `value` in the requested
+        shape: selected fields with nested includes, see app/projection.py.
+    """
+
+    selection = projection.parse_selection(resource, fields, include)
+    shard_session = session.for_doi(value) if field == "doi" else None
+    return await projection.Fetcher(session).fetch(
+        selection, projection.field_equals(resource, field, value), shard_session)
+
+
+async def projected_read(resource: str, field: str, value, shape: ProjectionSchema,
+                         many: bool = False):
+    """
+        Coalesced read of the requested shape, 406 for unknown fields.
+    """
+
+    try:
+        projection.parse_selection(resource, shape.fields, shape.include)
+    except ValueError as exc:
+        raise HTTPException(status_code=406, detail=str(exc)) from exc
+    objects = await coalesced_read(read_projection, resource, field, value,
+                                   shape.fields, shape.include)
+    if many:
+        return objects
+    return objects[0] if objects else None
+
+
+async def coalesced_read(read_func, *args):
+    """
+        Run read_func(session, *args) once for all concurrent
+        identical requests. Shared call uses its own session,
+        so it does not depend on the lifetime of any single request.
+    """
+
+    async def run():
+        async with shard_router.session() as session:
+            return await read_func(session, *args)
+
+    return await read_flight.do((read_func.__name__, *args), run)
+
+
+async def load_similarity_data():
+    """
+        Read all articles titles and authors for the similar articles index.
+    """
+
+    async with shard_router.session() as session:
+        articles = await session.all_rows(sqla.select(ArticleModel.doi, ArticleModel.title))
+        bindings = await session.all_rows(
+            sqla.select(ArticleModel.doi, ArticleToAuthorModel.author_id)
+            .join(ArticleModel, ArticleModel.id == ArticleToAuthorModel.article_id))
+    return articles, bindings
+
+
+async def similarity_data_version() -> tuple:
+    """
+        Cheap version of the similar articles data: counts and sums over
+        articles and bindings of every shard. Changes with added, deleted
+        and renamed articles and with re-keyed bindings (author merges).
+    """
+
+    async with shard_router.session() as session:
+        articles = await session.all_rows(sqla.select(
+            sqla.func.count(), sqla.func.max(ArticleModel.id),
+            sqla.func.sum(sqla.func.length(ArticleModel.title))))
+        bindings = await session.all_rows(sqla.select(
+            sqla.func.count(), sqla.func.sum(ArticleToAuthorModel.author_id),
+            sqla.func.sum(ArticleToAuthorModel.article_id * ArticleToAuthorModel.author_id)))
+    return tuple(tuple(row) for row in articles + bindings)
+
+
+async def refresh_similar(session: ShardSession, doi: str):
+    """
+        Pass committed changes of article `doi` to the similar articles index.
+    """
+
+    if similar_articles.index is None and not similar_articles.building:
+        return
+    shard_session = session.for_doi(doi)
+    article = await read_article(session, doi)
+    query = sqla.select(ArticleToAuthorModel.author_id)\
+        .where(ArticleToAuthorModel.article_id == article_id_of(doi))
+    author_ids = (await shard_session.execute(query)).scalars().all()
+    similar_articles.update(doi, article["title"] if article is not None else None, author_ids)
+
+
+# Hot read statements, executed on every pooled connection at start up.
+WARM_UP_READS = [
+    (read_author, 0),
+    (read_article, ""),
+    (read_articles_by_author, 0),
+    (read_authors_of_article, ""),
+    (read_org, 0),
+]
+
+
 @app.get("/author", tags=["retrieve data"])
-async def get_author(data: Annotated[AuthorIdSchema, Depends()], session: SessionDep):
+async def get_author(data: Annotated[AuthorIdSchema, Depends()],
+                     shape: Annotated[ProjectionSchema, Depends()]):
     """
         Handler for author information requests.
     """
 
-    query = sqla.select(AuthorModel).where(AuthorModel.id == data.id)
-    results = await session.execute(query)
-    return results.scalar()
+    if shape.fields or shape.include:
+        return await projected_read("author", "id", data.id, shape)
+    return await coalesced_read(read_author, data.id)
 
 
 @app.get("/article", tags=["retrieve data"])
-async def get_article(data: Annotated[ArticleDOISchema, Depends()], session: SessionDep):
+async def get_article(data: Annotated[ArticleDOISchema, Depends()],
+                      shape: Annotated[ProjectionSchema, Depends()]):
     """
         Handler for article information requests.
     """
 
-    query = sqla.select(ArticleModel).where(ArticleModel.doi == data.doi)
-    results = await session.execute(query)
-    return results.scalar()
+    if shape.fields or shape.include:
+        return await projected_read("article", "doi", data.doi, shape)
+    return await coalesced_read(read_article, data.doi)
+
+
+@app.get("/article/similar", tags=["retrieve data"])
+async def get_similar_articles(data: Annotated[SimilarArticlesSchema, Depends()]):
+    """
+        Handler for similar articles by title words and shared authors.
+    """
+
+    index = await similar_articles.get_index(load_similarity_data, similarity_data_version)
+    return index.similar(data.doi, data.k)
 
 
 @app.get("/articles_by_author", tags=["retrieve data"])
-async def get_article_by_author(data: Annotated[AuthorIdSchema, Depends()], session: SessionDep):
+async def get_article_by_author(data: Annotated[AuthorIdSchema, Depends()],
+                                shape: Annotated[ProjectionSchema, Depends()]):
     """
         Handler for articles list by author ID.
     """
 
-    query = sqla.select(ArticleToAuthorModel).where(ArticleToAuthorModel.author_id == data.id)
-    results = await session.execute(query)
-    return results.scalars().all()
+    if shape.fields or shape.include:
+        return await projected_read("binding", "author_id", data.id, shape, many=True)
+    return await coalesced_read(read_articles_by_author, data.id)
 
 
 @app.get("/authors_of_article", tags=["retrieve data"])
-async def get_authors_of_article(data: Annotated[ArticleDOISchema, Depends()], session: SessionDep):
+async def get_authors_of_article(data: Annotated[ArticleDOISchema, Depends()],
+                                 shape: Annotated[ProjectionSchema, Depends()]):
     """
         Handler for authors list by article DOI.
     """
 
-    general_query = sqla.select(ArticleToAuthorModel)\
-        .where(ArticleToAuthorModel.doi == data.doi)\
-        .order_by(ArticleToAuthorModel.place.asc())
-
-    results = await session.execute(general_query)
-    results = results.scalars().all()
-
-    for idx, elem in enumerate(results):
-        author_id = elem.author_id
-        author_query = sqla.select(AuthorModel).where(AuthorModel.id == author_id)
-        author_result = await session.execute(author_query)
-
-        results[idx] = elem.__dict__
-        results[idx]["author_info"] = author_result.scalar_one_or_none()
-
-    return results
+    if shape.fields or shape.include:
+        return await projected_read("binding", "doi", data.doi, shape, many=True)
+    return await coalesced_read(read_authors_of_article, data.doi)
 
 
 @app.get("/org", tags=["retrieve data"])
-async def get_org(data: Annotated[OrganisationIdSchema, Depends()], session: SessionDep):
+async def get_org(data: Annotated[OrganisationIdSchema, Depends()],
+                  shape: Annotated[ProjectionSchema, Depends()]):
     """
         Handler for organisation information requests.
     """
 
-    query = sqla.select(OrganisationModel).where(OrganisationModel.id == data.id)
-    results = await session.execute(query)
-    return results.scalar()
+    if shape.fields or shape.include:
+        return await projected_read("organisation", "id", data.id, shape)
+    return await coalesced_read(read_org, data.id)
 
 
 @app.post("/auth", tags=["auth"])
@@ -180,17 +499,16 @@ async def delete_org(data: Annotated[OrganisationIdSchema, Depends()], session:
         Failes if any auther is affilated with requested organisation.
     """
 
-    check_query = sqla.select(AuthorModel).where(AuthorModel.affiliation_org_id == data.id)
-    check_results = await session.execute(check_query)
-    if len(check_results.scalars().all()) != 0:
+    check_query = sqla.select(AuthorModel.id).where(AuthorModel.affiliation_org_id == data.id)
+    if await session.first(check_query) is not None:
         msg = f"Cant delete organisation with ID {data.id}, because of affiliated authors"
         raise HTTPException(status_code=406, detail=msg)
 
     query = sqla.delete(OrganisationModel).where(OrganisationModel.id == data.id)
-    results = await session.execute(query)
+    results = await session.execute_all(query)
     await session.commit()
 
-    if results.rowcount == 0:
+    if sum(result.rowcount for result in results) == 0:
         msg = f"Required organisation ID {data.id} was not found"
         raise HTTPException(status_code=404, detail=msg)
     return f"Organisation with ID {data.id} was deleted"
@@ -203,13 +521,15 @@ async def delete_binding(data: Annotated[ArticleAuthorBindingSchema, Depends()],
     """
 
     query = sqla.delete(ArticleToAuthorModel)\
-        .where((ArticleToAuthorModel.doi == data.doi) & (ArticleToAuthorModel.place == data.place))
-    results = await session.execute(query)
+        .where((ArticleToAuthorModel.article_id == article_id_of(data.doi))
+               & (ArticleToAuthorModel.place == data.place))
+    results = await session.for_doi(data.doi).execute(query)
     await session.commit()
 
     if results.rowcount == 0:
         msg = f"Author-binding of article {data.doi} and place {data.place} was not found"
         raise HTTPException(status_code=404, detail=msg)
+    await refresh_similar(session, data.doi)
     return f"Author-binding of article {data.doi} and place {data.place} was deleted"
 
 
@@ -219,17 +539,18 @@ async def delete_author(data: Annotated[AuthorIdSchema, Depends()], session: Ses
         Delete author handler.
     """
 
-    check_query = sqla.select(ArticleToAuthorModel).where(ArticleToAuthorModel.author_id == data.id)
-    check_results = await session.execute(check_query)
-    if len(check_results.scalars().all()) != 0:
+    check_query = sqla.select(ArticleToAuthorModel.article_id)\
+        .where(ArticleToAuthorModel.author_id == data.id)
+    if await session.first(check_query) is not None:
         msg = f"Cant delete author with ID {data.id}, because of existing article to author binding"
         raise HTTPException(status_code=406, detail=msg)
 
     query = sqla.delete(AuthorModel).where(AuthorModel.id == data.id)
-    results = await session.execute(query)
+    results = await session.execute_all(query)
+    await dedup.update_author_key(session.for_id(data.id), data.id, None)
     await session.commit()
 
-    if results.rowcount == 0:
+    if sum(result.rowcount for result in results) == 0:
         msg = f"Required author with ID {data.id} was not found"
         raise HTTPException(status_code=404, detail=msg)
     return f"Required author with ID {data.id} was deleted"
@@ -241,19 +562,22 @@ async def delete_article(data: Annotated[ArticleDOISchema, Depends()], session:
         Delete article handler.
     """
 
-    check_query = sqla.select(ArticleToAuthorModel).where(ArticleToAuthorModel.doi == data.doi)
-    check_results = await session.execute(check_query)
+    shard_session = session.for_doi(data.doi)
+    check_query = sqla.select(ArticleToAuthorModel)\
+        .where(ArticleToAuthorModel.article_id == article_id_of(data.doi))
+    check_results = await shard_session.execute(check_query)
     if len(check_results.scalars().all()) != 0:
         msg = "Cant delete article DOI {data.doi}, because of existing article to author binding"
         raise HTTPException(status_code=406, detail=msg)
 
     query = sqla.delete(ArticleModel).where(ArticleModel.doi == data.doi)
-    results = await session.execute(query)
+    results = await shard_session.execute(query)
     await session.commit()
 
     if results.rowcount == 0:
         msg = f"Required article DOI {data.doi} was not found"
         raise HTTPException(status_code=404, detail=msg)
+    await refresh_similar(session, data.doi)
     return f"Required article DOI {data.doi} was deleted"
 
 
@@ -263,15 +587,17 @@ async def create_article(data: Annotated[ArticleFullSchema, Depends()], session:
         Create new article handler.
     """
 
+    shard_session = session.for_doi(data.doi)
     check_query = sqla.select(ArticleModel).where(ArticleModel.doi == data.doi)
-    check_results = await session.execute(check_query)
+    check_results = await shard_session.execute(check_query)
     if len(check_results.scalars().all()) != 0:
         msg = f"Cant create article with existing DOI {data.doi}"
         raise HTTPException(status_code=406, detail=msg)
 
     new_article = ArticleModel(doi=data.doi, title=data.title, posting_date=data.posting_date)
-    session.add(new_article)
+    shard_session.add(new_article)
     await session.commit()
+    await refresh_similar(session, data.doi)
     return f"Article DOI {data.doi} was added"
 
 
@@ -282,13 +608,12 @@ async def create_org(data: Annotated[OrganisationFullSchema, Depends()], session
     """
 
     check_query = sqla.select(OrganisationModel).where(OrganisationModel.id == data.id)
-    check_results = await session.execute(check_query)
-    if len(check_results.scalars().all()) != 0:
+    if await session.first(check_query) is not None:
         msg = f"Cant create organisation with existing ID {data.id}"
         raise HTTPException(status_code=406, detail=msg)
 
     new_org = OrganisationModel(id=data.id, title=data.title, location=data.location)
-    session.add(new_org)
+    session.for_id(data.id).add(new_org)
     await session.commit()
     return f"Organisation with ID {data.id} was added"
 
@@ -300,19 +625,18 @@ async def create_author(data: Annotated[AuthorFullSchema, Depends()], session: S
     """
 
     check_query = sqla.select(AuthorModel).where(AuthorModel.id == data.id)
-    check_results = await session.execute(check_query)
-    if len(check_results.scalars().all()) != 0:
+    if await session.first(check_query) is not None:
         raise HTTPException(status_code=406, detail=f"Cant add author with existing ID {data.id}")
 
     check_query2 = sqla.select(OrganisationModel)\
         .where(OrganisationModel.id == data.affiliation_org_id)
-    check_results = await session.execute(check_query2)
-    if len(check_results.scalars().all()) == 0:
+    if await session.first(check_query2) is None:
         msg = f"Cant add author with not existing affiliation ID {data.affiliation_org_id}"
         raise HTTPException(status_code=406, detail=msg)
 
     new_author = AuthorModel(id=data.id, name=data.name, affiliation_org_id=data.affiliation_org_id)
-    session.add(new_author)
+    session.for_id(data.id).add(new_author)
+    await dedup.update_author_key(session.for_id(data.id), data.id, data.name)
     await session.commit()
     return f"Author with ID {data.id} was added"
 
@@ -326,18 +650,20 @@ async def create_article_to_author(
     """
 
     check_query = sqla.select(AuthorModel).where(AuthorModel.id == data.author_id)
-    check_results = await session.execute(check_query)
-    if len(check_results.scalars().all()) == 0:
+    if await session.first(check_query) is None:
         raise HTTPException(status_code=406, detail=f"Cant find author with ID {data.author_id}")
 
-    check_query2 = sqla.select(ArticleModel).where(ArticleModel.doi == data.doi)
-    check_results = await session.execute(check_query2)
-    if len(check_results.scalars().all()) == 0:
+    shard_session = session.for_doi(data.doi)
+    check_query2 = sqla.select(ArticleModel.id).where(ArticleModel.doi == data.doi)
+    article_id = (await shard_session.execute(check_query2)).scalar()
+    if article_id is None:
         raise HTTPException(status_code=406, detail=f"Cant find article with DOI {data.doi}")
 
-    new_binding = AuthorModel(doi=data.doi, author_id=data.author_id, place=data.place)
-    session.add(new_binding)
+    new_binding = ArticleToAuthorModel(article_id=article_id, author_id=data.author_id,
+                                       place=data.place)
+    shard_session.add(new_binding)
     await session.commit()
+    await refresh_similar(session, data.doi)
     return f"Binding DOI {data.doi} -> author ID {data.author_id} was added"
 
 
@@ -347,11 +673,13 @@ async def alter_article(data: Annotated[ArticleFullSchema, Depends()], session:
         Alter article handler.
     """
 
-    article = await session.get(ArticleModel, data.doi)
+    query = sqla.select(ArticleModel).where(ArticleModel.doi == data.doi)
+    article = (await session.for_doi(data.doi).execute(query)).scalar()
     if article is not None:
         article.title = data.title
         article.posting_date = data.posting_date
         await session.commit()
+        await refresh_similar(session, data.doi)
         return f"Article DOI {data.doi} was altered"
 
     raise HTTPException(status_code=404, detail=f"Article DOI {data.doi} was not found")
@@ -363,10 +691,11 @@ async def alter_author(data: Annotated[AuthorFullSchema, Depends()], session: Se
         Alter author handler.
     """
 
-    author = await session.get(AuthorModel, data.id)
+    shard_session, author = await session.locate(AuthorModel, data.id)
     if author is not None:
         author.name = data.name
         author.affiliation_org_id = data.affiliation_org_id
+        await dedup.update_author_key(shard_session, data.id, data.name)
         await session.commit()
         return f"Author ID {data.id} was altered"
 
@@ -379,7 +708,7 @@ async def alter_org(data: Annotated[OrganisationFullSchema, Depends()], session:
         Alter organisation handler.
     """
 
-    org = await session.get(OrganisationModel, data.id)
+    _, org = await session.locate(OrganisationModel, data.id)
     if org is not None:
         org.title = data.title
         org.location = data.location
@@ -397,7 +726,11 @@ async def alter_article_to_author(
         Alter article to author binding handler.
     """
 
-    binding = await session.get(ArticleToAuthorModel, (data.doi, data.author_id))
+    shard_session = session.for_doi(data.doi)
+    query = sqla.select(ArticleToAuthorModel)\
+        .where((ArticleToAuthorModel.article_id == article_id_of(data.doi))
+               & (ArticleToAuthorModel.author_id == data.author_id))
+    binding = (await shard_session.execute(query)).scalar()
     if binding is not None:
         binding.place = data.place
         await session.commit()
@@ -405,3 +738,175 @@ async def alter_article_to_author(
 
     msg = f"Binding DOI {data.doi} -> author ID {data.author_id} was not found"
     raise HTTPException(status_code=404, detail=msg)
+
+
+@app.get("/dedup/authors", dependencies=AccessDeps, tags=["dedup"])
+async def get_duplicate_authors(data: Annotated[DuplicateSearchSchema, Depends()],
+                                session: SessionDep):
+    """
+        Propose duplicate authors, best candidates first.
+    """
+
+    return await dedup.find_duplicates(session, data.threshold, data.limit)
+
+
+@app.post("/dedup/authors/merge", dependencies=AccessDeps, tags=["dedup"])
+async def merge_duplicate_authors(data: Annotated[AuthorMergeSchema, Depends()],
+                                  session: SessionDep):
+    """
+        Merge duplicate author into kept author, rewriting article bindings.
+    """
+
+    if data.keep_id == data.duplicate_id:
+        raise HTTPException(status_code=406, detail="Cant merge author with itself")
+    for author_id in (data.keep_id, data.duplicate_id):
+        if await read_author(session, author_id) is None:
+            raise HTTPException(status_code=404, detail=f"Author ID {author_id} was not found")
+
+    counts = await dedup.merge_duplicates(session, [(data.keep_id, data.duplicate_id)],
+                                          keep_smallest=False)
+    return f"Author ID {data.duplicate_id} was merged into author ID {data.keep_id}: " + \
+           f"{counts.get('bindings_rewritten', 0)} bindings rewritten"
+
+
+async def job_dedup_authors(context, threshold: float = dedup.DEFAULT_THRESHOLD,
+                            apply: bool = False):
+    """
+        Job: find duplicate authors and optionally merge them.
+    """
+
+    async with shard_router.session() as session:
+        context.report(0.0, "Searching duplicates")
+        await dedup.refresh_key_index(session)
+        candidates = await dedup.find_duplicates(session, threshold)
+        result = {"candidates": len(candidates)}
+        if apply and candidates:
+            await context.throttle(0.0)
+            context.report(0.5, "Merging duplicates")
+            pairs = [(candidate.keep_id, candidate.duplicate_id) for candidate in candidates]
+            result.update(await dedup.merge_duplicates(session, pairs))
+    return result
+
+
+async def job_rebuild_similar(context):
+    """
+        Job: rebuild similar articles index, the build runs in the process pool.
+    """
+
+    context.report(0.0, "Building similar articles index")
+    index = await similar_articles.rebuild(load_similarity_data, context.run_cpu,
+                                           similarity_data_version)
+    return {"articles": len(index)}
+
+
+async def job_export_catalogue(context, batch_size: int = config.JOBS_BATCH_SIZE):
+    """
+        Job: export catalogue tables as JSON lines, read in paced key-ordered batches.
+    """
+
+    os.makedirs(config.JOBS_EXPORT_DIR, exist_ok=True)
+    path = os.path.join(config.JOBS_EXPORT_DIR, f"{context.job_id}.jsonl")
+    tables = BaseModel.metadata.sorted_tables
+    steps = len(tables) * len(shard_router.shards)
+    exported = 0
+    with open(path, "w", encoding="utf-8") as out:
+        for step, (table, shard) in enumerate(
+                (table, shard) for table in tables for shard in shard_router.shards):
+            context.report(step / steps, f"Exporting {table.name} from {shard.name}")
+            pk_columns = list(table.primary_key.columns)
+            last_key = None
+            while True:
+                started = time.monotonic()
+                query = sqla.select(table).order_by(*pk_columns).limit(batch_size)
+                if last_key is not None:
+                    query = query.where(sqla.tuple_(*pk_columns) > sqla.tuple_(*last_key))
+                async with shard.engine.connect() as conn:
+                    rows = (await conn.execute(query)).mappings().all()
+                for row in rows:
+                    out.write(json.dumps({"table": table.name, "row": dict(row)}, default=str))
+                    out.write("\n")
+                exported += len(rows)
+                await context.throttle(time.monotonic() - started)
+                if len(rows) < batch_size:
+                    break
+                last_key = tuple(rows[-1][column.name] for column in pk_columns)
+    return {"path": path, "rows": exported}
+
+
+async def job_backup(context, keep: int = config.BACKUP_KEEP):
+    """
+        Job: online snapshot of every shard, see app/backup.py.
+    """
+
+    return await backup.snapshot_shards(
+        shard_router, config.BACKUP_DIR, keep, config.BACKUP_PAGES, config.BACKUP_PAUSE,
+        progress=context.report)
+
+
+async def job_analytics_refresh(context):
+    """
+        Job: refresh the analytics snapshot, see app/analytics.py.
+    """
+
+    return await analytics_snapshot.refresh(progress=context.report)
+
+
+job_runner.register("dedup_authors", job_dedup_authors)
+job_runner.register("rebuild_similar", job_rebuild_similar)
+job_runner.register("export_catalogue", job_export_catalogue)
+job_runner.register("backup", job_backup)
+job_runner.register("analytics_refresh", job_analytics_refresh)
+
+
+@app.post("/jobs", dependencies=AccessDeps, tags=["jobs"])
+async def submit_job(data: Annotated[JobSubmitSchema, Depends()]):
+    """
+        Submit background job, returns its state with the job ID.
+    """
+
+    if data.kind not in job_runner.kinds:
+        raise HTTPException(status_code=404, detail=f"Job kind {data.kind} was not found")
+    try:
+        return await job_runner.submit(data.kind, json.loads(data.params))
+    except TypeError as exc:
+        raise HTTPException(status_code=406, detail=f"Wrong job parameters: {exc}") from exc
+
+
+@app.get("/jobs/{job_id}", dependencies=AccessDeps, tags=["jobs"])
+async def get_job(job_id: str):
+    """
+        Handler for background job state and progress.
+    """
+
+    job = await job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} was not found")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel", dependencies=AccessDeps, tags=["jobs"])
+async def cancel_job(job_id: str):
+    """
+        Cancel queued or running background job.
+    """
+
+    job = await job_runner.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} was not found")
+    return job
+
+
+@app.get("/analytics/query", dependencies=AccessDeps, tags=["analytics"])
+async def analytics_query(data: Annotated[AnalyticsQuerySchema, Depends()]):
+    """
+        Read-only SQL query on the analytics snapshot of the catalogue.
+    """
+
+    try:
+        return await analytics_snapshot.query(data.sql, data.max_rows, data.timeout)
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=406, detail=str(exc)) from exc
+    except analytics.QueryTimeout as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
@@ -0,0 +1,236 @@
+"""
+    Online migration of the Web service 'Article Gate' catalogue to integer
+    article keys: bindings reference `article.id` instead of repeating the DOI.
+    New tables are filled in small batches while triggers on the old tables
+    mirror concurrent writes, then tables are swapped in one short transaction.
+    Concurrent runs (every worker migrates on start up) are serialised
+    by a lock file next to the database. Run from the `src` directory
+    while the previous version is serving:
+    `python -m app.migrate_keys [--vacuum]`.
+"""
+
+import argparse
+import asyncio
+import contextlib
+
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from . import config
+from .backup import database_path
+from .models.base import BaseModel
+from .models.article import ArticleModel
+from .models.article_to_author import ArticleToAuthorModel
+from .periodic import FileLock
+from .sharding import ShardRouter
+
+NEW_ARTICLE = "article__new"
+NEW_BINDING = "article_to_author__new"
+LOCK_SUFFIX = ".migrate.lock"
+
+TRIGGERS = {
+    "article_keys_ai": f"""
+        CREATE TRIGGER article_keys_ai AFTER INSERT ON article BEGIN
+            INSERT INTO {NEW_ARTICLE} (doi, title, posting_date)
+            VALUES (NEW.doi, NEW.title, NEW.posting_date)
+            ON CONFLICT (doi) DO UPDATE
+            SET title = excluded.title, posting_date = excluded.posting_date;
+        END""",
+    "article_keys_au": f"""
+        CREATE TRIGGER article_keys_au AFTER UPDATE ON article BEGIN
+            UPDATE {NEW_ARTICLE} SET doi = NEW.doi, title = NEW.title,
+                posting_date = NEW.posting_date
+            WHERE doi = OLD.doi;
+        END""",
+    "article_keys_ad": f"""
+        CREATE TRIGGER article_keys_ad AFTER DELETE ON article BEGIN
+            DELETE FROM {NEW_BINDING} WHERE article_id =
+                (SELECT id FROM {NEW_ARTICLE} WHERE doi = OLD.doi);
+            DELETE FROM {NEW_ARTICLE} WHERE doi = OLD.doi;
+        END""",
+    "binding_keys_ai": f"""
+        CREATE TRIGGER binding_keys_ai AFTER INSERT ON article_to_author BEGIN
+            INSERT OR REPLACE INTO {NEW_BINDING} (article_id, author_id, place)
+            SELECT id, NEW.author_id, NEW.place FROM {NEW_ARTICLE} WHERE doi = NEW.doi;
+        END""",
+    "binding_keys_au": f"""
+        CREATE TRIGGER binding_keys_au AFTER UPDATE ON article_to_author BEGIN
+            DELETE FROM {NEW_BINDING} WHERE author_id = OLD.author_id AND article_id =
+                (SELECT id FROM {NEW_ARTICLE} WHERE doi = OLD.doi);
+            INSERT OR REPLACE INTO {NEW_BINDING} (article_id, author_id, place)
+            SELECT id, NEW.author_id, NEW.place FROM {NEW_ARTICLE} WHERE doi = NEW.doi;
+        END""",
+    "binding_keys_ad": f"""
+        CREATE TRIGGER binding_keys_ad AFTER DELETE ON article_to_author BEGIN
+            DELETE FROM {NEW_BINDING} WHERE author_id = OLD.author_id AND article_id =
+                (SELECT id FROM {NEW_ARTICLE} WHERE doi = OLD.doi);
+        END""",
+}
+
+# Batches are read by rowid: both old tables are rowid tables.
+COPY_ARTICLES = f"""
+    INSERT OR IGNORE INTO {NEW_ARTICLE} (doi, title, posting_date)
+    SELECT doi, title, posting_date FROM article
+    WHERE rowid > ? ORDER BY rowid LIMIT ?"""
+COPY_BINDINGS = f"""
+    INSERT OR IGNORE INTO {NEW_BINDING} (article_id, author_id, place)
+    SELECT new.id, old.author_id, old.place
+    FROM (SELECT rowid, doi, author_id, place FROM article_to_author
+          WHERE rowid > ? ORDER BY rowid LIMIT ?) AS old
+    JOIN {NEW_ARTICLE} AS new ON new.doi = old.doi"""
+
+
+def _ddl(model, name: str) -> list[str]:
+    """
+        DDL of the model table (and its indexes) created under another name.
+    """
+    table = model.__table__.to_metadata(BaseModel.metadata.__class__(), name=name)
+    statements = [str(CreateTable(table).compile(dialect=sqlite.dialect()))]
+    statements += [str(CreateIndex(index).compile(dialect=sqlite.dialect()))
+                   for index in table.indexes]
+    return statements
+
+
+async def needs_migration(engine) -> bool:
+    """
+        The database has the DOI-keyed article layout.
+    """
+    async with engine.connect() as conn:
+        columns = (await conn.exec_driver_sql("PRAGMA table_info(article)")).all()
+    return bool(columns) and "id" not in {column[1] for column in columns}
+
+
+def _lock(engine):
+    """
+        Migration lock of the database file, no lock for in-memory databases.
+    """
+    path = database_path(engine.url)
+    return FileLock(path + LOCK_SUFFIX) if path is not None else contextlib.nullcontext()
+
+
+async def _drop_leftovers(conn):
+    """
+        Drop triggers and new tables of an interrupted migration.
+    """
+    for name in TRIGGERS:
+        await conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    for table in (NEW_BINDING, NEW_ARTICLE):
+        await conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+
+
+async def _has_leftovers(engine) -> bool:
+    async with engine.connect() as conn:
+        names = [*TRIGGERS, NEW_BINDING, NEW_ARTICLE]
+        result = await conn.exec_driver_sql(
+            f"SELECT count(*) FROM sqlite_master WHERE name IN ({', '.join('?' * len(names))})",
+            tuple(names))
+        return bool(result.scalar())
+
+
+async def _max_rowid(engine, table: str) -> int:
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(f"SELECT coalesce(max(rowid), 0) FROM {table}")
+        return result.scalar()
+
+
+async def _copy(engine, statement: str, table: str, batch_size: int, pause: float):
+    """
+        Run a batch copy statement until every rowid of `table` is passed.
+        Each batch is a separate short write transaction.
+    """
+    last = 0
+    high = await _max_rowid(engine, table)
+    while last < high:
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql(statement, (last, batch_size))
+            # Next batch starts after the last rowid of this one.
+            last = (await conn.exec_driver_sql(
+                f"SELECT coalesce(max(rowid), ?) FROM "
+                f"(SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+                (high, last, batch_size))).scalar()
+        await asyncio.sleep(pause)
+
+
+async def migrate(engine, batch_size: int = 1000, pause: float = 0.0) -> bool:
+    """
+        Migrate one catalogue database, if it is not migrated yet.
+        Waits while another process migrates it; leftovers of an interrupted
+        migration are dropped from an already migrated database.
+        Returns True if the database was migrated.
+    """
+    if not await needs_migration(engine) and not await _has_leftovers(engine):
+        return False
+
+    async with _lock(engine):
+        if await needs_migration(engine):
+            await _migrate(engine, batch_size, pause)
+            return True
+        async with engine.begin() as conn:
+            await _drop_leftovers(conn)
+        return False
+
+
+async def _migrate(engine, batch_size: int, pause: float):
+    """
+        Build the new tables, copy the rows and swap the tables.
+        Must run under the migration lock.
+    """
+    async with engine.begin() as conn:
+        await _drop_leftovers(conn)
+        for index in ArticleToAuthorModel.__table__.indexes:
+            await conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+        statements = _ddl(ArticleModel, NEW_ARTICLE) + _ddl(ArticleToAuthorModel, NEW_BINDING)
+        for statement in statements:
+            await conn.exec_driver_sql(statement)
+        for statement in TRIGGERS.values():
+            await conn.exec_driver_sql(statement)
+
+    await _copy(engine, COPY_ARTICLES, "article", batch_size, pause)
+    await _copy(engine, COPY_BINDINGS, "article_to_author", batch_size, pause)
+
+    async with engine.begin() as conn:
+        for name in TRIGGERS:
+            await conn.exec_driver_sql(f"DROP TRIGGER {name}")
+        await conn.exec_driver_sql("DROP TABLE article_to_author")
+        await conn.exec_driver_sql("DROP TABLE article")
+        await conn.exec_driver_sql(f"ALTER TABLE {NEW_ARTICLE} RENAME TO article")
+        await conn.exec_driver_sql(f"ALTER TABLE {NEW_BINDING} RENAME TO article_to_author")
+        # Schema marker is reset, so the start up bootstrap checks the schema again.
+        await conn.exec_driver_sql("PRAGMA user_version = 0")
+
+
+async def vacuum(engine):
+    """
+        Rebuild the database file to return pages of the dropped tables.
+        Blocks writers for the whole run.
+    """
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("VACUUM")
+
+
+async def main():
+    """
+        Migrate every configured shard.
+    """
+    parser = argparse.ArgumentParser(description="Migrate bindings to integer article keys.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.01, help="seconds between batches")
+    parser.add_argument("--vacuum", action="store_true", help="compact files afterwards")
+    args = parser.parse_args()
+
+    router = ShardRouter.from_config(
+        config.DB_SHARDS, config.DB_SHARD_PREFIXES, config.DB_SHARD_DEFAULT
+    )
+    try:
+        for shard in router.shards:
+            migrated = await migrate(shard.engine, args.batch_size, args.pause)
+            if migrated and args.vacuum:
+                await vacuum(shard.engine)
+            print(f"{shard.name}: {'migrated' if migrated else 'up to date'}")
+    finally:
+        await router.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
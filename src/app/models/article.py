@@ -2,16 +2,19 @@
     ORM logic for 'article' table.
 """
 
-from sqlalchemy import Column, String
+from sqlalchemy import Column, Integer, String
 from .base import BaseModel
 
 class ArticleModel(BaseModel):
     """
         Model of article objects.
+        Integer `id` is a shard-local surrogate key referenced by bindings,
+        articles are addressed by DOI everywhere in the public API.
     """
 
     __tablename__ = "article"
 
-    doi = Column(String, primary_key=True)
+    id = Column(Integer, primary_key=True)
+    doi = Column(String, nullable=False, unique=True)
     title = Column(String, nullable=False)
     posting_date = Column(String, nullable=False)
@@ -2,7 +2,7 @@
     ORM logic for 'article_to_author' table.
 """
 
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Index, Integer
 from .base import BaseModel
 
 
@@ -10,10 +10,16 @@ class ArticleToAuthorModel(BaseModel):
     """
         Model of bindings between scientific paper (article)
         and one of its authors.
+        WITHOUT ROWID table clustered by (article_id, author_id):
+        no separate rowid b-tree, and the author index carries the article key.
     """
 
     __tablename__ = "article_to_author"
+    __table_args__ = (
+        Index("ix_article_to_author_author_id", "author_id"),
+        {"sqlite_with_rowid": False},
+    )
 
-    doi = Column(String, primary_key=True)
+    article_id = Column(Integer, primary_key=True)
     author_id = Column(Integer, primary_key=True)
     place = Column(Integer, nullable=False)
@@ -0,0 +1,20 @@
+"""
+    ORM logic for 'author_name_key' table.
+"""
+
+from sqlalchemy import Column, Integer, String
+from .base import BaseModel
+
+
+class AuthorNameKeyModel(BaseModel):
+    """
+        Precomputed normalised name and blocking key of an author,
+        used to find duplicate authors without comparing all pairs.
+    """
+
+    __tablename__ = "author_name_key"
+
+    author_id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    norm_name = Column(String, nullable=False)
+    block_key = Column(String, nullable=False, index=True)
@@ -0,0 +1,37 @@
+"""
+    ORM logic for 'job' table of the background jobs database.
+"""
+
+from sqlalchemy import Boolean, Column, Float, Integer, String, Text
+from sqlalchemy.orm import DeclarativeBase
+
+
+class JobBaseModel(DeclarativeBase):
+    """
+        ORM base-class of the jobs database, kept apart
+        from the catalogue schema.
+    """
+
+
+class JobModel(JobBaseModel):
+    """
+        Model of background job state.
+    """
+
+    __tablename__ = "job"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    params = Column(Text, nullable=False)
+    status = Column(String, nullable=False, index=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    message = Column(String, nullable=False, default="")
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    owner = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(Float, nullable=False)
+    started_at = Column(Float, nullable=True)
+    finished_at = Column(Float, nullable=True)
+    heartbeat_at = Column(Float, nullable=True)
@@ -0,0 +1,146 @@
+"""
+    Periodic background tasks of the Web service 'Article Gate' and
+    file locks that coordinate them between worker processes. Every worker
+    starts the schedule, but only the owner of the schedule lock in the task
+    directory runs it; other workers retry to take it over every interval.
+"""
+
+import abc
+import asyncio
+import fcntl
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """
+        Exclusive advisory lock (fcntl.flock) on file `path`, held by one
+        FileLock at a time, whether in this or another process.
+        Usable with `with` in threads and with `async with`, which polls
+        every `poll` seconds instead of blocking the event loop.
+    """
+
+    def __init__(self, path: str, poll: float = 0.05):
+        self.path = path
+        self.poll = poll
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        """
+            The lock is held by this object.
+        """
+        return self._file is not None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+            Take the lock. Returns False if it is held elsewhere
+            and `blocking` is off.
+        """
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        file = open(self.path, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            file.close()
+            return False
+        except BaseException:
+            file.close()
+            raise
+        self._file = file
+        return True
+
+    def release(self):
+        """
+            Release the lock, if held.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def wait(self):
+        """
+            Take the lock without blocking the event loop.
+        """
+        while not self.acquire(blocking=False):
+            await asyncio.sleep(self.poll)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        await self.wait()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+class PeriodicTask(abc.ABC):
+    """
+        Calls `run_once()` every `interval` seconds in the worker that owns
+        the schedule lock `lock_path`. The first run is at start, or after
+        the first interval if `run_at_start` is off. Failures are logged
+        and counted, the schedule goes on.
+    """
+
+    title = "Periodic task"
+
+    def __init__(self, interval: float, lock_path: str, run_at_start: bool = True):
+        self.interval = interval
+        self.run_at_start = run_at_start
+        self.failures = 0
+        self._schedule_lock = FileLock(lock_path)
+        self._task = None
+
+    @property
+    def owner(self) -> bool:
+        """
+            This worker runs the schedule.
+        """
+        return self._schedule_lock.held
+
+    def start(self):
+        """
+            Start the schedule, if the interval is set.
+        """
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+            Stop the schedule, a run in progress is abandoned.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @abc.abstractmethod
+    async def run_once(self):
+        """
+            One scheduled run.
+        """
+
+    async def _run(self):
+        try:
+            if not self.run_at_start:
+                await asyncio.sleep(self.interval)
+            while True:
+                if self._schedule_lock.acquire(blocking=False):
+                    try:
+                        await self.run_once()
+                    except Exception:  # pylint: disable=broad-exception-caught
+                        self.failures += 1
+                        logger.exception("%s failed", self.title)
+                await asyncio.sleep(self.interval)
+        finally:
+            self._schedule_lock.release()
@@ -0,0 +1,327 @@
+"""
+    Field selection for the read API of the Web service 'Article Gate'.
+    Requested fields and nested includes (`fields=place,author.name`,
+    `include=author.organisation`) are compiled into one SQL query with only
+    the needed columns and joins. Relations to rows, which may be stored on
+    another shard, are loaded by one batched query per relation instead.
+"""
+
+import dataclasses
+
+import sqlalchemy as sqla
+from sqlalchemy.orm import aliased
+
+from .models.article import ArticleModel
+from .models.author import AuthorModel
+from .models.organisation import OrganisationModel
+from .models.article_to_author import ArticleToAuthorModel
+from .sharding import ShardSession
+
+# Keys per batched loader query, below SQLite variables limit.
+LOADER_BATCH = 500
+
+
+@dataclasses.dataclass(frozen=True)
+class Relation:
+    """
+        Link from parent rows to `target` rows: parent.parent_key == target.child_key.
+        Colocated targets are stored on the shard of the parent row.
+    """
+
+    target: str
+    parent_key: str
+    child_key: str
+    many: bool = False
+    colocated: bool = True
+
+
+@dataclasses.dataclass(frozen=True)
+class Resource:
+    """
+        Public view of a model: field -> (relation or None, column).
+        Fields with a relation are taken from the joined related row.
+    """
+
+    model: type
+    fields: dict
+    relations: dict
+    order_by: tuple = ()
+
+
+RESOURCES = {
+    "article": Resource(
+        ArticleModel,
+        {"doi": (None, "doi"), "title": (None, "title"), "posting_date": (None, "posting_date")},
+        {"authors": Relation("binding", "id", "article_id", many=True)},
+    ),
+    "binding": Resource(
+        ArticleToAuthorModel,
+        {"doi": ("article", "doi"), "author_id": (None, "author_id"), "place": (None, "place")},
+        {
+            "article": Relation("article", "article_id", "id"),
+            "author": Relation("author", "author_id", "id", colocated=False),
+        },
+        order_by=("place",),
+    ),
+    "author": Resource(
+        AuthorModel,
+        {"id": (None, "id"), "name": (None, "name"),
+         "affiliation_org_id": (None, "affiliation_org_id")},
+        {"organisation": Relation("organisation", "affiliation_org_id", "id", colocated=False)},
+    ),
+    "organisation": Resource(
+        OrganisationModel,
+        {"id": (None, "id"), "title": (None, "title"), "location": (None, "location")},
+        {},
+    ),
+}
+
+
+@dataclasses.dataclass
+class Selection:
+    """
+        Requested fields of a resource and its included relations.
+    """
+
+    resource: str
+    fields: list = dataclasses.field(default_factory=list)
+    children: dict = dataclasses.field(default_factory=dict)
+
+    def child(self, name: str) -> "Selection":
+        """
+            Included relation, added on first use.
+        """
+        resource = RESOURCES[self.resource]
+        if name not in resource.relations:
+            raise ValueError(f"Unknown relation '{name}' of {self.resource}")
+        if name not in self.children:
+            self.children[name] = Selection(resource.relations[name].target)
+        return self.children[name]
+
+    def complete(self):
+        """
+            Levels without explicitly requested fields get all fields.
+        """
+        if not self.fields:
+            self.fields = list(RESOURCES[self.resource].fields)
+        for child in self.children.values():
+            child.complete()
+
+
+def _split(text: str) -> list[str]:
+    return [item.strip() for item in text.split(",") if item.strip()]
+
+
+def parse_selection(resource: str, fields: str = "", include: str = "") -> Selection:
+    """
+        Parse comma separated dotted `fields` and `include` paths.
+        Raises ValueError for unknown fields and relations.
+    """
+    selection = Selection(resource)
+    for path in _split(include):
+        node = selection
+        for name in path.split("."):
+            node = node.child(name)
+    for path in _split(fields):
+        *relations, name = path.split(".")
+        node = selection
+        for relation in relations:
+            node = node.child(relation)
+        if name not in RESOURCES[node.resource].fields:
+            raise ValueError(f"Unknown field '{name}' of {node.resource}")
+        if name not in node.fields:
+            node.fields.append(name)
+    selection.complete()
+    return selection
+
+
+@dataclasses.dataclass
+class Plan:
+    """
+        Compiled selection: positions of its columns in the result rows.
+    """
+
+    selection: Selection
+    identity: list = dataclasses.field(default_factory=list)
+    fields: list = dataclasses.field(default_factory=list)
+    keys: dict = dataclasses.field(default_factory=dict)
+    joined: list = dataclasses.field(default_factory=list)
+    deferred: list = dataclasses.field(default_factory=list)
+
+
+class Compiler:
+    """
+        Builds one query for a selection. Relations are joined when `joinable`,
+        otherwise only their keys are selected for a batched loader.
+    """
+
+    def __init__(self, joinable):
+        self.joinable = joinable
+        self.columns = []
+        self.joins = []
+        self.order_by = []
+
+    def column(self, expr) -> int:
+        """
+            Add column to the query, returns its position.
+        """
+        self.columns.append(expr)
+        return len(self.columns) - 1
+
+    def join(self, alias, relation: Relation):
+        """
+            Outer join of the related rows, returns their alias.
+        """
+        child = aliased(RESOURCES[relation.target].model)
+        self.joins.append((child, getattr(alias, relation.parent_key)
+                           == getattr(child, relation.child_key)))
+        self.order_by += [getattr(child, column)
+                          for column in RESOURCES[relation.target].order_by]
+        return child
+
+    def visit(self, selection: Selection, alias, keys=()) -> Plan:
+        """
+            Compile the selection over `alias` of its model.
+        """
+        resource = RESOURCES[selection.resource]
+        plan = Plan(selection)
+        for column in sqla.inspect(resource.model).primary_key:
+            plan.identity.append(self.column(getattr(alias, column.name)))
+        for key in keys:
+            plan.keys[key] = self.column(getattr(alias, key))
+
+        implicit = {}
+        for name in selection.fields:
+            relation_name, column = resource.fields[name]
+            source = alias
+            if relation_name is not None:
+                if relation_name not in implicit:
+                    implicit[relation_name] = self.join(alias, resource.relations[relation_name])
+                source = implicit[relation_name]
+            plan.fields.append((name, self.column(getattr(source, column))))
+
+        for name, child in selection.children.items():
+            relation = resource.relations[name]
+            if self.joinable(relation):
+                plan.joined.append((name, relation, self.visit(child, self.join(alias, relation))))
+            else:
+                plan.keys[relation.parent_key] = self.column(getattr(alias, relation.parent_key))
+                plan.deferred.append((name, relation, child))
+        return plan
+
+    def compile(self, selection: Selection, where, keys=()):
+        """
+            Query and plan of the root selection, filtered by `where(alias)`.
+            Columns `keys` of the root rows are selected too.
+        """
+        resource = RESOURCES[selection.resource]
+        alias = aliased(resource.model)
+        plan = self.visit(selection, alias, keys)
+        query = sqla.select(*self.columns).select_from(alias)
+        for child, onclause in self.joins:
+            query = query.outerjoin(child, onclause)
+        order = [getattr(alias, column) for column in resource.order_by]
+        return query.where(where(alias)).order_by(*order, *self.order_by), plan
+
+
+def field_equals(resource: str, name: str, value):
+    """
+        Filter of the root rows by a public field.
+        Fields of related rows are matched by a key subquery.
+    """
+    relation_name, column = RESOURCES[resource].fields[name]
+
+    def where(alias):
+        if relation_name is None:
+            return getattr(alias, column) == value
+        relation = RESOURCES[resource].relations[relation_name]
+        target = RESOURCES[relation.target].model
+        return getattr(alias, relation.parent_key).in_(
+            sqla.select(getattr(target, relation.child_key))
+            .where(getattr(target, column) == value))
+
+    return where
+
+
+def assemble(rows, plan: Plan, pending: list) -> list[tuple[dict, tuple]]:
+    """
+        Nest flat rows into objects, one per identity, in the rows order.
+        Returns (object, row) pairs; relations to load later go to `pending`.
+    """
+    objects = {}
+    for row in rows:
+        ident = tuple(row[idx] for idx in plan.identity)
+        if all(value is None for value in ident):
+            continue
+        if ident not in objects:
+            objects[ident] = ({name: row[idx] for name, idx in plan.fields}, row, [])
+        objects[ident][2].append(row)
+
+    for obj, first, group in objects.values():
+        for name, relation, child_plan in plan.joined:
+            children = [child for child, _ in assemble(group, child_plan, pending)]
+            obj[name] = children if relation.many else (children[0] if children else None)
+        for name, relation, child in plan.deferred:
+            pending.append((obj, name, relation, child, first[plan.keys[relation.parent_key]]))
+    return [(obj, first) for obj, first, _ in objects.values()]
+
+
+class Fetcher:
+    """
+        Runs compiled selections on the shards.
+        With a single shard every relation is joined into the root query.
+    """
+
+    def __init__(self, session: ShardSession):
+        self.session = session
+        single = len(session.router.shards) == 1
+        self.joinable = lambda relation: relation.colocated or single
+
+    async def rows(self, query, shard_session=None) -> list:
+        """
+            Rows of the query from one shard session or all shards.
+        """
+        if shard_session is not None:
+            return (await shard_session.execute(query)).all()
+        return await self.session.all_rows(query)
+
+    async def fetch(self, selection: Selection, where, shard_session=None) -> list[dict]:
+        """
+            Objects of the selection matching `where(alias)`.
+        """
+        query, plan = Compiler(self.joinable).compile(selection, where)
+        pending = []
+        objects = [obj for obj, _ in assemble(await self.rows(query, shard_session), plan, pending)]
+        await self.load(pending)
+        return objects
+
+    async def load(self, pending: list):
+        """
+            Batched loaders: one query per relation and batch of keys.
+        """
+        groups = {}
+        for obj, name, relation, child, key in pending:
+            groups.setdefault(id(child), (relation, child, []))[2].append((obj, name, key))
+
+        for relation, child, parents in groups.values():
+            # Parent key columns may be declared with another type than the child key.
+            model = RESOURCES[relation.target].model
+            convert = getattr(model, relation.child_key).type.python_type
+            parents = [(obj, name, convert(key) if key is not None else None)
+                       for obj, name, key in parents]
+            keys = sorted({key for _, _, key in parents if key is not None})
+            found = {}
+            for start in range(0, len(keys), LOADER_BATCH):
+                chunk = keys[start:start + LOADER_BATCH]
+                query, plan = Compiler(self.joinable).compile(
+                    child,
+                    lambda alias, key=relation.child_key, chunk=chunk:
+                        getattr(alias, key).in_(chunk),
+                    keys=(relation.child_key,))
+                nested = []
+                for obj, row in assemble(await self.rows(query), plan, nested):
+                    found.setdefault(row[plan.keys[relation.child_key]], []).append(obj)
+                await self.load(nested)
+            for obj, name, key in parents:
+                matches = found.get(key, [])
+                obj[name] = matches if relation.many else (matches[0] if matches else None)
@@ -0,0 +1,147 @@
+"""
+    Similar articles recommendations of the Web service 'Article Gate'.
+    The index itself (app/similarity.py, NumPy) is imported and built
+    only on the first recommendation request.
+"""
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SimilarArticles:
+    """
+        Similar articles index of this worker process.
+        Built in a thread on the first request, kept up to date by write
+        handlers and rebuilt in background when older than `max_age` seconds.
+        Changes made elsewhere (other workers, author merges) are detected by
+        comparing a data version every `check_interval` seconds in background.
+    """
+
+    def __init__(self, max_age: float, check_interval: float = 60.0):
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.index = None
+        self.built_at = 0.0
+        self.checked_at = 0.0
+        self.version = None
+        self._build = None
+        self._check = None
+        self._pending = None
+
+    @property
+    def building(self) -> bool:
+        """
+            Index (re)build is in progress.
+        """
+        return self._build is not None and not self._build.done()
+
+    @property
+    def checking(self) -> bool:
+        """
+            Data version check is in progress.
+        """
+        return self._check is not None and not self._check.done()
+
+    async def get_index(self, load, version=None):
+        """
+            Current index. `load` is a coroutine function returning
+            ((doi, title) articles, (doi, author_id) bindings) for a build,
+            `version` an optional coroutine function returning the data version.
+        """
+        stale = self.index is None or time.monotonic() - self.built_at > self.max_age
+        if stale and not self.building:
+            self._start_build(load, asyncio.to_thread, version)
+        elif version is not None and not self.building \
+                and not self.checking \
+                and time.monotonic() - self.checked_at > self.check_interval:
+            # The version query scans the catalogue: requests do not wait for it.
+            self.checked_at = time.monotonic()
+            self._check = asyncio.create_task(self._check_version(load, version))
+            self._check.add_done_callback(self._check_done)
+        if self.index is None:
+            await asyncio.shield(self._build)
+        return self.index
+
+    async def rebuild(self, load, run_build=None, version=None):
+        """
+            Rebuild the index now (or join the running build) and return it.
+            `run_build(func, *args)` runs the build, in a thread by default.
+        """
+        if not self.building:
+            self._start_build(load, run_build or asyncio.to_thread, version)
+        await asyncio.shield(self._build)
+        return self.index
+
+    def _start_build(self, load, run_build, version):
+        self._pending = []
+        self._build = asyncio.create_task(self._rebuild(load, run_build, version))
+        self._build.add_done_callback(self._build_done)
+
+    def _build_done(self, task: asyncio.Task):
+        """
+            Log a failed or cancelled build and drop updates collected for it.
+        """
+        if not task.cancelled() and task.exception() is None:
+            return
+        if self._build is task:
+            self._pending = None
+        if not task.cancelled():
+            logger.error("Similar articles index build failed", exc_info=task.exception())
+
+    async def _check_version(self, load, version):
+        """
+            Rebuild in background if the data version has changed.
+        """
+        if await version() != self.version and not self.building:
+            self._start_build(load, asyncio.to_thread, version)
+
+    @staticmethod
+    def _check_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Similar articles version check failed", exc_info=task.exception())
+
+    async def _rebuild(self, load, run_build, version):
+        """
+            Build new index from the DB and replay updates made meanwhile.
+            The data version is read before the data, so changes committed
+            during the build are caught by the next check.
+        """
+        from . import similarity  # pylint: disable=import-outside-toplevel
+        data_version = await version() if version is not None else None
+        articles, bindings = await load()
+        index = await run_build(similarity.build_index, articles, bindings)
+
+        pending, self._pending = self._pending or [], None
+        self.index, self.built_at = index, time.monotonic()
+        self.version, self.checked_at = data_version, self.built_at
+        for update in pending:
+            self.update(*update)
+
+    def update(self, doi: str, title, author_ids):
+        """
+            Apply change of one article: title None means the article is deleted.
+        """
+        if self._pending is not None:
+            self._pending.append((doi, title, author_ids))
+        if self.index is None:
+            return
+        if title is None:
+            self.index.remove_article(doi)
+            return
+        self.index.set_authors(doi, author_ids)
+        if doi not in self.index or self.index.titles[self.index.rows[doi]] != title:
+            self.index.add_articles([(doi, title)])
+
+    def snapshot(self) -> dict:
+        """
+            Current state for the metrics endpoint.
+        """
+        return {
+            "built": self.index is not None,
+            "articles": len(self.index) if self.index is not None else 0,
+            "age": round(time.monotonic() - self.built_at, 1) if self.index is not None else None,
+            "building": self.building,
+        }
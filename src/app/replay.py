@@ -0,0 +1,209 @@
+"""
+    Traffic replay of the Web service 'Article Gate': requests of access logs
+    written by `app/access_log.py` (one file per worker) are sent to a running instance with their
+    recorded timing, compressed by a speed-up factor, and latency percentiles
+    and error rates are reported per route. Run from the `src` directory:
+    `python -m app.replay access.*.jsonl --speed 10 --concurrency 64`.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import math
+import time
+
+import httpx
+
+from . import config
+
+WRITE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+
+
+def load_log(*paths: str, reads_only: bool = False, limit: int = 0) -> list[dict]:
+    """
+        Records of the access logs merged and ordered by time.
+        Malformed lines are skipped.
+    """
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(entry, dict) or "path" not in entry:
+                    continue
+                if reads_only and entry.get("method", "GET") in WRITE_METHODS:
+                    continue
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry.get("ts", 0.0))
+    return entries[:limit] if limit else entries
+
+
+def schedule(entries: list[dict], speed: float) -> list[float]:
+    """
+        Start offsets (seconds) of the records: recorded gaps divided by `speed`.
+        Speed 0 sends every request at once.
+    """
+    if not entries or speed <= 0:
+        return [0.0] * len(entries)
+    first = entries[0].get("ts", 0.0)
+    return [max(0.0, entry.get("ts", first) - first) / speed for entry in entries]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """
+        Nearest-rank percentile of sorted values.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+
+def is_error(status) -> bool:
+    """
+        Failed request (no response), server error or rejection by admission control.
+    """
+    return status is None or status >= 500 or status == 429
+
+
+class RouteStats:
+    """
+        Latencies and statuses of one route.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = collections.Counter()
+        self.errors = 0
+
+    def add(self, status, latency: float):
+        """
+            Account one replayed request.
+        """
+        self.latencies.append(latency)
+        self.statuses["failed" if status is None else str(status)] += 1
+        self.errors += is_error(status)
+
+    def summary(self) -> dict:
+        """
+            Count, error rate and latency distribution in milliseconds.
+        """
+        values = sorted(self.latencies)
+        count = len(values)
+        return {
+            "count": count,
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "mean_ms": sum(values) / count * 1000 if count else 0.0,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p90_ms": percentile(values, 0.90) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": values[-1] * 1000 if count else 0.0,
+            "statuses": dict(self.statuses),
+        }
+
+
+async def replay(entries: list[dict], client: httpx.AsyncClient, speed: float = 1.0,
+                 concurrency: int = 16) -> dict:
+    """
+        Send the records with `client` at their scheduled offsets,
+        at most `concurrency` requests at a time. When all slots are busy,
+        next requests start late; the delay is reported as schedule lag.
+    """
+    offsets = schedule(entries, speed)
+    slots = asyncio.Semaphore(concurrency)
+    routes = collections.defaultdict(RouteStats)
+    lags = []
+    tasks = set()
+
+    async def send(entry: dict):
+        begin = time.perf_counter()
+        try:
+            resp = await client.request(entry.get("method", "GET"), entry["path"],
+                                        params=httpx.QueryParams(entry.get("query", "")))
+            status = resp.status_code
+        except httpx.HTTPError:
+            status = None
+        finally:
+            slots.release()
+        route = f"{entry.get('method', 'GET')} {entry.get('route', entry['path'])}"
+        routes[route].add(status, time.perf_counter() - begin)
+
+    started = time.perf_counter()
+    for entry, offset in zip(entries, offsets):
+        await asyncio.sleep(max(0.0, started + offset - time.perf_counter()))
+        await slots.acquire()
+        lags.append(max(0.0, time.perf_counter() - started - offset))
+        task = asyncio.create_task(send(entry))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    total = RouteStats()
+    for stats in routes.values():
+        total.latencies += stats.latencies
+        total.statuses.update(stats.statuses)
+        total.errors += stats.errors
+    lags.sort()
+    return {
+        "requests": len(entries),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(entries) / elapsed if elapsed > 0 else 0.0,
+        "lag_p99_ms": percentile(lags, 0.99) * 1000,
+        "total": total.summary(),
+        "routes": {name: routes[name].summary() for name in sorted(routes)},
+    }
+
+
+def format_report(report: dict) -> str:
+    """
+        Report as a text table.
+    """
+    lines = [
+        f"{report['requests']} requests in {report['elapsed_s']:.2f} s, "
+        f"{report['throughput_rps']:.1f} req/s, p99 schedule lag {report['lag_p99_ms']:.1f} ms",
+        f"{'route':<36}{'count':>8}{'error %':>8}{'p50 ms':>9}{'p90 ms':>9}"
+        f"{'p99 ms':>9}{'max ms':>9}",
+    ]
+    for name, stats in [*report["routes"].items(), ("total", report["total"])]:
+        lines.append(
+            f"{name:<36}{stats['count']:>8}{stats['error_rate']:>8.1%}{stats['p50_ms']:>9.1f}"
+            f"{stats['p90_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}")
+    return "\n".join(lines)
+
+
+async def main():
+    """
+        Replay an access log against a running instance.
+    """
+    parser = argparse.ArgumentParser(description="Replay an access log against the service.")
+    parser.add_argument("logs", nargs="+", help="JSON Lines access logs of the workers")
+    parser.add_argument("--base-url", default=f"http://127.0.0.1:{config.SERVE_PORT}")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="speed-up factor of the recorded timing, 0 sends all at once")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--limit", type=int, default=0, help="replay only first records")
+    parser.add_argument("--reads-only", action="store_true", help="skip write requests")
+    parser.add_argument("--username", default="", help="admin login for write requests")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", action="store_true", help="print report as JSON")
+    args = parser.parse_args()
+
+    entries = load_log(*args.logs, reads_only=args.reads_only, limit=args.limit)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits,
+                                 timeout=args.timeout) as client:
+        if args.username:
+            resp = await client.post("/auth", data={"username": args.username,
+                                                    "password": args.password})
+            resp.raise_for_status()
+        report = await replay(entries, client, args.speed, args.concurrency)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
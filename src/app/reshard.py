@@ -0,0 +1,149 @@
+"""
+    Resharding tool of the Web service 'Article Gate': moves catalogue rows
+    from the current shards to the shards they belong to under a new
+    shards configuration. Run from the `src` directory, e.g.:
+    `python -m app.reshard --shards "main=sqlite+aiosqlite:///app/article_gate.sqlite3;
+    biorxiv=sqlite+aiosqlite:///app/biorxiv.sqlite3" --prefixes "10.1101=biorxiv"`
+"""
+
+import argparse
+import asyncio
+import collections
+
+import sqlalchemy as sqla
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import config, startup
+from .models.base import BaseModel
+from .models.article import ArticleModel
+from .models.author import AuthorModel
+from .models.organisation import OrganisationModel
+from .models.article_to_author import ArticleToAuthorModel
+from .sharding import ShardRouter
+
+
+# Model -> function choosing the target shard of its row.
+# Organisations go first, so authors never reference a missing organisation.
+# Articles are moved together with their bindings, see _move_articles.
+SHARD_KEYS = (
+    (OrganisationModel, lambda router, row: router.shard_for_id(row["id"])),
+    (AuthorModel, lambda router, row: router.shard_for_id(row["id"])),
+    (ArticleModel, lambda router, row: router.shard_for_doi(row["doi"])),
+)
+
+
+async def _move_batch(table, source_shard, moves, counter):
+    """
+        Copy rows to their target shards, then delete them from the source.
+        Copy is idempotent, so an interrupted run can be restarted.
+    """
+    pk_columns = list(table.primary_key.columns)
+    for target_shard, rows in moves.items():
+        async with target_shard.engine.begin() as conn:
+            await conn.execute(sqlite_insert(table).on_conflict_do_nothing(), rows)
+
+        keys = [tuple(row[column.name] for column in pk_columns) for row in rows]
+        async with source_shard.engine.begin() as conn:
+            await conn.execute(sqla.delete(table).where(sqla.tuple_(*pk_columns).in_(keys)))
+        counter[f"{table.name}: {source_shard.name} -> {target_shard.name}"] += len(rows)
+
+
+async def _move_articles(source_shard, moves, counter):
+    """
+        Move articles with their bindings. Article keys are shard-local,
+        so bindings are re-keyed to the IDs the articles get on the target.
+    """
+    articles, bindings = ArticleModel.__table__, ArticleToAuthorModel.__table__
+    for target_shard, rows in moves.items():
+        doi_of = {row["id"]: row["doi"] for row in rows}
+        async with source_shard.engine.connect() as conn:
+            bound = (await conn.execute(
+                sqla.select(bindings).where(bindings.c.article_id.in_(list(doi_of)))
+            )).mappings().all()
+
+        async with target_shard.engine.begin() as conn:
+            await conn.execute(sqlite_insert(articles).on_conflict_do_nothing(),
+                               [{**row, "id": None} for row in rows])
+            new_id = dict((await conn.execute(
+                sqla.select(articles.c.doi, articles.c.id)
+                .where(articles.c.doi.in_(list(doi_of.values())))
+            )).all())
+            if bound:
+                await conn.execute(
+                    sqlite_insert(bindings).on_conflict_do_nothing(),
+                    [{**row, "article_id": new_id[doi_of[row["article_id"]]]} for row in bound])
+
+        async with source_shard.engine.begin() as conn:
+            await conn.execute(sqla.delete(bindings)
+                               .where(bindings.c.article_id.in_(list(doi_of))))
+            await conn.execute(sqla.delete(articles).where(articles.c.id.in_(list(doi_of))))
+        counter[f"{articles.name}: {source_shard.name} -> {target_shard.name}"] += len(rows)
+        counter[f"{bindings.name}: {source_shard.name} -> {target_shard.name}"] += len(bound)
+
+
+async def reshard(source: ShardRouter, target: ShardRouter, batch_size: int = 1000):
+    """
+        Move every row of `source` shards, that is routed to another database
+        by `target` router. Shards are matched by their URL.
+        Returns counter of moved rows.
+    """
+    await asyncio.gather(*(
+        startup.bootstrap_schema(shard.engine, BaseModel.metadata) for shard in target.shards
+    ))
+
+    counter = collections.Counter()
+    for model, route in SHARD_KEYS:
+        table = model.__table__
+        pk_columns = list(table.primary_key.columns)
+        for source_shard in source.shards:
+            last_key = None
+            while True:
+                query = sqla.select(table).order_by(*pk_columns).limit(batch_size)
+                if last_key is not None:
+                    query = query.where(sqla.tuple_(*pk_columns) > sqla.tuple_(*last_key))
+                async with source_shard.engine.connect() as conn:
+                    rows = (await conn.execute(query)).mappings().all()
+                if not rows:
+                    break
+                last_key = tuple(rows[-1][column.name] for column in pk_columns)
+
+                moves = collections.defaultdict(list)
+                for row in rows:
+                    target_shard = route(target, row)
+                    if target_shard.url != source_shard.url:
+                        moves[target_shard].append(dict(row))
+                if model is ArticleModel:
+                    await _move_articles(source_shard, moves, counter)
+                else:
+                    await _move_batch(table, source_shard, moves, counter)
+    return counter
+
+
+async def main():
+    """
+        Reshard current configuration (app/config.py) into the given one.
+    """
+    parser = argparse.ArgumentParser(description="Move catalogue rows between shards.")
+    parser.add_argument("--shards", required=True, help='target shards "name=url;..."')
+    parser.add_argument("--prefixes", default="", help='target DOI prefixes "prefix=name;..."')
+    parser.add_argument("--default", default="", help="target default shard name")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    source = ShardRouter.from_config(
+        config.DB_SHARDS, config.DB_SHARD_PREFIXES, config.DB_SHARD_DEFAULT
+    )
+    target = ShardRouter.from_config(args.shards, args.prefixes, args.default)
+    try:
+        moved = await reshard(source, target, args.batch_size)
+    finally:
+        await source.dispose()
+        await target.dispose()
+
+    for name, count in sorted(moved.items()):
+        print(f"{name}: {count}")
+    print(f"Moved rows: {sum(moved.values())}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
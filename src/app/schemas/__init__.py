@@ -3,6 +3,7 @@
 """
 
 import datetime
+import json
 from pydantic import BaseModel as PDBaseModel, field_validator
 
 
@@ -131,3 +132,123 @@ class ArticleToAuthorFullSchema(PDBaseModel):
         if value < 1:
             raise ValueError(f'Place {value} is less than zero')
         return value
+
+
+class AuthorMergeSchema(PDBaseModel):
+    """
+        Pair of authors to merge: duplicate is merged into kept author.
+    """
+
+    keep_id: int
+    duplicate_id: int
+
+    @field_validator('keep_id', 'duplicate_id', mode='after')
+    @classmethod
+    def ge_author_id(cls, value: int) -> int:
+        """
+            Author IDs >= 0
+        """
+        if value < 0:
+            raise ValueError(f'Author ID {value} is less than zero')
+        return value
+
+
+class DuplicateSearchSchema(PDBaseModel):
+    """
+        Duplicate authors search parameters.
+    """
+
+    threshold: float = 0.6
+    limit: int = 100
+
+    @field_validator('threshold', mode='after')
+    @classmethod
+    def validate_threshold(cls, value: float) -> float:
+        """
+            Score threshold is between 0 and 1
+        """
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f'Threshold {value} is not between 0 and 1')
+        return value
+
+    @field_validator('limit', mode='after')
+    @classmethod
+    def validate_limit(cls, value: int) -> int:
+        """
+            Limit is between 1 and 1000
+        """
+        if not 1 <= value <= 1000:
+            raise ValueError(f'Limit {value} is not between 1 and 1000')
+        return value
+
+
+class SimilarArticlesSchema(ArticleDOISchema):
+    """
+        Similar articles request: article DOI and number of results.
+    """
+
+    k: int = 10
+
+    @field_validator('k', mode='after')
+    @classmethod
+    def validate_k(cls, value: int) -> int:
+        """
+            From 1 to 100 similar articles
+        """
+        if not 1 <= value <= 100:
+            raise ValueError(f'{value} is not between 1 and 100')
+        return value
+
+
+class JobSubmitSchema(PDBaseModel):
+    """
+        Background job to submit: job kind and its parameters as JSON object.
+    """
+
+    kind: str
+    params: str = "{}"
+
+    @field_validator('params', mode='after')
+    @classmethod
+    def validate_params(cls, value: str) -> str:
+        """
+            Parameters are a JSON object
+        """
+        try:
+            parsed = json.loads(value)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f'Job parameters are not valid JSON: {exc}') from exc
+        if not isinstance(parsed, dict):
+            raise ValueError('Job parameters are not a JSON object')
+        return value
+
+
+class ProjectionSchema(PDBaseModel):
+    """
+        Field selection of read requests: comma separated dotted paths,
+        e.g. fields=place,author.name and include=author.organisation.
+    """
+
+    fields: str = ""
+    include: str = ""
+
+
+class AnalyticsQuerySchema(PDBaseModel):
+    """
+        Read-only SQL query on the analytics snapshot with optional
+        row and time limits (0 for the configured limits).
+    """
+
+    sql: str
+    max_rows: int = 0
+    timeout: float = 0.0
+
+    @field_validator('max_rows', 'timeout', mode='after')
+    @classmethod
+    def validate_limit(cls, value):
+        """
+            Limits are not negative
+        """
+        if value < 0:
+            raise ValueError(f'Limit {value} is less than zero')
+        return value
@@ -0,0 +1,48 @@
+"""
+    Production serving profile of the Web service 'Article Gate'.
+    Run from the `src` directory: `python -m app.serve`.
+"""
+
+import importlib.util
+import logging
+
+from . import config
+
+
+def _implementation(preferred: str) -> str:
+    """
+        Use fast uvloop/httptools implementation when it is installed.
+    """
+    if importlib.util.find_spec(preferred) is not None:
+        return preferred
+    logging.getLogger(__name__).warning("%s is not installed, falling back to auto", preferred)
+    return "auto"
+
+
+def uvicorn_options() -> dict:
+    """
+        Uvicorn server options of the production profile.
+    """
+    return {
+        "host": config.SERVE_HOST,
+        "port": config.SERVE_PORT,
+        "workers": config.SERVE_WORKERS,
+        "loop": _implementation("uvloop"),
+        "http": _implementation("httptools"),
+        "timeout_keep_alive": config.SERVE_KEEP_ALIVE,
+        "backlog": config.SERVE_BACKLOG,
+        "access_log": config.SERVE_ACCESS_LOG,
+        "proxy_headers": True,
+    }
+
+
+def main():
+    """
+        Start uvicorn with the production profile.
+    """
+    import uvicorn  # pylint: disable=import-outside-toplevel
+    uvicorn.run("app.main:app", **uvicorn_options())
+
+
+if __name__ == "__main__":
+    main()
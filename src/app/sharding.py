@@ -0,0 +1,202 @@
+"""
+    Sharded catalogue storage of the Web service 'Article Gate'.
+    Articles and their author bindings live on the shard chosen by the
+    DOI prefix (publisher or tenant), authors and organisations are placed
+    by their ID. Queries without a shard key fan out to all shards.
+"""
+
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+
+def parse_mapping(text: str) -> dict[str, str]:
+    """
+        Parse "key=value;key=value" configuration string.
+    """
+    mapping = {}
+    for item in text.split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        key, sep, value = item.partition("=")
+        if not sep or not key.strip() or not value.strip():
+            raise ValueError(f"Wrong mapping item '{item}', 'key=value' is expected")
+        mapping[key.strip()] = value.strip()
+    return mapping
+
+
+def doi_prefix(doi: str) -> str:
+    """
+        Registrant prefix of the DOI: '10.1101/2025.04.16.649184' -> '10.1101'.
+    """
+    return doi.partition("/")[0].strip().lower()
+
+
+class Shard:
+    """
+        Single catalogue database with its own engine.
+    """
+
+    def __init__(self, name: str, url: str, **engine_kwargs):
+        self.name = name
+        self.url = url
+        self.engine = create_async_engine(url, **engine_kwargs)
+        self.make_session = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    def __repr__(self) -> str:
+        return f"Shard({self.name!r}, {self.url!r})"
+
+
+class ShardRouter:
+    """
+        Maps shard keys to shards.
+        `prefixes` maps DOI prefixes to shard names, DOIs with other
+        prefixes go to the `default` shard (the first one if not given).
+    """
+
+    def __init__(self, shards: list[Shard], prefixes: dict[str, str] = None, default: str = ""):
+        if not shards:
+            raise ValueError("At least one shard is required")
+        self.shards = list(shards)
+        self.by_name = {shard.name: shard for shard in self.shards}
+        self.default = self.by_name[default] if default else self.shards[0]
+        self.prefixes = {
+            prefix.lower(): self.by_name[name] for prefix, name in (prefixes or {}).items()
+        }
+
+    @classmethod
+    def from_config(cls, shards: str, prefixes: str = "", default: str = "", **engine_kwargs):
+        """
+            Build router from configuration strings, see app/config.py.
+        """
+        return cls(
+            [Shard(name, url, **engine_kwargs) for name, url in parse_mapping(shards).items()],
+            parse_mapping(prefixes),
+            default,
+        )
+
+    def shard_for_doi(self, doi: str) -> Shard:
+        """
+            Shard storing the article and its bindings.
+        """
+        return self.prefixes.get(doi_prefix(doi), self.default)
+
+    def shard_for_id(self, ident: int) -> Shard:
+        """
+            Home shard of a new author or organisation.
+        """
+        return self.shards[ident % len(self.shards)]
+
+    def session(self) -> "ShardSession":
+        """
+            New session over all shards.
+        """
+        return ShardSession(self)
+
+    async def dispose(self):
+        """
+            Close connection pools of all shards.
+        """
+        await asyncio.gather(*(shard.engine.dispose() for shard in self.shards))
+
+
+class ShardSession:
+    """
+        Unit of work over the shards. Per-shard sessions are opened on demand,
+        fan-out queries run concurrently on every shard.
+        Commit is done shard by shard and is not atomic across shards.
+    """
+
+    def __init__(self, router: ShardRouter):
+        self.router = router
+        self._sessions = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def on(self, shard: Shard) -> AsyncSession:
+        """
+            Session of the shard.
+        """
+        session = self._sessions.get(shard.name)
+        if session is None:
+            session = self._sessions[shard.name] = shard.make_session()
+        return session
+
+    def for_doi(self, doi: str) -> AsyncSession:
+        """
+            Session of the shard storing article `doi`.
+        """
+        return self.on(self.router.shard_for_doi(doi))
+
+    def for_id(self, ident: int) -> AsyncSession:
+        """
+            Session of the home shard for a new author/organisation `ident`.
+        """
+        return self.on(self.router.shard_for_id(ident))
+
+    async def execute_all(self, statement) -> list:
+        """
+            Execute statement on every shard concurrently.
+            Results are in the shard order.
+        """
+        sessions = [self.on(shard) for shard in self.router.shards]
+        return await asyncio.gather(*(session.execute(statement) for session in sessions))
+
+    async def first(self, statement):
+        """
+            First non-empty scalar result of the statement over all shards.
+        """
+        for result in await self.execute_all(statement):
+            value = result.scalar()
+            if value is not None:
+                return value
+        return None
+
+    async def all_scalars(self, statement) -> list:
+        """
+            Merged scalar results of the statement over all shards.
+        """
+        merged = []
+        for result in await self.execute_all(statement):
+            merged.extend(result.scalars().all())
+        return merged
+
+    async def all_rows(self, statement) -> list:
+        """
+            Merged result rows of the statement over all shards.
+        """
+        merged = []
+        for result in await self.execute_all(statement):
+            merged.extend(result.all())
+        return merged
+
+    async def locate(self, model, ident):
+        """
+            Find object by primary key on any shard.
+            Returns (session, object) or (None, None).
+        """
+        sessions = [self.on(shard) for shard in self.router.shards]
+        found = await asyncio.gather(*(session.get(model, ident) for session in sessions))
+        for session, obj in zip(sessions, found):
+            if obj is not None:
+                return session, obj
+        return None, None
+
+    async def commit(self):
+        """
+            Commit every opened shard session.
+        """
+        for session in self._sessions.values():
+            await session.commit()
+
+    async def close(self):
+        """
+            Close every opened shard session.
+        """
+        sessions, self._sessions = list(self._sessions.values()), {}
+        await asyncio.gather(*(session.close() for session in sessions))
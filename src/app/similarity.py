@@ -0,0 +1,268 @@
+"""
+    Similar articles index of the Web service 'Article Gate'.
+    Every article has a MinHash signature of its title words and a set of
+    authors. Candidates are found with an LSH index over the signatures and
+    by shared authors, then scored in vectorised form with NumPy.
+"""
+
+import collections
+import re
+import zlib
+
+import numpy as np
+
+NUM_PERM = 32
+BANDS = 16
+TITLE_WEIGHT = 0.7
+AUTHOR_WEIGHT = 0.3
+# LSH buckets larger than this come from very common title words
+# and are skipped like stop words.
+MAX_BUCKET = 1000
+# Scoring is vectorised, but candidates are capped anyway.
+MAX_CANDIDATES = 50000
+CHUNK_SIZE = 20000
+
+_MERSENNE = (1 << 31) - 1
+_WORDS = re.compile(r"[^\W\d_]{3,}")
+_STOP_WORDS = frozenset((
+    "the", "and", "for", "with", "from", "into", "during", "via", "its", "their",
+    "are", "was", "were", "this", "that", "these", "those", "between", "under",
+))
+
+
+def title_words(title: str) -> set[str]:
+    """
+        Normalised informative words of the title.
+    """
+    return {word for word in _WORDS.findall(title.casefold()) if word not in _STOP_WORDS}
+
+
+class SimilarityIndex:
+    """
+        Append-only storage of article signatures with tombstones.
+        Band keys of the first `sorted_rows` rows are kept sorted for
+        binary search, newer rows form a short tail scanned linearly.
+        The sorted part is rebuilt when the tail grows too long.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("Number of permutations must be divisible by number of bands")
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self._perm_a = rng.integers(1, _MERSENNE, num_perm, dtype=np.uint64)
+        self._perm_b = rng.integers(0, _MERSENNE, num_perm, dtype=np.uint64)
+        self._word_hashes = {}
+
+        self.size = 0
+        self.signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self.band_keys = np.zeros((0, bands), dtype=np.uint32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.author_counts = np.zeros(0, dtype=np.int32)
+        self.dois = []
+        self.titles = []
+        self.rows = {}
+        self.authors = {}
+        self.author_rows = collections.defaultdict(set)
+
+        self.sorted_rows = 0
+        self._order = np.zeros((bands, 0), dtype=np.int32)
+        self._sorted_keys = np.zeros((bands, 0), dtype=np.uint32)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, doi: str) -> bool:
+        return doi in self.rows
+
+    def _word_hash(self, word: str) -> int:
+        value = self._word_hashes.get(word)
+        if value is None:
+            value = self._word_hashes[word] = zlib.crc32(word.encode())
+        return value
+
+    def signatures_of(self, titles: list[str]) -> np.ndarray:
+        """
+            MinHash signatures of titles, one row per title.
+        """
+        words = [sorted({self._word_hash(word) for word in title_words(title)})
+                 for title in titles]
+        lengths = np.array([len(item) or 1 for item in words])
+        hashes = np.fromiter(
+            (value for item in words for value in (item or [_MERSENNE])),
+            dtype=np.uint64, count=int(lengths.sum()),
+        )
+        permuted = (np.outer(hashes, self._perm_a) + self._perm_b) % _MERSENNE
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        return np.minimum.reduceat(permuted, starts, axis=0).astype(np.uint32)
+
+    def _band_keys_of(self, signatures: np.ndarray) -> np.ndarray:
+        """
+            One 32-bit key per band: FNV-style mix of band signature values.
+        """
+        rows = signatures.reshape(len(signatures), self.bands, -1).astype(np.uint64)
+        keys = np.full((len(signatures), self.bands), 1469598103934665603, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for column in range(rows.shape[2]):
+                keys = (keys ^ rows[:, :, column]) * np.uint64(1099511628211)
+        return (keys ^ (keys >> np.uint64(32))).astype(np.uint32)
+
+    def _grow(self, extra: int):
+        capacity = len(self.alive)
+        if self.size + extra <= capacity:
+            return
+        capacity = max(self.size + extra, 2 * capacity, 1024)
+        for name in ("signatures", "band_keys", "alive", "author_counts"):
+            array = getattr(self, name)
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            setattr(self, name, grown)
+
+    def add_articles(self, articles: list[tuple[str, str]]):
+        """
+            Add or replace articles given as (doi, title) pairs.
+            Replaced article moves to a new row with the same authors.
+        """
+        for start in range(0, len(articles), CHUNK_SIZE):
+            chunk = articles[start:start + CHUNK_SIZE]
+            signatures = self.signatures_of([title for _, title in chunk])
+            self._grow(len(chunk))
+            begin, end = self.size, self.size + len(chunk)
+            self.signatures[begin:end] = signatures
+            self.band_keys[begin:end] = self._band_keys_of(signatures)
+            self.alive[begin:end] = True
+            self.size = end
+
+            for row, (doi, title) in enumerate(chunk, start=begin):
+                authors = self.authors.get(doi, frozenset())
+                old_row = self.rows.get(doi)
+                if old_row is not None:
+                    self.alive[old_row] = False
+                    for author_id in authors:
+                        self.author_rows[author_id].discard(old_row)
+                self.rows[doi] = row
+                self.dois.append(doi)
+                self.titles.append(title)
+                self.author_counts[row] = len(authors)
+                for author_id in authors:
+                    self.author_rows[author_id].add(row)
+        self._maybe_reindex()
+
+    def remove_article(self, doi: str):
+        """
+            Remove article from the index.
+        """
+        row = self.rows.pop(doi, None)
+        if row is None:
+            return
+        self.alive[row] = False
+        for author_id in self.authors.pop(doi, frozenset()):
+            self.author_rows[author_id].discard(row)
+
+    def set_authors(self, doi: str, author_ids):
+        """
+            Replace authors of the article.
+        """
+        row = self.rows.get(doi)
+        old_authors = self.authors.get(doi, frozenset())
+        new_authors = frozenset(author_ids)
+        self.authors[doi] = new_authors
+        if row is None:
+            return
+        for author_id in old_authors - new_authors:
+            self.author_rows[author_id].discard(row)
+        for author_id in new_authors - old_authors:
+            self.author_rows[author_id].add(row)
+        self.author_counts[row] = len(new_authors)
+
+    def _maybe_reindex(self):
+        tail = self.size - self.sorted_rows
+        if tail > max(1024, self.sorted_rows // 10):
+            self.reindex()
+
+    def reindex(self):
+        """
+            Sort band keys of all rows for binary search.
+        """
+        keys = self.band_keys[:self.size].T
+        self._order = np.argsort(keys, axis=1, kind="stable").astype(np.int32)
+        self._sorted_keys = np.take_along_axis(keys, self._order, axis=1)
+        self.sorted_rows = self.size
+
+    def _candidates(self, row: int) -> np.ndarray:
+        """
+            Rows sharing an LSH band or an author with `row`.
+        """
+        found = [
+            np.fromiter(self.author_rows[author_id], dtype=np.int64)
+            for author_id in self.authors.get(self.dois[row], ())
+        ]
+        query_keys = self.band_keys[row]
+        for band in range(self.bands):
+            keys = self._sorted_keys[band]
+            low = np.searchsorted(keys, query_keys[band], side="left")
+            high = np.searchsorted(keys, query_keys[band], side="right")
+            if high - low <= MAX_BUCKET:
+                found.append(self._order[band, low:high])
+        tail = self.band_keys[self.sorted_rows:self.size]
+        found.append(np.flatnonzero((tail == query_keys).any(axis=1)) + self.sorted_rows)
+
+        candidates = np.unique(np.concatenate(found)) if found else np.zeros(0, np.int64)
+        candidates = candidates[self.alive[candidates] & (candidates != row)]
+        return candidates[:MAX_CANDIDATES]
+
+    def similar(self, doi: str, k: int) -> list[dict]:
+        """
+            Top-k similar articles: estimated Jaccard similarity of title
+            words and Jaccard similarity of authors, weighted.
+        """
+        row = self.rows.get(doi)
+        if row is None:
+            return []
+        candidates = self._candidates(row)
+        if len(candidates) == 0:
+            return []
+
+        title_score = (self.signatures[candidates] == self.signatures[row]).mean(axis=1)
+
+        authors = self.authors.get(doi, ())
+        if authors:
+            rows = np.concatenate([
+                np.fromiter(self.author_rows[author_id], dtype=np.int64) for author_id in authors
+            ])
+            unique_rows, shared_counts = np.unique(rows, return_counts=True)
+            positions = np.minimum(np.searchsorted(unique_rows, candidates), len(unique_rows) - 1)
+            shared = np.where(unique_rows[positions] == candidates, shared_counts[positions], 0)
+            union = len(authors) + self.author_counts[candidates] - shared
+            author_score = shared / np.maximum(union, 1)
+        else:
+            author_score = np.zeros(len(candidates))
+
+        scores = TITLE_WEIGHT * title_score + AUTHOR_WEIGHT * author_score
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {
+                "doi": self.dois[candidates[idx]],
+                "title": self.titles[candidates[idx]],
+                "score": round(float(scores[idx]), 4),
+            }
+            for idx in top if scores[idx] > 0
+        ]
+
+
+def build_index(articles: list[tuple[str, str]], bindings: list[tuple[str, int]]):
+    """
+        Build index from (doi, title) articles and (doi, author_id) bindings.
+    """
+    index = SimilarityIndex()
+    authors = collections.defaultdict(set)
+    for doi, author_id in bindings:
+        authors[doi].add(author_id)
+    for doi, author_ids in authors.items():
+        index.set_authors(doi, author_ids)
+    index.add_articles(articles)
+    index.reindex()
+    return index
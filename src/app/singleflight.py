@@ -0,0 +1,80 @@
+"""
+    Request coalescing (single-flight): concurrent calls with
+    the same key share one in-flight execution and its result.
+"""
+
+import asyncio
+import collections
+
+
+class SingleFlight:
+    """
+        Group of coalesced calls.
+        The first caller of a key starts the work in a separate task,
+        later callers with the same key await the same task.
+        Key is forgotten as soon as the work is done, so results are
+        never cached beyond the lifetime of the in-flight call.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls = {}
+        self.counters = collections.Counter()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key, func):
+        """
+            Run coroutine function `func` once per concurrent `key`.
+            Exceptions of `func` are raised in every caller.
+            Cancellation of one caller does not cancel the shared work
+            while other callers are still waiting for it.
+        """
+        self.counters["calls"] += 1
+        if not self.enabled:
+            self.counters["executions"] += 1
+            return await func()
+
+        call = self._calls.get(key)
+        if call is None or call[0].cancelled() or call[0].cancelling():
+            self.counters["executions"] += 1
+            task = asyncio.create_task(func())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.counters["shared"] += 1
+
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                raise
+            if call[1] == 1:
+                # The last waiter has gone, nobody needs the result.
+                task.cancel()
+            raise
+        finally:
+            call[1] -= 1
+
+    def _forget(self, key, call):
+        """
+            Drop finished call, unless the key was already reused.
+        """
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        task = call[0]
+        if not task.cancelled() and task.exception() is not None:
+            self.counters["errors"] += 1
+
+    def snapshot(self) -> dict:
+        """
+            Current state for the metrics endpoint.
+        """
+        return {
+            "enabled": self.enabled,
+            "inflight_keys": len(self._calls),
+            **self.counters,
+        }
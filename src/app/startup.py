@@ -0,0 +1,75 @@
+"""
+    Start up routines of the Web service 'Article Gate':
+    schema bootstrap guarded by a schema version marker
+    and warm-up of the DB connection pool.
+"""
+
+import asyncio
+import hashlib
+
+import sqlalchemy as sqla
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateTable
+
+
+def schema_version(metadata: sqla.MetaData) -> int:
+    """
+        Fingerprint of the ORM schema as a positive 31-bit integer,
+        suitable for SQLite 'PRAGMA user_version'.
+    """
+    ddl = "\n".join(
+        str(CreateTable(table).compile(dialect=sqlite.dialect()))
+        for table in metadata.sorted_tables
+    )
+    digest = hashlib.sha256(ddl.encode()).digest()
+    return (int.from_bytes(digest[:4], "big") >> 1) or 1
+
+
+async def bootstrap_schema(engine, metadata: sqla.MetaData) -> bool:
+    """
+        Create missing tables unless the DB is already marked
+        with the current schema version.
+        Returns True if DDL was executed.
+    """
+    version = schema_version(metadata)
+    is_sqlite = engine.dialect.name == "sqlite"
+
+    async with engine.begin() as conn:
+        if is_sqlite:
+            stored = (await conn.exec_driver_sql("PRAGMA user_version")).scalar()
+            if stored == version:
+                return False
+
+        await conn.run_sync(metadata.create_all)
+        if is_sqlite:
+            await conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+    return True
+
+
+async def warm_up(make_session, reads, connections: int, tables=()):
+    """
+        Open `connections` sessions concurrently and run every read function
+        of `reads` ((read_func, *args) tuples) in each, so statements are
+        compiled and pooled connections opened before the first request.
+        Tables from `tables` are scanned once to pre-warm the page cache;
+        with several shards use prewarm_tables() with each shard's sessions.
+    """
+
+    async def run_reads():
+        async with make_session() as session:
+            for read_func, *args in reads:
+                await read_func(session, *args)
+
+    await asyncio.gather(prewarm_tables(make_session, tables),
+                         *(run_reads() for _ in range(max(1, connections))))
+
+
+async def prewarm_tables(make_session, tables):
+    """
+        Read every table of `tables` once to pre-warm the page cache.
+    """
+    if not tables:
+        return
+    async with make_session() as session:
+        for table in tables:
+            await session.execute(sqla.select(sqla.func.count()).select_from(table))
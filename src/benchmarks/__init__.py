@@ -0,0 +1,4 @@
+"""
+    Performance benchmarks of the Web service 'Article Gate'.
+    Run from the `src` directory: `python -m benchmarks.<name>`.
+"""
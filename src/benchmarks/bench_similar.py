@@ -0,0 +1,79 @@
+"""
+    Similar articles index benchmark on a synthetic catalogue:
+    build time, memory, top-k query latency and incremental updates.
+    Usage: `python -m benchmarks.bench_similar [number of articles]`.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from app.similarity import build_index
+
+VOCABULARY = 20000
+AUTHORS = 300000
+QUERIES = 1000
+UPDATES = 1000
+K = 10
+
+
+def synthetic_catalogue(size: int, seed: int = 7):
+    """
+        Titles of 6-14 Zipf-distributed words and 2-10 Zipf-distributed authors.
+    """
+    rng = np.random.default_rng(seed)
+    words = [f"w{idx}x" for idx in range(VOCABULARY)]
+    articles, bindings = [], []
+    for idx in range(size):
+        doi = f"10.{1000 + idx % 50}/{idx}"
+        title_ids = np.minimum(rng.zipf(1.3, rng.integers(6, 15)), VOCABULARY) - 1
+        articles.append((doi, " ".join(words[word] for word in title_ids)))
+        for author_id in np.minimum(rng.zipf(1.5, rng.integers(2, 11)), AUTHORS):
+            bindings.append((doi, int(author_id) + idx % 1000 * 300))
+    return articles, bindings
+
+
+def percentile(values, share: float) -> float:
+    """
+        Percentile in milliseconds.
+    """
+    return float(np.percentile(values, share * 100)) * 1000
+
+
+def main():
+    """
+        Run the benchmark.
+    """
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    started = time.perf_counter()
+    articles, bindings = synthetic_catalogue(size)
+    print(f"catalogue: {size} articles, {len(bindings)} bindings, "
+          f"generated in {time.perf_counter() - started:.1f} s")
+
+    started = time.perf_counter()
+    index = build_index(articles, bindings)
+    print(f"build: {time.perf_counter() - started:.1f} s")
+    arrays = (index.signatures, index.band_keys, index.alive, index.author_counts,
+              index._order, index._sorted_keys)  # pylint: disable=protected-access
+    print(f"arrays: {sum(array.nbytes for array in arrays) / 2**20:.0f} MiB")
+
+    rng = np.random.default_rng(1)
+    latencies, found = [], 0
+    for idx in rng.integers(0, size, QUERIES):
+        started = time.perf_counter()
+        found += len(index.similar(articles[idx][0], K))
+        latencies.append(time.perf_counter() - started)
+    print(f"top-{K} query: p50 {percentile(latencies, 0.5):.2f} ms, "
+          f"p99 {percentile(latencies, 0.99):.2f} ms, {found / QUERIES:.1f} results")
+
+    started = time.perf_counter()
+    for idx in range(UPDATES):
+        doi, title = articles[idx]
+        index.add_articles([(doi, title + " updated")])
+    elapsed = (time.perf_counter() - started) / UPDATES
+    print(f"incremental title update: {elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
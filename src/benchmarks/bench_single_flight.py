@@ -0,0 +1,66 @@
+"""
+    Thundering-herd benchmark for request coalescing:
+    many simultaneous identical reads of one popular DOI.
+    Reports number of executed DB queries with single-flight
+    enabled and disabled.
+"""
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("ADMISSION_ENABLED", "0")
+
+# pylint: disable=wrong-import-position
+import httpx
+from sqlalchemy import event
+
+from app import main as articleGate
+
+DOI = "10.1101/2025.04.16.649184"
+HERD_SIZE = 500
+ROUTES = ("/article", "/authors_of_article")
+
+
+async def herd(route: str, enabled: bool) -> tuple[int, float]:
+    """
+        Fire HERD_SIZE concurrent identical requests.
+        Returns (number of DB queries, elapsed seconds).
+    """
+    articleGate.read_flight.enabled = enabled
+    queries = 0
+
+    def count(*_):
+        nonlocal queries
+        queries += 1
+
+    sync_engine = articleGate.db_engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", count)
+    transport = httpx.ASGITransport(app=articleGate.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(
+                *(client.get(route, params={"doi": DOI}) for _ in range(HERD_SIZE))
+            )
+            elapsed = time.perf_counter() - started
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", count)
+
+    assert all(resp.status_code == 200 for resp in responses)
+    return queries, elapsed
+
+
+async def main():
+    """
+        Run the herd for every route with and without coalescing.
+    """
+    print(f"{'route':<22}{'single-flight':>15}{'queries':>10}{'seconds':>10}")
+    for route in ROUTES:
+        for enabled in (False, True):
+            queries, elapsed = await herd(route, enabled)
+            print(f"{route:<22}{str(enabled):>15}{queries:>10}{elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""
+    Cold start benchmark: import time of the application module,
+    start up (lifespan) time and latency of the first requests.
+    Every run is done in a fresh interpreter.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+RUNS = 5
+
+# Executed in a child interpreter, prints timings as JSON.
+CHILD = """
+import json, time
+started = time.perf_counter()
+from app import main as articleGate
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(articleGate.app) as client:
+    ready = time.perf_counter()
+    client.get("/authors_of_article", params={"doi": "10.1101/2025.04.16.649184"})
+    first = time.perf_counter()
+    client.get("/authors_of_article", params={"doi": "10.1101/2021.11.25.470000"})
+    second = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "startup": ready - imported,
+    "first_request": first - ready,
+    "second_request": second - first,
+}))
+"""
+
+
+def run_child(warm_up: bool) -> dict:
+    """
+        Start application once in a fresh interpreter.
+    """
+    env = dict(os.environ, STARTUP_WARM_UP=str(int(warm_up)))
+    output = subprocess.run([sys.executable, "-c", CHILD], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """
+        Print median timings (ms) with and without warm-up.
+    """
+    print(f"{'warm-up':<10}{'import':>10}{'startup':>10}{'first':>10}{'second':>10}")
+    for warm_up in (False, True):
+        runs = [run_child(warm_up) for _ in range(RUNS)]
+        median = {
+            key: sorted(run[key] for run in runs)[RUNS // 2] * 1000
+            for key in runs[0]
+        }
+        print(f"{str(warm_up):<10}{median['import']:>10.1f}{median['startup']:>10.1f}"
+              f"{median['first_request']:>10.1f}{median['second_request']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
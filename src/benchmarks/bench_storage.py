@@ -0,0 +1,147 @@
+"""
+    Storage benchmark of integer article keys: on-disk size of the catalogue
+    and page cache hit ratio of the authors-of-article lookup before and after
+    `app.migrate_keys` on a synthetic catalogue.
+    Run from the `src` directory: `python -m benchmarks.bench_storage [articles]`.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import migrate_keys
+
+AUTHORS_PER_ARTICLE = 6
+LOOKUPS = 20000
+# Page cache of one connection, KiB (SQLite default).
+CACHE_KIB = 2000
+
+# Layout of the DOI-keyed schema, as created by its ORM models.
+OLD_SCHEMA = """
+    CREATE TABLE article (doi VARCHAR NOT NULL, title VARCHAR NOT NULL,
+        posting_date VARCHAR NOT NULL, PRIMARY KEY (doi));
+    CREATE TABLE article_to_author (doi VARCHAR NOT NULL, author_id INTEGER NOT NULL,
+        place INTEGER NOT NULL, PRIMARY KEY (doi, author_id));
+"""
+OLD_LOOKUP = "SELECT author_id, place FROM article_to_author WHERE doi = '{}' ORDER BY place"
+NEW_LOOKUP = "SELECT b.author_id, b.place FROM article AS a " \
+             "JOIN article_to_author AS b ON b.article_id = a.id " \
+             "WHERE a.doi = '{}' ORDER BY b.place"
+
+SQLITE_DBSTATUS_CACHE_HIT = 7
+SQLITE_DBSTATUS_CACHE_MISS = 8
+
+
+def make_catalogue(path: str, articles: int) -> list[str]:
+    """
+        DOI-keyed catalogue with bioRxiv-like DOIs. Returns the DOIs.
+    """
+    rnd = random.Random(1)
+    dois = [f"10.{rnd.choice((1101, 1038, 1371))}/2025.{rnd.randint(1, 12):02d}."
+            f"{rnd.randint(1, 28):02d}.{idx:06d}" for idx in range(articles)]
+    conn = sqlite3.connect(path)
+    conn.executescript(OLD_SCHEMA)
+    conn.executemany("INSERT INTO article VALUES (?, ?, ?)",
+                     ((doi, f"Title of {doi}", "2025-01-01") for doi in dois))
+    conn.executemany("INSERT INTO article_to_author VALUES (?, ?, ?)", (
+        (doi, author_id, place)
+        for doi in dois
+        for place, author_id in enumerate(rnd.sample(range(articles), AUTHORS_PER_ARTICLE), 1)
+    ))
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    return dois
+
+
+def table_sizes(path: str) -> dict[str, int]:
+    """
+        Bytes of every table and index.
+    """
+    conn = sqlite3.connect(path)
+    sizes = dict(conn.execute("SELECT name, sum(pgsize) FROM dbstat GROUP BY name").fetchall())
+    conn.close()
+    return sizes
+
+
+def run_lookups(path: str, lookup: str, dois: list[str]) -> tuple[int, int, float]:
+    """
+        Run random lookups on a fresh connection with the default page cache.
+        Returns (cache hits, cache misses, microseconds per lookup).
+        Python sqlite3 module does not expose sqlite3_db_status, so a
+        connection is opened through the library directly.
+    """
+    lib = ctypes.CDLL(ctypes.util.find_library("sqlite3"))
+    db = ctypes.c_void_p()
+    lib.sqlite3_open_v2(path.encode(), ctypes.byref(db), 1, None)  # SQLITE_OPEN_READONLY
+    lib.sqlite3_exec(db, f"PRAGMA cache_size = -{CACHE_KIB}".encode(), None, None, None)
+
+    rnd = random.Random(2)
+    statements = [lookup.format(rnd.choice(dois)).encode() for _ in range(LOOKUPS)]
+    started = time.perf_counter()
+    for statement in statements:
+        lib.sqlite3_exec(db, statement, None, None, None)
+    elapsed = time.perf_counter() - started
+
+    counts = []
+    for status in (SQLITE_DBSTATUS_CACHE_HIT, SQLITE_DBSTATUS_CACHE_MISS):
+        current, high = ctypes.c_int(), ctypes.c_int()
+        lib.sqlite3_db_status(db, status, ctypes.byref(current), ctypes.byref(high), 0)
+        counts.append(current.value)
+    lib.sqlite3_close(db)
+    return counts[0], counts[1], elapsed / LOOKUPS * 1e6
+
+
+async def migrate(path: str) -> float:
+    """
+        Migrate the catalogue and compact the file. Returns migration seconds.
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    started = time.perf_counter()
+    await migrate_keys.migrate(engine, batch_size=5000)
+    elapsed = time.perf_counter() - started
+    await migrate_keys.vacuum(engine)
+    await engine.dispose()
+    return elapsed
+
+
+def report(label: str, path: str, lookup: str, dois: list[str]):
+    """
+        Print sizes and lookup statistics of the catalogue.
+    """
+    sizes = table_sizes(path)
+    hits, misses, micros = run_lookups(path, lookup, dois)
+    print(f"{label}: file {os.path.getsize(path) / 2 ** 20:.1f} MiB, "
+          f"cache hit ratio {hits / max(1, hits + misses):.3f}, "
+          f"{(hits + misses) / LOOKUPS:.1f} page reads and {misses / LOOKUPS:.2f} misses "
+          f"per lookup, {micros:.1f} us per lookup")
+    for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        if size >= 2 ** 16:
+            print(f"    {name:<36}{size / 2 ** 20:>8.1f} MiB")
+
+
+def main():
+    """
+        Compare DOI-keyed and integer-keyed layouts.
+    """
+    articles = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalogue.sqlite3")
+        dois = make_catalogue(path, articles)
+        print(f"{articles} articles, {articles * AUTHORS_PER_ARTICLE} bindings, "
+              f"{LOOKUPS} random authors-of-article lookups, {CACHE_KIB} KiB page cache")
+        report("DOI keys", path, OLD_LOOKUP, dois)
+        print(f"migration: {asyncio.run(migrate(path)):.1f} s")
+        report("integer keys", path, NEW_LOOKUP, dois)
+
+
+if __name__ == "__main__":
+    main()
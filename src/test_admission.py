@@ -0,0 +1,126 @@
+"""
+    Tests for admission control of ArticleGate Web-application
+"""
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from .app.admission import TokenBucket, AdmissionController, AdmissionMiddleware
+from .app import main as articleGate
+
+
+def make_controller(**kwargs):
+    """
+        Controller with generous defaults
+    """
+    params = {
+        "max_inflight": 2,
+        "max_queue": 1,
+        "queue_timeout": 0.05,
+        "client_rate": 100.0,
+        "client_burst": 100.0,
+        "route_rate": 100.0,
+        "route_burst": 100.0,
+    }
+    params.update(kwargs)
+    return AdmissionController(**params)
+
+
+def test_token_bucket():
+    """
+        Bucket gives out `capacity` tokens and then refills with `rate`
+    """
+    bucket = TokenBucket(rate=2.0, capacity=2.0, now=0.0)
+    assert bucket.take(0.0) == 0.0
+    assert bucket.take(0.0) == 0.0
+    assert bucket.take(0.0) == 0.5
+    assert bucket.take(0.5) == 0.0
+
+
+def test_client_rate_limit():
+    """
+        Client exceeding its bucket receives 429 with Retry-After
+    """
+    controller = make_controller(client_rate=0.1, client_burst=2.0)
+    test_app = FastAPI()
+    test_app.add_middleware(AdmissionMiddleware, controller=controller)
+
+    @test_app.get("/ping")
+    async def ping():
+        return "pong"
+
+    test_client = TestClient(test_app)
+    assert test_client.get("/ping").status_code == 200
+    assert test_client.get("/ping").status_code == 200
+
+    resp = test_client.get("/ping")
+    assert resp.status_code == 429
+    assert int(resp.headers["retry-after"]) >= 1
+    assert controller.snapshot()["rejected_client_rate"] == 1
+
+
+def test_inflight_limit():
+    """
+        Requests above max_inflight wait in a bounded queue or are shed
+    """
+    async def scenario():
+        controller = make_controller()
+        assert await controller.acquire()
+        assert await controller.acquire()
+
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.queued == 1
+        assert not await controller.acquire()
+
+        controller.release()
+        assert await waiter
+        assert controller.inflight == 2
+
+        assert not await controller.acquire()
+        snapshot = controller.snapshot()
+        assert snapshot["shed_queue_full"] == 1
+        assert snapshot["shed_queue_timeout"] == 1
+
+        controller.release()
+        controller.release()
+        assert controller.inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_metrics():
+    """
+        GET /metrics exports admission state
+    """
+    client = TestClient(articleGate.app)
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.json()["admission"]["max_inflight"] == articleGate.config.ADMISSION_MAX_INFLIGHT
+
+
+def test_route_rate_limit():
+    """
+        Route buckets are keyed by the route template, a request rejected
+        by the route limit does not use up the client quota
+    """
+    controller = make_controller(client_rate=0.1, client_burst=4.0,
+                                 route_rate=0.1, route_burst=2.0)
+    test_app = FastAPI()
+    test_app.add_middleware(AdmissionMiddleware, controller=controller, router=test_app.router)
+
+    @test_app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return item_id
+
+    test_client = TestClient(test_app)
+    assert test_client.get("/items/1").status_code == 200
+    assert test_client.get("/items/2").status_code == 200
+    assert test_client.get("/items/3").status_code == 429
+    assert test_client.get("/missing").status_code == 404
+
+    snapshot = controller.snapshot()
+    assert snapshot["rejected_route_rate"] == 1
+    assert snapshot["tracked_routes"] == 2
+    assert controller.clients.wait("testclient", controller.clock()) == 0.0
@@ -0,0 +1,247 @@
+"""
+    Tests for the analytics snapshot of ArticleGate Web-application
+"""
+
+import asyncio
+import os
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from .app import main as articleGate
+from .app import analytics, backup, startup
+from .app.models.base import BaseModel
+from .app.models.article import ArticleModel
+from .app.models.author import AuthorModel
+from .app.models.organisation import OrganisationModel
+from .app.models.article_to_author import ArticleToAuthorModel
+from .app.sharding import ShardRouter
+
+pytest.importorskip("duckdb")
+
+DOI = "10.1101/2025.04.16.649184"
+OTHER_DOI = "10.1038/s41586-025-0001"
+
+
+def make_router(tmp_path):
+    """
+        Two shards with organisations, authors and one article on each shard
+    """
+    router = ShardRouter.from_config(
+        ";".join(f"{name}=sqlite+aiosqlite:///{tmp_path / name}.sqlite3"
+                 for name in ("main", "biorxiv")), "10.1101=biorxiv")
+
+    async def fill():
+        for shard in router.shards:
+            await startup.bootstrap_schema(shard.engine, BaseModel.metadata)
+        async with router.session() as session:
+            for org_id in range(2):
+                session.for_id(org_id).add(OrganisationModel(id=org_id, title=f"Org {org_id}"))
+            for author_id in range(4):
+                session.for_id(author_id).add(AuthorModel(
+                    id=author_id, name=f"Author {author_id}", affiliation_org_id=author_id % 2))
+            for doi, year in ((DOI, "2025"), (OTHER_DOI, "2024")):
+                session.for_doi(doi).add(ArticleModel(
+                    id=1, doi=doi, title=f"Article {doi}", posting_date=f"{year}-04-22"))
+                for place, author_id in enumerate(range(4), 1):
+                    session.for_doi(doi).add(ArticleToAuthorModel(
+                        article_id=1, author_id=author_id, place=place))
+            await session.commit()
+
+    asyncio.run(fill())
+    return router
+
+
+def execute(router, name, statement, params=()):
+    """
+        Run a write statement on the shard database file
+    """
+    conn = sqlite3.connect(backup.database_path(router.by_name[name].url))
+    with conn:
+        conn.execute(statement, params)
+    conn.close()
+
+
+def test_incremental_refresh(tmp_path):
+    """
+        Changed rows are appended as delta parts, merged on read and compacted
+    """
+    router = make_router(tmp_path)
+    # Changes are captured only with a schedule, it is not started here.
+    snapshot = analytics.AnalyticsSnapshot(router, str(tmp_path / "analytics"), interval=3600,
+                                           max_parts=2, pause=0)
+    per_org = "SELECT o.title, count(*) AS n FROM article_to_author AS b " \
+              "JOIN author AS a ON a.id = b.author_id " \
+              "JOIN organisation AS o ON o.id = a.affiliation_org_id GROUP BY 1 ORDER BY 1"
+
+    async def scenario():
+        first = await snapshot.refresh()
+        assert {result["mode"] for result in first.values()} == {"full"}
+        assert (await snapshot.query(per_org))["rows"] == [["Org 0", 4], ["Org 1", 4]]
+
+        execute(router, "biorxiv", "UPDATE article SET title = 'Renamed' WHERE doi = ?", (DOI,))
+        execute(router, "biorxiv", "DELETE FROM article_to_author WHERE author_id = 2")
+        # Merge of authors re-keys bindings: both keys are changed.
+        execute(router, "biorxiv", "UPDATE article_to_author SET author_id = 2 "
+                                   "WHERE author_id = 1")
+        second = await snapshot.refresh()
+        assert second["biorxiv"] == {"mode": "incremental", "changes": 3}
+        assert second["main"] == {"mode": "incremental", "changes": 0}
+
+        titles = await snapshot.query("SELECT doi, title FROM article ORDER BY doi")
+        assert titles["rows"] == [[OTHER_DOI, f"Article {OTHER_DOI}"], [DOI, "Renamed"]]
+        bindings = await snapshot.query(
+            f"SELECT author_id, place FROM article_to_author WHERE doi = '{DOI}' ORDER BY place")
+        assert bindings["rows"] == [[0, 1], [2, 2], [3, 4]]
+        assert (await snapshot.query(per_org))["rows"] == [["Org 0", 4], ["Org 1", 3]]
+
+        execute(router, router.shard_for_id(0).name, "DELETE FROM organisation WHERE id = 0")
+        await snapshot.refresh()
+        orgs = await snapshot.query("SELECT id FROM organisation ORDER BY id")
+        assert orgs["rows"] == [[1]]
+
+        # Second delta of the shard table reaches max_parts: compacted into a new base.
+        execute(router, "biorxiv", "UPDATE article SET title = 'Final' WHERE doi = ?", (DOI,))
+        await snapshot.refresh()
+        current = analytics.current_parts(snapshot.directory, "article", "biorxiv")
+        assert [part[2] for part in current] == ["base"]
+        titles = await snapshot.query("SELECT title FROM article ORDER BY doi")
+        assert titles["rows"] == [[f"Article {OTHER_DOI}"], ["Final"]]
+
+        # Replaced parts are kept for queries of other workers until the grace ends.
+        parts = analytics.list_parts(snapshot.directory, "article")
+        assert len([part for part in parts if part[0] == "biorxiv"]) == 4
+        assert analytics.remove_retired(snapshot.directory, 3600.0) == []
+        assert len(analytics.remove_retired(snapshot.directory, -1.0)) == 3
+        assert analytics.list_parts(snapshot.directory, "article") == \
+            analytics.current_parts(snapshot.directory, "article")
+        titles = await snapshot.query("SELECT title FROM article ORDER BY doi")
+        assert titles["rows"] == [[f"Article {OTHER_DOI}"], ["Final"]]
+
+    asyncio.run(scenario())
+    conn = sqlite3.connect(backup.database_path(router.by_name["biorxiv"].url))
+    assert conn.execute(f"SELECT count(*) FROM {analytics.CHANGE_TABLE}").fetchone() == (0,)
+    conn.close()
+    asyncio.run(router.dispose())
+
+
+def test_concurrent_refresh(tmp_path):
+    """
+        Workers refreshing one directory at once: the refreshes run one
+        after another, part names do not collide
+    """
+    router = make_router(tmp_path)
+    snapshots = [analytics.AnalyticsSnapshot(router, str(tmp_path / "analytics"), interval=3600,
+                                             pause=0, batch_size=3) for _ in range(2)]
+
+    async def scenario():
+        results = await asyncio.gather(*(snapshot.refresh() for snapshot in snapshots))
+        for name in ("main", "biorxiv"):
+            assert sorted(result[name]["mode"] for result in results) == ["full", "incremental"]
+
+        execute(router, "biorxiv", "UPDATE article SET title = 'Renamed' WHERE doi = ?", (DOI,))
+        results = await asyncio.gather(*(snapshot.refresh() for snapshot in snapshots))
+        assert sorted(result["biorxiv"]["changes"] for result in results) == [0, 1]
+        titles = await snapshots[1].query(f"SELECT title FROM article WHERE doi = '{DOI}'")
+        assert titles["rows"] == [["Renamed"]]
+        counts = await snapshots[0].query("SELECT count(*) FROM article_to_author")
+        assert counts["rows"] == [[8]]
+
+    asyncio.run(scenario())
+    parts = analytics.list_parts(str(tmp_path / "analytics"), "article")
+    assert len({part[3] for part in parts}) == len(parts) == 3
+    assert sorted(os.listdir(tmp_path / "analytics" / "article")) == \
+        sorted(os.path.basename(part[3]) for part in parts)
+    asyncio.run(router.dispose())
+
+
+def test_unscheduled_refresh(tmp_path):
+    """
+        Without a schedule refreshes rebuild the snapshot, shards carry
+        no capture triggers and ones left by a schedule are dropped
+    """
+    router = make_router(tmp_path)
+    directory = str(tmp_path / "analytics")
+    scheduled = analytics.AnalyticsSnapshot(router, directory, interval=3600, pause=0)
+    snapshot = analytics.AnalyticsSnapshot(router, directory, pause=0)
+
+    def captured(name):
+        conn = sqlite3.connect(backup.database_path(router.by_name[name].url))
+        try:
+            return analytics.capture_installed(conn)
+        finally:
+            conn.close()
+
+    async def scenario():
+        await scheduled.refresh()
+        assert captured("main") and captured("biorxiv")
+        assert await scheduled.remove_unscheduled_capture() == []
+        assert sorted(await snapshot.remove_unscheduled_capture()) == ["biorxiv", "main"]
+        assert not captured("main") and not captured("biorxiv")
+        assert await snapshot.remove_unscheduled_capture() == []
+
+        execute(router, "biorxiv", "UPDATE article SET title = 'Renamed' WHERE doi = ?", (DOI,))
+        result = await snapshot.refresh()
+        assert {summary["mode"] for summary in result.values()} == {"full"}
+        assert not captured("biorxiv")
+        titles = await snapshot.query(f"SELECT title FROM article WHERE doi = '{DOI}'")
+        assert titles["rows"] == [["Renamed"]]
+
+    asyncio.run(scenario())
+    asyncio.run(router.dispose())
+
+
+def test_query_limits(tmp_path):
+    """
+        Only single SELECT statements within the snapshot, rows and time are limited
+    """
+    router = make_router(tmp_path)
+    snapshot = analytics.AnalyticsSnapshot(router, str(tmp_path / "analytics"), pause=0,
+                                           max_rows=3, query_timeout=0.3)
+
+    async def scenario():
+        with pytest.raises(LookupError):
+            await snapshot.query("SELECT 1")
+        await snapshot.refresh()
+
+        result = await snapshot.query("SELECT place FROM article_to_author ORDER BY place")
+        assert result["columns"] == ["place"]
+        assert len(result["rows"]) == 3 and result["truncated"]
+        assert len((await snapshot.query("SELECT * FROM author", max_rows=2))["rows"]) == 2
+
+        for sql in ("DELETE FROM author", "SELECT 1; SELECT 2",
+                    f"COPY author TO '{tmp_path}/out.csv'", "SELECT * FROM missing",
+                    "SELECT * FROM read_csv('/etc/passwd')"):
+            with pytest.raises(ValueError):
+                await snapshot.query(sql)
+
+        with pytest.raises(analytics.QueryTimeout):
+            await snapshot.query("SELECT count(*) FROM range(10000000000) AS a, range(1000)")
+        assert snapshot.timeouts == 1
+
+    asyncio.run(scenario())
+    asyncio.run(router.dispose())
+
+
+def test_query_endpoint(tmp_path, monkeypatch):
+    """
+        GET /analytics/query: 404 before the first refresh, 406 for wrong queries
+    """
+    router = make_router(tmp_path)
+    snapshot = analytics.AnalyticsSnapshot(router, str(tmp_path / "analytics"), pause=0)
+    monkeypatch.setattr(articleGate, "analytics_snapshot", snapshot)
+    client = TestClient(articleGate.app)
+    auth = {"username": articleGate.app_admin.APP_ADMIN_LOGIN,
+            "password": articleGate.app_admin.APP_ADMIN_PASSWORD}
+    assert client.post("/auth", data=auth).status_code == 200
+
+    sql = "SELECT substr(posting_date, 1, 4) AS year, count(*) AS n FROM article " \
+          "GROUP BY year ORDER BY year"
+    assert client.get("/analytics/query", params={"sql": sql}).status_code == 404
+    asyncio.run(snapshot.refresh())
+    resp = client.get("/analytics/query", params={"sql": sql, "max_rows": 1})
+    assert resp.status_code == 200
+    assert resp.json()["rows"] == [["2024", 1]] and resp.json()["truncated"]
+    assert client.get("/analytics/query", params={"sql": "DROP VIEW article"}).status_code == 406
+    asyncio.run(router.dispose())
@@ -0,0 +1,189 @@
+"""
+    Tests for online backup of ArticleGate Web-application
+"""
+
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from .app import backup
+from .app.periodic import FileLock, PeriodicTask
+from .app.sharding import Shard, ShardRouter
+
+
+def make_database(path, rows):
+    """
+        SQLite database with `rows` rows in table 'item'
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS item (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.executemany("INSERT INTO item (payload) VALUES (?)", [("x" * 200,)] * rows)
+    conn.commit()
+    conn.close()
+
+
+def count_rows(path):
+    """
+        Number of rows in table 'item'
+    """
+    conn = sqlite3.connect(path)
+    count = conn.execute("SELECT count(*) FROM item").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_database_path():
+    """
+        Only file-backed SQLite URLs are backed up
+    """
+    assert backup.database_path("sqlite+aiosqlite:///app/article_gate.sqlite3") == \
+        "app/article_gate.sqlite3"
+    assert backup.database_path("sqlite+aiosqlite://") is None
+    assert backup.database_path("postgresql+asyncpg://host/db") is None
+
+
+def test_snapshot_verify_restore(tmp_path):
+    """
+        Snapshot is copied in page batches, verified and restorable
+    """
+    source = str(tmp_path / "main.sqlite3")
+    make_database(source, 2000)
+    steps = []
+    path = backup.take_snapshot(source, str(tmp_path / "backups"), "main", pages=8, pause=0,
+                                progress=lambda copied, total: steps.append((copied, total)))
+    assert len(steps) > 1 and steps[-1][0] == steps[-1][1]
+    assert backup.verify_snapshot(path)
+    assert count_rows(path) == 2000
+
+    make_database(source, 500)
+    backup.restore_snapshot(path, source, pages=8)
+    assert count_rows(source) == 2000
+
+    broken = str(tmp_path / "broken.sqlite3")
+    with open(path, "rb") as src, open(broken, "wb") as dst:
+        data = bytearray(src.read())
+        data[len(data) // 2:len(data) // 2 + 4096] = os.urandom(4096)
+        dst.write(data)
+    assert not backup.verify_snapshot(broken)
+    assert not backup.verify_snapshot(str(tmp_path / "missing.sqlite3"))
+
+
+def test_copy_pause(tmp_path):
+    """
+        Copy pauses between page batches, not after the last one
+    """
+    source = str(tmp_path / "main.sqlite3")
+    make_database(source, 2000)
+    steps = []
+    started = time.monotonic()
+    backup.copy_database(source, str(tmp_path / "copy.sqlite3"), pages=8, pause=0.01,
+                         progress=lambda copied, total: steps.append(copied))
+    assert len(steps) > 10
+    assert time.monotonic() - started >= (len(steps) - 1) * 0.01
+    assert count_rows(str(tmp_path / "copy.sqlite3")) == 2000
+
+
+def test_restore_command(tmp_path):
+    """
+        Restore into a shard without database file fails with a message
+    """
+    env = dict(os.environ, DB_SHARDS="main=sqlite+aiosqlite://")
+    command = [sys.executable, "-m", "app.backup", "restore", str(tmp_path / "main.sqlite3")]
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    done = subprocess.run(command, env=env, cwd=cwd, capture_output=True, text=True,
+                          check=False)
+    assert done.returncode == 2
+    assert "shard main is not an SQLite database file" in done.stderr
+    done = subprocess.run(command + ["--shard", "other"], env=env, cwd=cwd,
+                          capture_output=True, text=True, check=False)
+    assert done.returncode == 2 and "unknown shard other" in done.stderr
+
+
+def test_snapshot_shards_retention(tmp_path):
+    """
+        Every shard is snapshotted, only `keep` newest snapshots remain
+    """
+    async def scenario():
+        paths = {name: str(tmp_path / f"{name}.sqlite3") for name in ("main", "main-b")}
+        for path in paths.values():
+            make_database(path, 10)
+        router = ShardRouter([Shard(name, f"sqlite+aiosqlite:///{path}")
+                              for name, path in paths.items()])
+
+        fractions = []
+        for _ in range(3):
+            taken = await backup.snapshot_shards(router, str(tmp_path / "backups"), keep=2,
+                                                 progress=fractions.append)
+            assert set(taken) == set(paths)
+        assert fractions[-1] == 1.0
+        assert len(backup.list_snapshots(str(tmp_path / "backups"), "main")) == 2
+        assert len(backup.list_snapshots(str(tmp_path / "backups"), "main-b")) == 2
+        await router.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_snapshot_during_writes(tmp_path):
+    """
+        Snapshot stays consistent while the database is written
+    """
+    async def scenario():
+        source = str(tmp_path / "main.sqlite3")
+        make_database(source, 5000)
+        router = ShardRouter([Shard("main", f"sqlite+aiosqlite:///{source}")])
+
+        async def write():
+            for _ in range(20):
+                await asyncio.to_thread(make_database, source, 10)
+                await asyncio.sleep(0.001)
+
+        taken, _ = await asyncio.gather(
+            backup.snapshot_shards(router, str(tmp_path / "backups"), pages=4, pause=0.001),
+            write())
+        assert backup.verify_snapshot(taken["main"])
+        assert count_rows(taken["main"]) % 10 == 0
+        await router.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_single_schedule_owner(tmp_path):
+    """
+        Of two schedulers sharing the backup directory only one takes snapshots,
+        the other takes over when the owner stops
+    """
+    lock = FileLock(str(tmp_path / "backups" / "test.lock"))
+    assert lock.acquire(blocking=False)
+    assert not FileLock(lock.path).acquire(blocking=False)
+    lock.release()
+    with FileLock(lock.path):
+        assert not FileLock(lock.path).acquire(blocking=False)
+    with pytest.raises(TypeError):
+        PeriodicTask(1.0, lock.path)  # pylint: disable=abstract-class-instantiated
+
+    async def scenario():
+        source = str(tmp_path / "main.sqlite3")
+        make_database(source, 10)
+        router = ShardRouter([Shard("main", f"sqlite+aiosqlite:///{source}")])
+        first, second = (backup.BackupScheduler(router, str(tmp_path / "backups"), 0.05, 100,
+                                                pause=0) for _ in range(2))
+        first.start()
+        await asyncio.sleep(0.07)
+        second.start()
+        await asyncio.sleep(0.2)
+        assert first.owner and not second.owner
+        assert first.last_snapshot is not None and second.last_snapshot is None
+
+        await first.stop()
+        await asyncio.sleep(0.15)
+        assert second.owner and second.last_snapshot is not None
+        await second.stop()
+        assert not second.owner
+        await router.dispose()
+
+    asyncio.run(scenario())
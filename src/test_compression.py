@@ -0,0 +1,103 @@
+"""
+    Tests for response compression of ArticleGate Web-application
+"""
+
+import asyncio
+import gzip
+
+import pytest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from .app import compression
+from .app.compression import CompressionMiddleware, parse_accept_encoding
+
+compressed_app = FastAPI()
+compressed_app.add_middleware(CompressionMiddleware, encodings=("gzip",), minimum_size=100)
+
+
+@compressed_app.get("/small")
+async def small():
+    return "x"
+
+
+@compressed_app.get("/large")
+async def large():
+    return ["Talal Al-Yazeedi"] * 100
+
+
+client = TestClient(compressed_app)
+
+
+def test_parse_accept_encoding():
+    """
+        Accept-Encoding parsing with q-values
+    """
+    assert parse_accept_encoding("gzip, br;q=0.5, zstd;q=0") == {
+        "gzip": 1.0, "br": 0.5, "zstd": 0.0
+    }
+
+
+def test_optional_encodings(monkeypatch):
+    """
+        Brotli and zstd are skipped without their packages, unknown encodings rejected
+    """
+    monkeypatch.setattr(compression.importlib.util, "find_spec", lambda name: None)
+    assert compression.available_encodings(("br", "zstd", "gzip")) == ["gzip"]
+    assert CompressionMiddleware(None, encodings=("br", "zstd")).encodings == []
+    with pytest.raises(ValueError):
+        compression.available_encodings(("deflate",))
+
+
+def test_large_response_compressed():
+    """
+        Response above threshold is gzip-compressed
+    """
+    resp = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["vary"]
+    assert int(resp.headers["content-length"]) < len(resp.content)
+    assert resp.json() == ["Talal Al-Yazeedi"] * 100
+
+
+def test_small_or_not_accepted_response_plain():
+    """
+        Small responses and clients without gzip support get plain body
+    """
+    resp = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+
+    resp = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers
+    assert resp.json() == ["Talal Al-Yazeedi"] * 100
+
+    resp = client.get("/large", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in resp.headers
+
+
+def test_streaming_response_compressed():
+    """
+        Streaming bodies are compressed chunk by chunk
+    """
+    raw = []
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for _ in range(3):
+            await send({"type": "http.response.body", "body": b"a" * 200, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def run():
+        middleware = CompressionMiddleware(streaming_app, encodings=("gzip",))
+        scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+
+        async def send(message):
+            raw.append(message)
+
+        await middleware(scope, None, send)
+
+    asyncio.run(run())
+    assert (b"content-encoding", b"gzip") in raw[0]["headers"]
+    body = b"".join(message.get("body", b"") for message in raw[1:])
+    assert gzip.decompress(body) == b"a" * 600
@@ -0,0 +1,242 @@
+"""
+    Tests for author deduplication of ArticleGate Web-application
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+
+import sqlalchemy as sqla
+from fastapi.testclient import TestClient
+from .app import main as articleGate
+from .app import dedup, startup
+from .app.models.base import BaseModel
+from .app.models.article import ArticleModel
+from .app.models.author import AuthorModel
+from .app.models.organisation import OrganisationModel
+from .app.models.article_to_author import ArticleToAuthorModel
+from .app.models.author_name_key import AuthorNameKeyModel
+from .app.sharding import ShardRouter
+
+AUTHORS = {
+    0: ("Talal AL-Yazeedi", 0),
+    1: ("Jack Hearn", 0),
+    2: ("Leon Mugenzi", 0),
+    3: ("Talal Al-Yazeedi", 0),
+    4: ("Leon J. Mugenzi", 1),
+    5: ("Charles S. Wondji", 0),
+    6: ("Murielle J. Wondji", 0),
+}
+ARTICLES = {
+    "10.1101/a": [0, 1, 2, 5],
+    "10.1101/b": [3, 1, 6],
+    "10.1101/c": [4, 1, 5, 3],
+}
+
+
+def make_router(tmp_path):
+    """
+        Temporary catalogue with duplicate authors
+    """
+    router = ShardRouter.from_config(f"main=sqlite+aiosqlite:///{tmp_path / 'dedup.sqlite3'}")
+
+    async def fill():
+        await startup.bootstrap_schema(router.default.engine, BaseModel.metadata)
+        async with router.default.make_session() as session:
+            session.add_all([OrganisationModel(id=0, title="LSTM"),
+                             OrganisationModel(id=1, title="CRID")])
+            for author_id, (name, org_id) in AUTHORS.items():
+                session.add(AuthorModel(id=author_id, name=name, affiliation_org_id=org_id))
+            for article_id, (doi, author_ids) in enumerate(ARTICLES.items(), start=1):
+                session.add(ArticleModel(id=article_id, doi=doi, title=doi,
+                                         posting_date="2025-01-01"))
+                for place, author_id in enumerate(author_ids, start=1):
+                    session.add(ArticleToAuthorModel(article_id=article_id, author_id=author_id,
+                                                     place=place))
+            await session.commit()
+        async with router.session() as session:
+            await dedup.refresh_key_index(session)
+
+    asyncio.run(fill())
+    return router
+
+
+def test_normalise_name():
+    """
+        Case, diacritics, hyphens and initials are normalised
+    """
+    assert dedup.normalise_name("Talal AL-Yazeedi") == dedup.normalise_name("Talal Al-Yazeedi")
+    assert dedup.normalise_name("Grâce Djuifo") == "grace djuifo"
+    assert dedup.normalise_name("Leon M.J. Mugenzi") == "leon m j mugenzi"
+    assert dedup.block_key("leon m j mugenzi") == "mugenzi:l"
+
+
+def test_name_similarity():
+    """
+        Compatible given names and initials
+    """
+    assert dedup.name_similarity("leon mugenzi", "leon mugenzi") == 1.0
+    assert dedup.name_similarity("leon mugenzi", "leon j mugenzi") == 0.9
+    assert dedup.name_similarity("leon j mugenzi", "leon m j mugenzi") == 0.9
+    assert dedup.name_similarity("l mugenzi", "leon mugenzi") == 0.9
+    assert dedup.name_similarity("charles s wondji", "murielle j wondji") == 0.0
+
+
+def test_merge_plan():
+    """
+        Duplicate clusters are merged into their smallest ID,
+        explicit pairs keep the given author
+    """
+    assert dedup.merge_plan([(3, 7), (7, 9), (1, 2)]) == {7: 3, 9: 3, 2: 1}
+    assert dedup.merge_plan([(3, 0), (0, 5)], keep_smallest=False) == {0: 3, 5: 3}
+
+
+def test_find_and_merge_duplicates(tmp_path):
+    """
+        Duplicates are proposed and merged, bindings are rewritten
+    """
+    router = make_router(tmp_path)
+
+    async def scenario():
+        async with router.session() as session:
+            candidates = await dedup.find_duplicates(session)
+            pairs = [(candidate.keep_id, candidate.duplicate_id) for candidate in candidates]
+            assert pairs == [(0, 3), (2, 4)]
+            assert candidates[0].same_affiliation
+            assert candidates[1].coauthor_score == 0.6667
+
+            counts = await dedup.merge_duplicates(session, pairs)
+            assert counts == {"bindings_rewritten": 3, "authors_deleted": 2}
+
+        async with router.session() as session:
+            query = sqla.select(ArticleToAuthorModel.author_id)\
+                .join(ArticleModel, ArticleModel.id == ArticleToAuthorModel.article_id)\
+                .where(ArticleModel.doi == "10.1101/c")\
+                .order_by(ArticleToAuthorModel.place)
+            assert await session.all_scalars(query) == [2, 1, 5, 0]
+            assert await dedup.find_duplicates(session) == []
+        await router.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_merge_duplicates_on_one_article(tmp_path):
+    """
+        Several duplicates of one author on an article leave one binding
+    """
+    router = make_router(tmp_path)
+
+    async def scenario():
+        async with router.session() as session:
+            counts = await dedup.merge_duplicates(session, [(0, 3), (0, 4), (0, 5)])
+            assert counts == {"bindings_rewritten": 2, "authors_deleted": 3}
+
+        async with router.session() as session:
+            query = sqla.select(ArticleModel.doi, ArticleToAuthorModel.author_id)\
+                .join(ArticleModel, ArticleModel.id == ArticleToAuthorModel.article_id)\
+                .order_by(ArticleModel.doi, ArticleToAuthorModel.place)
+            assert [tuple(row) for row in await session.all_rows(query)] == [
+                ("10.1101/a", 0), ("10.1101/a", 1), ("10.1101/a", 2),
+                ("10.1101/b", 0), ("10.1101/b", 1), ("10.1101/b", 6),
+                ("10.1101/c", 1), ("10.1101/c", 0),
+            ]
+        await router.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_merge_endpoint(tmp_path, monkeypatch):
+    """
+        POST /dedup/authors/merge requires access token and existing authors
+    """
+    router = make_router(tmp_path)
+    monkeypatch.setattr(articleGate, "shard_router", router)
+    client = TestClient(articleGate.app, raise_server_exceptions=False)
+    auth = {"grant_type": "password", "username": "veritas", "password": "vino"}
+    assert client.post("/auth", data=auth).status_code == 200
+
+    resp = client.get("/dedup/authors")
+    assert resp.status_code == 200
+    assert [elem["duplicate_id"] for elem in resp.json()] == [3, 4]
+    assert client.get("/dedup/authors?limit=1").json()[0]["duplicate_id"] == 3
+    assert client.get("/dedup/authors?limit=0").status_code == 500
+    assert client.get("/dedup/authors?limit=100000").status_code == 500
+
+    assert client.post("/dedup/authors/merge?keep_id=0&duplicate_id=99").status_code == 404
+    assert client.post("/dedup/authors/merge?keep_id=0&duplicate_id=0").status_code == 406
+    resp = client.post("/dedup/authors/merge?keep_id=0&duplicate_id=3")
+    assert resp.status_code == 200
+    assert client.get("/author?id=3").json() is None
+    assert len(client.get("/articles_by_author?id=0").json()) == 3
+    asyncio.run(router.dispose())
+
+
+def test_merge_endpoint_keeps_given_author(tmp_path, monkeypatch):
+    """
+        POST /dedup/authors/merge keeps `keep_id` even when it is the larger ID
+    """
+    router = make_router(tmp_path)
+    monkeypatch.setattr(articleGate, "shard_router", router)
+    client = TestClient(articleGate.app)
+    auth = {"grant_type": "password", "username": "veritas", "password": "vino"}
+    assert client.post("/auth", data=auth).status_code == 200
+
+    resp = client.post("/dedup/authors/merge?keep_id=3&duplicate_id=0")
+    assert resp.status_code == 200
+    assert client.get("/author?id=0").json() is None
+    assert client.get("/author?id=3").json()["name"] == "Talal Al-Yazeedi"
+    assert len(client.get("/articles_by_author?id=3").json()) == 3
+    asyncio.run(router.dispose())
+
+
+def test_batch_job(tmp_path):
+    """
+        `python -m app.dedup --apply` runs in a fresh interpreter
+        and merges the proposed duplicates
+    """
+    router = make_router(tmp_path)
+    asyncio.run(router.dispose())
+    env = dict(os.environ, DB_SHARDS=f"main=sqlite+aiosqlite:///{tmp_path / 'dedup.sqlite3'}")
+    result = subprocess.run([sys.executable, "-m", "app.dedup", "--apply"], env=env,
+                            cwd=os.path.dirname(__file__), capture_output=True, text=True,
+                            timeout=60, check=False)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[:2] == ["3 -> 0: 0.9167", "4 -> 2: 0.7067"]
+    assert "'authors_deleted': 2" in result.stdout
+
+
+def test_key_index_on_author_writes(tmp_path, monkeypatch):
+    """
+        Author writes keep name keys current, the search endpoint does not write
+    """
+    router = make_router(tmp_path)
+    monkeypatch.setattr(articleGate, "shard_router", router)
+    client = TestClient(articleGate.app)
+    auth = {"grant_type": "password", "username": "veritas", "password": "vino"}
+    assert client.post("/auth", data=auth).status_code == 200
+
+    async def keys():
+        async with router.session() as session:
+            query = sqla.select(AuthorNameKeyModel.author_id, AuthorNameKeyModel.block_key)
+            return dict(tuple(row) for row in await session.all_rows(query))
+
+    assert client.post("/create/author", params={"id": 7, "name": "Jack R. Hearn",
+                                                 "affiliation_org_id": 0}).status_code == 200
+    assert asyncio.run(keys())[7] == "hearn:j"
+    assert client.post("/alter/author", params={"id": 7, "name": "Gareth Weedall",
+                                                "affiliation_org_id": 0}).status_code == 200
+    assert asyncio.run(keys())[7] == "weedall:g"
+    assert client.delete("/delete/author?id=7").status_code == 200
+    assert 7 not in asyncio.run(keys())
+
+    async def add_directly():
+        async with router.default.make_session() as session:
+            session.add(AuthorModel(id=8, name="Jack Hearn", affiliation_org_id=0))
+            await session.commit()
+
+    asyncio.run(add_directly())
+    before = asyncio.run(keys())
+    assert client.get("/dedup/authors").status_code == 200
+    assert asyncio.run(keys()) == before
+    asyncio.run(router.dispose())
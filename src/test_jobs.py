@@ -0,0 +1,213 @@
+"""
+    Tests for background jobs of ArticleGate Web-application
+"""
+
+import asyncio
+import json
+import math
+import os
+import shutil
+import time
+
+import pytest
+
+from fastapi.testclient import TestClient
+from .app import main as articleGate
+from .app import jobs
+from .app.models.job import JobModel
+from .app.sharding import ShardRouter
+
+
+def make_runner(tmp_path, **kwargs):
+    """
+        Runner over a temporary jobs database with fast flushes
+    """
+    kwargs.setdefault("flush_interval", 0.01)
+    return jobs.JobRunner(f"sqlite+aiosqlite:///{tmp_path / 'jobs.sqlite3'}", **kwargs)
+
+
+async def wait_done(runner, job_id, timeout=10.0):
+    """
+        Poll job state until it is finished
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = await runner.get(job_id)
+        if job["status"] not in jobs.ACTIVE_STATUSES:
+            return job
+        await asyncio.sleep(0.01)
+    raise TimeoutError(job_id)
+
+
+def test_job_lifecycle(tmp_path):
+    """
+        Jobs report progress, succeed, fail and reject wrong parameters
+    """
+    async def count(context, steps):
+        for step in range(steps):
+            context.report(step / steps, f"step {step}")
+            await context.throttle(0.0)
+        return {"steps": steps}
+
+    async def broken(_context):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        runner = make_runner(tmp_path)
+        runner.register("count", count)
+        runner.register("broken", broken)
+        await runner.start()
+
+        job = await runner.submit("count", {"steps": 3})
+        assert job["status"] == jobs.QUEUED
+        done = await wait_done(runner, job["id"])
+        assert done["status"] == jobs.SUCCEEDED
+        assert done["result"] == {"steps": 3} and done["progress"] == 1.0
+        assert done["attempts"] == 1
+
+        failed = await wait_done(runner, (await runner.submit("broken", {}))["id"])
+        assert failed["status"] == jobs.FAILED and "boom" in failed["error"]
+
+        with pytest.raises(TypeError):
+            await runner.submit("count", {"wrong": 1})
+        with pytest.raises(KeyError):
+            await runner.submit("unknown", {})
+        assert await runner.get("missing") is None
+        await runner.stop()
+
+    asyncio.run(scenario())
+
+
+def test_job_cancel_and_limit(tmp_path):
+    """
+        Only max_running jobs run at once, queued and running jobs are cancellable
+    """
+    async def forever(context):
+        context.report(0.5, "waiting")
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        runner = make_runner(tmp_path, max_running=1)
+        runner.register("forever", forever)
+        await runner.start()
+
+        first = await runner.submit("forever", {})
+        second = await runner.submit("forever", {})
+        await asyncio.sleep(0.1)
+        assert runner.running == 1
+        assert (await runner.get(first["id"]))["status"] == jobs.RUNNING
+        assert (await runner.get(first["id"]))["progress"] == 0.5
+        assert (await runner.get(second["id"]))["status"] == jobs.QUEUED
+
+        for job in (second, first):
+            cancelled = await runner.cancel(job["id"])
+            assert cancelled["status"] == jobs.CANCELLED
+        assert runner.running == 0
+        await runner.stop()
+
+    asyncio.run(scenario())
+
+
+def test_job_recovery(tmp_path):
+    """
+        Active jobs of a dead process are restarted, unless not restartable
+    """
+    async def quick(_context, value):
+        return value
+
+    async def scenario():
+        dead = make_runner(tmp_path)
+        await dead.start()
+        await dead.stop()
+
+        stale = time.time() - 3600
+        async with dead.make_session() as session:
+            for ident, kind in (("a", "quick"), ("b", "once")):
+                session.add(JobModel(
+                    id=ident, kind=kind, params=json.dumps({"value": 7}), status=jobs.RUNNING,
+                    progress=0.3, message="", owner="dead", cancel_requested=False,
+                    attempts=1, created_at=stale, heartbeat_at=stale))
+            await session.commit()
+
+        runner = make_runner(tmp_path)
+        runner.register("quick", quick)
+        runner.register("once", quick, restartable=False)
+        await runner.start()
+        restarted = await wait_done(runner, "a")
+        assert restarted["status"] == jobs.SUCCEEDED and restarted["result"] == 7
+        assert restarted["attempts"] == 2
+        assert (await runner.get("b"))["status"] == jobs.FAILED
+        await runner.stop()
+
+    asyncio.run(scenario())
+
+
+def test_run_cpu(tmp_path):
+    """
+        CPU-bound parts of a job run in the process pool, a pool broken
+        by a dead process fails only the job using it and is replaced
+    """
+    async def compute(context, number):
+        return str(await context.run_cpu(math.factorial, number))
+
+    async def crash(context):
+        await context.run_cpu(os._exit, 1)
+
+    async def scenario():
+        runner = make_runner(tmp_path, process_workers=1)
+        runner.register("compute", compute)
+        runner.register("crash", crash)
+        await runner.start()
+        done = await wait_done(runner, (await runner.submit("compute", {"number": 20}))["id"],
+                               timeout=60.0)
+        assert done["result"] == str(math.factorial(20))
+        broken = runner.process_pool()
+
+        crashed = await wait_done(runner, (await runner.submit("crash", {}))["id"], timeout=60.0)
+        assert crashed["status"] == jobs.FAILED
+        assert runner.process_pool() is not broken
+        done = await wait_done(runner, (await runner.submit("compute", {"number": 10}))["id"],
+                               timeout=60.0)
+        assert done["result"] == str(math.factorial(10))
+        await runner.stop()
+
+    asyncio.run(scenario())
+
+
+def test_jobs_endpoints(tmp_path, monkeypatch):
+    """
+        POST /jobs, GET /jobs/{id}, POST /jobs/{id}/cancel
+    """
+    # The lifespan migrates and bootstraps the catalogue, so it runs on a copy.
+    catalogue = shutil.copy(os.path.join(os.path.dirname(articleGate.__file__),
+                                         "article_gate.sqlite3"), tmp_path / "catalogue.sqlite3")
+    monkeypatch.setattr(articleGate, "shard_router",
+                        ShardRouter.from_config(f"main=sqlite+aiosqlite:///{catalogue}"))
+    runner = make_runner(tmp_path)
+    runner.register("export_catalogue", articleGate.job_export_catalogue)
+    monkeypatch.setattr(articleGate, "job_runner", runner)
+    monkeypatch.setattr(articleGate.config, "JOBS_EXPORT_DIR", str(tmp_path / "exports"))
+    monkeypatch.setattr(articleGate.config, "STARTUP_WARM_UP", False)
+
+    with TestClient(articleGate.app) as client:
+        auth = {"username": articleGate.app_admin.APP_ADMIN_LOGIN,
+                "password": articleGate.app_admin.APP_ADMIN_PASSWORD}
+        assert client.post("/auth", data=auth).status_code == 200
+
+        assert client.post("/jobs?kind=unknown").status_code == 404
+        assert client.post('/jobs?kind=export_catalogue&params={"wrong":1}').status_code == 406
+
+        resp = client.post('/jobs?kind=export_catalogue&params={"batch_size":2}')
+        assert resp.status_code == 200
+        job_id = resp.json()["id"]
+        for _ in range(500):
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] not in jobs.ACTIVE_STATUSES:
+                break
+            time.sleep(0.01)
+        assert job["status"] == jobs.SUCCEEDED
+        with open(job["result"]["path"], encoding="utf-8") as exported:
+            assert sum(1 for _ in exported) == job["result"]["rows"] > 0
+
+        assert client.post(f"/jobs/{job_id}/cancel").json()["status"] == jobs.SUCCEEDED
+        assert client.get("/jobs/missing").status_code == 404
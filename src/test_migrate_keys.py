@@ -0,0 +1,123 @@
+"""
+    Tests for online migration to integer article keys of ArticleGate Web-application
+"""
+
+import asyncio
+import sqlite3
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from .app import migrate_keys
+
+# DOI-keyed layout of the catalogue before the migration.
+OLD_SCHEMA = """
+    CREATE TABLE article (doi VARCHAR NOT NULL, title VARCHAR NOT NULL,
+        posting_date VARCHAR NOT NULL, PRIMARY KEY (doi));
+    CREATE TABLE article_to_author (doi VARCHAR NOT NULL, author_id INTEGER NOT NULL,
+        place INTEGER NOT NULL, PRIMARY KEY (doi, author_id));
+"""
+
+
+def bindings_by_doi(conn, query):
+    """
+        Sorted (doi, author_id, place) rows
+    """
+    return sorted(conn.execute(query).fetchall())
+
+
+def test_migrate_with_concurrent_writes(tmp_path):
+    """
+        Writes made while batches are copied are mirrored to the new tables
+    """
+    path = str(tmp_path / "catalogue.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript(OLD_SCHEMA)
+    conn.executemany("INSERT INTO article VALUES (?, ?, ?)",
+                     [(f"10.1101/{idx:04d}", f"Title {idx}", "2025-01-01") for idx in range(200)])
+    conn.executemany("INSERT INTO article_to_author VALUES (?, ?, ?)",
+                     [(f"10.1101/{idx:04d}", author_id, author_id + 1)
+                      for idx in range(200) for author_id in range(3)])
+    conn.commit()
+
+    def write():
+        conn.execute("INSERT INTO article VALUES ('10.1101/new', 'New', '2025-02-02')")
+        conn.execute("INSERT INTO article_to_author VALUES ('10.1101/new', 7, 1)")
+        conn.execute("INSERT INTO article_to_author VALUES ('10.1101/0199', 7, 4)")
+        conn.execute("UPDATE article SET title = 'Altered' WHERE doi = '10.1101/0000'")
+        conn.execute("UPDATE article SET title = 'Altered' WHERE doi = '10.1101/0198'")
+        conn.execute("UPDATE article_to_author SET place = 9 "
+                     "WHERE doi = '10.1101/0001' AND author_id = 0")
+        conn.execute("DELETE FROM article_to_author WHERE doi = '10.1101/0002'")
+        conn.execute("DELETE FROM article_to_author WHERE doi = '10.1101/0197'")
+        conn.execute("DELETE FROM article WHERE doi IN ('10.1101/0002', '10.1101/0197')")
+        conn.commit()
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        assert await migrate_keys.needs_migration(engine)
+        migration = asyncio.create_task(migrate_keys.migrate(engine, batch_size=10, pause=0.01))
+        # Write once the first batch is copied.
+        copying = "SELECT count(*) FROM sqlite_master WHERE name = 'article__new'"
+        while not conn.execute(copying).fetchone()[0] or \
+                not conn.execute("SELECT count(*) FROM article__new").fetchone()[0]:
+            await asyncio.sleep(0.001)
+        write()
+        expected_articles = sorted(conn.execute("SELECT doi, title FROM article").fetchall())
+        expected_bindings = bindings_by_doi(
+            conn, "SELECT doi, author_id, place FROM article_to_author")
+        assert not migration.done()
+        assert await migration
+        assert not await migrate_keys.needs_migration(engine)
+        assert not await migrate_keys.migrate(engine)
+        await engine.dispose()
+        return expected_articles, expected_bindings
+
+    expected_articles, expected_bindings = asyncio.run(scenario())
+    assert sorted(conn.execute("SELECT doi, title FROM article").fetchall()) == expected_articles
+    assert bindings_by_doi(conn, "SELECT a.doi, b.author_id, b.place FROM article_to_author b "
+                                 "JOIN article a ON a.id = b.article_id") == expected_bindings
+    assert conn.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger'").fetchone() \
+        == (0,)
+    conn.close()
+
+
+def test_concurrent_migrations(tmp_path):
+    """
+        Workers migrating at once: one migrates, others wait and find it done.
+        Leftovers of an interrupted run are dropped from a migrated database.
+    """
+    path = str(tmp_path / "catalogue.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript(OLD_SCHEMA)
+    conn.executemany("INSERT INTO article VALUES (?, ?, ?)",
+                     [(f"10.1101/{idx:04d}", f"Title {idx}", "2025-01-01") for idx in range(100)])
+    conn.executemany("INSERT INTO article_to_author VALUES (?, ?, 1)",
+                     [(f"10.1101/{idx:04d}", idx) for idx in range(100)])
+    conn.commit()
+
+    async def scenario():
+        engines = [create_async_engine(f"sqlite+aiosqlite:///{path}") for _ in range(3)]
+        migrated = await asyncio.gather(*(migrate_keys.migrate(engine, batch_size=10, pause=0.001)
+                                          for engine in engines))
+        for engine in engines:
+            await engine.dispose()
+        return migrated
+
+    assert sorted(asyncio.run(scenario())) == [False, False, True]
+    conn.execute("INSERT INTO article_to_author (article_id, author_id, place) VALUES (1, 7, 2)")
+    conn.commit()
+    assert conn.execute("SELECT count(*) FROM article_to_author").fetchone() == (101,)
+
+    conn.execute(f"CREATE TABLE {migrate_keys.NEW_ARTICLE} (id INTEGER)")
+    conn.execute(migrate_keys.TRIGGERS["binding_keys_ai"])
+    conn.commit()
+
+    async def cleanup():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        assert not await migrate_keys.migrate(engine)
+        await engine.dispose()
+
+    asyncio.run(cleanup())
+    assert conn.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+                        "OR name LIKE '%\\_\\_new' ESCAPE '\\'").fetchone() == (0,)
+    conn.execute("INSERT INTO article_to_author (article_id, author_id, place) VALUES (1, 8, 3)")
+    conn.close()
@@ -0,0 +1,118 @@
+"""
+    Tests for field selection of ArticleGate Web-application read endpoints
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from fastapi.testclient import TestClient
+from .app import main as articleGate
+from .app import startup
+from .app.models.base import BaseModel
+from .app.models.article import ArticleModel
+from .app.models.author import AuthorModel
+from .app.models.organisation import OrganisationModel
+from .app.models.article_to_author import ArticleToAuthorModel
+from .app.projection import parse_selection
+from .app.sharding import ShardRouter
+
+DOI = "10.1101/2025.04.16.649184"
+AUTHORS = 20
+
+
+def count_statements(engines):
+    """
+        List collecting SQL statements executed by the engines
+    """
+    statements = []
+    for engine in engines:
+        event.listen(engine.sync_engine, "before_cursor_execute",
+                     lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_parse_selection():
+    """
+        Levels without requested fields get all fields, unknown names are rejected
+    """
+    selection = parse_selection("binding", "place,author.name", "author.organisation")
+    assert selection.fields == ["place"]
+    assert selection.children["author"].fields == ["name"]
+    assert selection.children["author"].children["organisation"].fields == \
+        ["id", "title", "location"]
+    with pytest.raises(ValueError):
+        parse_selection("binding", "author.salary")
+    with pytest.raises(ValueError):
+        parse_selection("author", include="articles")
+
+
+def test_single_query_projection():
+    """
+        One shard: the whole shape is one SQL query with only requested columns
+    """
+    client = TestClient(articleGate.app)
+    statements = count_statements([articleGate.db_engine])
+
+    resp = client.get("/authors_of_article", params={
+        "doi": DOI, "fields": "place,author.name,author.organisation.title"})
+    assert resp.status_code == 200
+    assert resp.json()[0] == {"place": 1, "author": {
+        "name": "Talal AL-Yazeedi",
+        "organisation": {"title": "Liverpool School of Tropical Medicine"}}}
+    assert len(resp.json()) == 6
+    assert len(statements) == 1
+    assert "location" not in statements[0] and "title" in statements[0]
+
+    statements.clear()
+    article = client.get("/article", params={"doi": DOI, "fields": "title",
+                                             "include": "authors.author"}).json()
+    assert set(article) == {"title", "authors"}
+    assert [elem["place"] for elem in article["authors"]] == [1, 2, 3, 4, 5, 6]
+    assert article["authors"][0]["author"]["name"] == "Talal AL-Yazeedi"
+    assert len(statements) == 1
+
+    assert client.get("/org", params={"id": 0, "fields": "location"}).json() == \
+        {"location": "Liverpool, UK"}
+    assert client.get("/author", params={"id": 0, "fields": "salary"}).status_code == 406
+    assert client.get("/author", params={"id": 999, "include": "organisation"}).json() is None
+
+
+def test_batched_loaders(tmp_path, monkeypatch):
+    """
+        Several shards: rows of other shards are loaded by one query per relation and shard
+    """
+    router = ShardRouter.from_config(
+        ";".join(f"{name}=sqlite+aiosqlite:///{tmp_path / name}.sqlite3"
+                 for name in ("main", "biorxiv")), "10.1101=biorxiv")
+
+    async def fill():
+        for shard in router.shards:
+            await startup.bootstrap_schema(shard.engine, BaseModel.metadata)
+        async with router.session() as session:
+            for org_id in range(2):
+                session.for_id(org_id).add(OrganisationModel(id=org_id, title=f"Org {org_id}"))
+            for author_id in range(AUTHORS):
+                session.for_id(author_id).add(AuthorModel(
+                    id=author_id, name=f"Author {author_id}", affiliation_org_id=author_id % 2))
+            session.for_doi(DOI).add(ArticleModel(id=1, doi=DOI, title="Genetic mapping",
+                                                  posting_date="2025-04-22"))
+            for author_id in range(AUTHORS):
+                session.for_doi(DOI).add(ArticleToAuthorModel(
+                    article_id=1, author_id=author_id, place=AUTHORS - author_id))
+            await session.commit()
+
+    asyncio.run(fill())
+    monkeypatch.setattr(articleGate, "shard_router", router)
+    statements = count_statements([shard.engine for shard in router.shards])
+    client = TestClient(articleGate.app)
+
+    resp = client.get("/authors_of_article", params={
+        "doi": DOI, "fields": "place,author.name", "include": "author.organisation"})
+    bindings = resp.json()
+    assert [elem["place"] for elem in bindings] == list(range(1, AUTHORS + 1))
+    assert bindings[0]["author"] == {"name": f"Author {AUTHORS - 1}", "organisation": {
+        "id": 1, "title": "Org 1", "location": None}}
+    # Bindings from the article shard, then authors and organisations from every shard.
+    assert len(statements) == 1 + 2 * len(router.shards)
+    asyncio.run(router.dispose())
@@ -0,0 +1,171 @@
+"""
+    Tests for similar articles recommendations of ArticleGate Web-application
+"""
+
+import asyncio
+import gc
+import logging
+
+from fastapi.testclient import TestClient
+from .app import main as articleGate
+from .app.recommend import SimilarArticles
+from .app.similarity import build_index, title_words
+
+ARTICLES = [
+    ("a", "Insecticide resistance in the malaria vector Anopheles funestus"),
+    ("b", "Pyrethroid resistance of the malaria vector Anopheles funestus in Cameroon"),
+    ("c", "Sex ratios of the nematode Auanema freiburgense"),
+    ("d", "Gene conversion in the immunity gene of Anopheles coluzzii"),
+]
+BINDINGS = [("a", 1), ("a", 2), ("b", 2), ("c", 3), ("d", 1), ("d", 2)]
+
+
+def test_title_words():
+    """
+        Titles are reduced to informative lower-case words
+    """
+    assert title_words("The QTL of Anopheles funestus, 2025") == {"qtl", "anopheles", "funestus"}
+
+
+def test_similar_ranking():
+    """
+        Shared title words and authors rank articles higher
+    """
+    index = build_index(ARTICLES, BINDINGS)
+    similar = index.similar("a", 3)
+    assert [elem["doi"] for elem in similar] == ["b", "d"]
+    assert similar[0]["score"] > similar[1]["score"]
+    assert index.similar("unknown", 3) == []
+
+
+def test_incremental_updates():
+    """
+        Added, altered and removed articles are reflected without rebuild
+    """
+    index = build_index(ARTICLES, BINDINGS)
+    index.set_authors("e", [3])
+    index.add_articles([("e", "Asymmetric organelle positioning in Auanema freiburgense")])
+    assert index.similar("c", 1)[0]["doi"] == "e"
+
+    index.add_articles([("e", "Insecticide resistance in Anopheles funestus")])
+    index.set_authors("e", [1, 2])
+    assert index.similar("a", 1)[0]["doi"] == "e"
+
+    index.remove_article("e")
+    assert "e" not in [elem["doi"] for elem in index.similar("a", 3)]
+    assert len(index) == 4
+
+
+def test_version_check():
+    """
+        Index is rebuilt in background when the data version changes
+    """
+    data = {"articles": list(ARTICLES), "version": 1, "loads": 0}
+
+    async def load():
+        data["loads"] += 1
+        return list(data["articles"]), BINDINGS
+
+    async def version():
+        return data["version"]
+
+    async def scenario():
+        similar = SimilarArticles(max_age=3600.0, check_interval=0.0)
+        index = await similar.get_index(load, version)
+        assert similar.version == 1 and "e" not in index
+
+        assert await similar.get_index(load, version) is index
+        assert data["loads"] == 1
+
+        # Article added by another worker: the stale index is served until
+        # the version checked in background starts a rebuild.
+        data["articles"].append(("e", "Insecticide resistance in Anopheles funestus"))
+        data["version"] = 2
+        assert await similar.get_index(load, version) is index
+        for _ in range(500):
+            if similar.version == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert "e" in await similar.get_index(load, version)
+        assert similar.version == 2 and data["loads"] == 2
+
+        # Requests do not wait for the version query.
+        release = asyncio.Event()
+
+        async def slow_version():
+            await release.wait()
+            return data["version"]
+
+        await asyncio.wait_for(similar.get_index(load, slow_version), 1.0)
+        assert similar.checking
+        release.set()
+        await asyncio.sleep(0.01)
+        assert not similar.checking and not similar.building
+
+        similar.check_interval = 3600.0
+        data["version"] = 3
+        await similar.get_index(load, version)
+        assert not similar.building
+
+    asyncio.run(scenario())
+
+
+def test_background_failures(caplog):
+    """
+        Failed background checks and builds are logged, the served index
+        stays and a later build succeeds
+    """
+    data = {"fail": False, "version": 1}
+
+    async def load():
+        if data["fail"]:
+            raise OSError("database is gone")
+        return list(ARTICLES), BINDINGS
+
+    async def version():
+        if data["fail"]:
+            raise OSError("database is gone")
+        return data["version"]
+
+    async def settle(similar):
+        for _ in range(500):
+            if not similar.building and not similar.checking:
+                return
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        similar = SimilarArticles(max_age=3600.0, check_interval=0.0)
+        index = await similar.get_index(load, version)
+        data["fail"] = True
+        assert await similar.get_index(load, version) is index
+        await settle(similar)
+
+        similar.max_age = 0.0
+        assert await similar.get_index(load, version) is index
+        await settle(similar)
+        assert not similar.building
+
+        data["fail"] = False
+        await similar.get_index(load, version)
+        await settle(similar)
+        assert similar.index is not index
+
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(scenario())
+        gc.collect()
+    messages = [record.getMessage() for record in caplog.records]
+    assert "Similar articles version check failed" in messages
+    assert "Similar articles index build failed" in messages
+    assert not any("never retrieved" in message for message in messages)
+
+
+def test_similar_endpoint():
+    """
+        GET /article/similar
+    """
+    client = TestClient(articleGate.app)
+    resp = client.get("/article/similar?doi=10.1101/2025.04.16.649184&k=2")
+    assert resp.status_code == 200
+    similar = resp.json()
+    assert len(similar) == 2
+    assert "10.1101/2025.04.16.649184" not in [elem["doi"] for elem in similar]
@@ -0,0 +1,116 @@
+"""
+    Tests for access log recording and traffic replay of ArticleGate Web-application
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from .app import replay
+from .app.access_log import AccessLogMiddleware, AccessLogRecorder
+
+
+def make_app(delay=0.0):
+    """
+        Small application with a parametrised route and a failing route.
+        Returns the application and its state (requests in flight).
+    """
+    state = {"inflight": 0, "max_inflight": 0}
+    app = FastAPI()
+
+    @app.get("/item/{item_id}")
+    async def get_item(item_id: int, q: str = ""):
+        state["inflight"] += 1
+        state["max_inflight"] = max(state["max_inflight"], state["inflight"])
+        await asyncio.sleep(delay)
+        state["inflight"] -= 1
+        return {"id": item_id, "q": q}
+
+    @app.post("/broken")
+    async def broken():
+        raise HTTPException(status_code=503, detail="down")
+
+    return app, state
+
+
+def test_recorder(tmp_path):
+    """
+        Sampled requests are logged with route, status and redacted query
+        to the file of this worker
+    """
+    app, _ = make_app()
+    recorder = AccessLogRecorder(str(tmp_path / "access.jsonl"), buffer_size=2)
+    path = tmp_path / f"access.{os.getpid()}.jsonl"
+    assert recorder.path == str(path)
+
+    async def scenario():
+        transport = httpx.ASGITransport(
+            app=AccessLogMiddleware(app, recorder, exempt_paths=("/docs",)))
+        async with httpx.AsyncClient(transport=transport, base_url="http://log") as client:
+            await client.get("/item/1", params={"q": "a", "password": "secret"})
+            await client.post("/broken")
+            await client.get("/docs")
+            await client.get("/item/2")
+        assert recorder.recorded == 3
+        # The first batch is written in background, the rest on flush.
+        await asyncio.gather(*recorder._writes)
+        assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+        await recorder.flush()
+
+    asyncio.run(scenario())
+    entries = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [entry["path"] for entry in entries] == ["/item/1", "/broken", "/item/2"]
+    assert entries[0]["route"] == "/item/{item_id}"
+    assert entries[0]["query"] == "q=a"
+    assert [entry["status"] for entry in entries] == [200, 503, 200]
+    assert all(entry["duration_ms"] >= 0 for entry in entries)
+    assert replay.load_log(str(path), str(path), limit=4)[1]["path"] == "/item/1"
+
+    unsampled = AccessLogRecorder(str(tmp_path / "none.jsonl"), sample_rate=0.0)
+    TestClient(AccessLogMiddleware(app, unsampled)).get("/item/1")
+    assert unsampled.recorded == 0 and unsampled.skipped == 1
+
+
+def test_replay(tmp_path):
+    """
+        Replay keeps compressed timing and concurrency limit,
+        statistics are reported per route
+    """
+    path = tmp_path / "access.jsonl"
+    entries = [{"ts": 1000.0 + idx * 0.1, "method": "GET", "path": f"/item/{idx}",
+                "route": "/item/{item_id}", "query": "q=x"} for idx in range(10)]
+    entries.append({"ts": 1000.05, "method": "POST", "path": "/broken", "route": "/broken"})
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("not json\n")
+        file.writelines(json.dumps(entry) + "\n" for entry in reversed(entries))
+
+    loaded = replay.load_log(str(path))
+    assert len(loaded) == 11 and loaded[1]["path"] == "/broken"
+    assert len(replay.load_log(str(path), reads_only=True)) == 10
+    assert abs(replay.schedule(loaded, 10.0)[-1] - 0.09) < 1e-9
+    assert replay.schedule(loaded, 0) == [0.0] * 11
+
+    app, state = make_app(delay=0.02)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+            started = time.perf_counter()
+            report = await replay.replay(loaded, client, speed=10.0, concurrency=2)
+            return report, time.perf_counter() - started
+
+    report, elapsed = asyncio.run(scenario())
+    assert elapsed >= 0.09 - 1e-3
+    assert state["max_inflight"] <= 2
+    items = report["routes"]["GET /item/{item_id}"]
+    assert items["count"] == 10 and items["errors"] == 0
+    assert items["p50_ms"] >= 20
+    broken = report["routes"]["POST /broken"]
+    assert broken["error_rate"] == 1.0 and broken["statuses"] == {"503": 1}
+    assert report["total"]["count"] == 11
+    assert "GET /item/{item_id}" in replay.format_report(report)
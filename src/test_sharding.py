@@ -0,0 +1,96 @@
+"""
+    Tests for sharded catalogue storage of ArticleGate Web-application
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from .app import main as articleGate
+from .app import startup
+from .app.models.base import BaseModel
+from .app.models.article import ArticleModel
+from .app.models.author import AuthorModel
+from .app.models.organisation import OrganisationModel
+from .app.models.article_to_author import ArticleToAuthorModel
+from .app.reshard import reshard
+from .app.sharding import ShardRouter, parse_mapping
+
+DOI = "10.1101/2025.04.16.649184"
+
+
+def make_router(tmp_path, names, prefixes=""):
+    """
+        Router over temporary SQLite shards
+    """
+    shards = ";".join(f"{name}=sqlite+aiosqlite:///{tmp_path / name}.sqlite3" for name in names)
+    return ShardRouter.from_config(shards, prefixes)
+
+
+async def fill(router):
+    """
+        Catalogue with one article of three authors from two organisations
+    """
+    await startup.bootstrap_schema(router.default.engine, BaseModel.metadata)
+    async with router.default.make_session() as session:
+        session.add_all([
+            OrganisationModel(id=0, title="LSTM", location="Liverpool, UK"),
+            OrganisationModel(id=1, title="CRID", location="Yaounde, Cameroon"),
+            ArticleModel(id=1, doi=DOI, title="Genetic mapping", posting_date="2025-04-22"),
+            ArticleModel(id=2, doi="10.5555/other", title="Other", posting_date="2025-01-01"),
+        ])
+        for author_id in range(3):
+            session.add(AuthorModel(id=author_id, name=f"Author {author_id}",
+                                    affiliation_org_id=author_id % 2))
+            session.add(ArticleToAuthorModel(article_id=1, author_id=author_id,
+                                             place=author_id + 1))
+        session.add(ArticleToAuthorModel(article_id=2, author_id=1, place=1))
+        await session.commit()
+
+
+def test_routing(tmp_path):
+    """
+        DOIs are routed by prefix, IDs by modulo
+    """
+    router = make_router(tmp_path, ["main", "biorxiv"], "10.1101=biorxiv")
+    assert router.shard_for_doi(DOI).name == "biorxiv"
+    assert router.shard_for_doi("10.1038/nature").name == "main"
+    assert router.shard_for_id(3).name == "biorxiv"
+    assert parse_mapping(" a=1 ; b=2;") == {"a": "1", "b": "2"}
+    with pytest.raises(ValueError):
+        parse_mapping("a")
+
+
+def test_reshard_and_cross_shard_reads(tmp_path, monkeypatch):
+    """
+        Rows are moved to their shards, reads fan out and merge results
+    """
+    source = make_router(tmp_path, ["main"])
+    target = make_router(tmp_path, ["main", "biorxiv"], "10.1101=biorxiv")
+    asyncio.run(fill(source))
+
+    moved = asyncio.run(reshard(source, target, batch_size=2))
+    assert moved["author: main -> biorxiv"] == 1
+    assert moved["article: main -> biorxiv"] == 1
+    assert moved["article_to_author: main -> biorxiv"] == 3
+    assert asyncio.run(reshard(source, target)) == {}
+    asyncio.run(source.dispose())
+
+    monkeypatch.setattr(articleGate, "shard_router", target)
+    client = TestClient(articleGate.app)
+
+    resp = client.get("/authors_of_article", params={"doi": DOI})
+    assert resp.status_code == 200
+    authors = resp.json()
+    assert [elem["place"] for elem in authors] == [1, 2, 3]
+    assert [elem["author_info"]["name"] for elem in authors] == [
+        "Author 0", "Author 1", "Author 2"
+    ]
+
+    resp = client.get("/articles_by_author", params={"id": 1})
+    assert sorted(elem["doi"] for elem in resp.json()) == ["10.1101/2025.04.16.649184",
+                                                          "10.5555/other"]
+    assert client.get("/author", params={"id": 1}).json()["name"] == "Author 1"
+    assert client.get("/org", params={"id": 1}).json()["title"] == "CRID"
+    assert client.get("/article", params={"doi": DOI}).json()["title"] == "Genetic mapping"
+    asyncio.run(target.dispose())
@@ -0,0 +1,88 @@
+"""
+    Tests for request coalescing of ArticleGate Web-application
+"""
+
+import asyncio
+
+import pytest
+from .app.singleflight import SingleFlight
+
+
+def test_shared_result():
+    """
+        Concurrent calls with the same key run the function once
+    """
+    async def scenario():
+        flight = SingleFlight()
+        executions = 0
+
+        async def fetch():
+            nonlocal executions
+            executions += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(10)))
+        assert results == ["result"] * 10
+        assert executions == 1
+        assert flight.snapshot()["shared"] == 9
+        assert len(flight) == 0
+
+        await flight.do("key", fetch)
+        assert executions == 2
+
+    asyncio.run(scenario())
+
+
+def test_shared_error():
+    """
+        Exception is raised in every caller and is not remembered
+    """
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("db failure")
+
+        results = await asyncio.gather(
+            *(flight.do("key", fail) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(res, ValueError) for res in results)
+        assert len(flight) == 0
+        assert flight.snapshot()["errors"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller():
+    """
+        Cancellation of one caller does not affect the others,
+        cancellation of the last caller stops the shared work
+    """
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def fetch():
+            started.set()
+            await asyncio.sleep(0.05)
+            return 42
+
+        first = asyncio.create_task(flight.do("key", fetch))
+        second = asyncio.create_task(flight.do("key", fetch))
+        await started.wait()
+        first.cancel()
+        assert await second == 42
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        lonely = asyncio.create_task(flight.do("other", fetch))
+        await asyncio.sleep(0.01)
+        lonely.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await lonely
+        await asyncio.sleep(0)
+        assert len(flight) == 0
+
+    asyncio.run(scenario())
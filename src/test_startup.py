@@ -0,0 +1,57 @@
+"""
+    Tests for start up routines of ArticleGate Web-application
+"""
+
+import asyncio
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from .app import startup
+from .app import main as articleGate
+from .app.models.base import BaseModel
+from .app.sharding import Shard, ShardRouter
+
+
+def test_bootstrap_schema(tmp_path):
+    """
+        DDL runs on the first start only, while schema marker matches
+    """
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'boot.sqlite3'}")
+        assert await startup.bootstrap_schema(engine, BaseModel.metadata)
+        assert not await startup.bootstrap_schema(engine, BaseModel.metadata)
+
+        async with engine.connect() as conn:
+            stored = (await conn.exec_driver_sql("PRAGMA user_version")).scalar()
+            tables = (await conn.exec_driver_sql(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'table'")).scalar()
+        assert stored == startup.schema_version(BaseModel.metadata)
+        assert tables == len(BaseModel.metadata.tables)
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_warm_up(tmp_path):
+    """
+        Warm-up runs hot reads on every requested connection
+    """
+    async def scenario():
+        router = ShardRouter([Shard("main", f"sqlite+aiosqlite:///{tmp_path / 'warm.sqlite3'}")])
+        engine = router.default.engine
+        await startup.bootstrap_schema(engine, BaseModel.metadata)
+        connections = set()
+
+        def remember(conn, *_):
+            connections.add(id(conn.connection.dbapi_connection))
+
+        event.listen(engine.sync_engine, "before_cursor_execute", remember)
+        await asyncio.gather(
+            startup.warm_up(router.session, articleGate.WARM_UP_READS, 3),
+            startup.prewarm_tables(router.default.make_session, BaseModel.metadata.sorted_tables),
+        )
+        assert len(connections) == 4
+        assert engine.pool.checkedin() == 4
+        await router.dispose()
+
+    asyncio.run(scenario())
@@ -6,20 +6,32 @@ CREATE TABLE IF NOT EXISTS author (
 );
 
 CREATE TABLE IF NOT EXISTS article (
-    doi TEXT PRIMARY KEY,
+    id INTEGER PRIMARY KEY,
+    doi TEXT NOT NULL UNIQUE,
     title TEXT NOT NULL,
     posting_date TEXT NOT NULL
 );
 
 CREATE TABLE IF NOT EXISTS article_to_author (
-    doi TEXT NOT NULL,
-    author_id INTEGER,
+    article_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
     place INTEGER NOT NULL CHECK (place > 0),
-    FOREIGN KEY (author_id) REFERENCES author (id)
-);
+    PRIMARY KEY (article_id, author_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS ix_article_to_author_author_id ON article_to_author (author_id);
 
 CREATE TABLE IF NOT EXISTS organisation (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     title TEXT NOT NULL,
     location TEXT
 );
+
+CREATE TABLE IF NOT EXISTS author_name_key (
+    author_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    norm_name TEXT NOT NULL,
+    block_key TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_author_name_key_block_key ON author_name_key (block_key);
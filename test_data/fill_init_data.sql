@@ -1,30 +1,36 @@
-INSERT INTO article (doi, title, posting_date) VALUES
+INSERT INTO article (id, doi, title, posting_date) VALUES
 (
+    1,
     "10.1101/2025.04.16.649184",
     "Genetic mapping of resistance: A QTL and associated polymorphism conferring resistance to alpha-cypermethrin in Anopheles funestus",
     "2025-04-22"
 ),
 (
+    2,
     "10.1101/2023.05.16.540925",
     "The contribution of an X chromosome QTL to non-Mendelian inheritance and unequal chromosomal segregation in A. freiburgense",
     "2023-08-26"
 ),
 (
+    3,
     "10.1101/2023.08.25.554687",
     "Overexpression and nonsynonymous mutations of UDP-glycosyltransferases potentially associated with pyrethroid resistance in Anopheles funestus",
     "2023-08-25"
 ),
 (
+    4,
     "10.1101/2022.03.21.485146",
     "Molecular drivers of insecticide resistance in the Sahelo-Sudanian populations of a major malaria vector Anopheles coluzzii",
     "2023-02-01"
 ),
 (
+    5,
     "10.1101/2021.11.25.470000",
     "Gene conversion explains elevated diversity in the immunity modulating APL1 gene of the malaria vector Anopheles funestus",
     "2021-11-25"
 ),
 (
+    6,
     "10.1101/2020.05.05.078600",
     "A 6.5kb intergenic structural variation enhances P450-mediated resistance to pyrethroids in malaria vectors lowering bed net efficacy",
     "2020-05-07"
@@ -230,245 +236,245 @@ INSERT INTO author (id, name, affiliation_org_id) VALUES
 
 -- ================================================================
 
--- Info about DOI 10.1101/2025.04.16.649184
-INSERT INTO article_to_author (doi, author_id, place) VALUES
+-- Info about DOI 10.1101/2025.04.16.649184 (article 1)
+INSERT INTO article_to_author (article_id, author_id, place) VALUES
 (
-    "10.1101/2025.04.16.649184",
+    1,
     0,
     1
 ),
 (
-    "10.1101/2025.04.16.649184",
+    1,
     1,
     2
 ),
 (
-    "10.1101/2025.04.16.649184",
+    1,
     2,
     3
 ),
 (
-    "10.1101/2025.04.16.649184",
+    1,
     3,
     4
 ),
 (
-    "10.1101/2025.04.16.649184",
+    1,
     4,
     5
 ),
 (
-    "10.1101/2025.04.16.649184",
+    1,
     5,
     6
 );
 
--- Info about DOI 10.1101/2023.05.16.540925
-INSERT INTO article_to_author (doi, author_id, place) VALUES
+-- Info about DOI 10.1101/2023.05.16.540925 (article 2)
+INSERT INTO article_to_author (article_id, author_id, place) VALUES
 (
-    "10.1101/2023.05.16.540925",
+    2,
     0,
     1
 ),
 (
-    "10.1101/2023.05.16.540925",
+    2,
     6,
     2
 ),
 (
-    "10.1101/2023.05.16.540925",
+    2,
     7,
     3
 ),
 (
-    "10.1101/2023.05.16.540925",
+    2,
     8,
     4
 ),
 (
-    "10.1101/2023.05.16.540925",
+    2,
     9,
     5
 ),
 (
-    "10.1101/2023.05.16.540925",
+    2,
     10,
     6
 ),
 (
-    "10.1101/2023.05.16.540925",
+    2,
     11,
     6
 );
 
--- Info about DOI 10.1101/2023.08.25.554687
-INSERT INTO article_to_author (doi, author_id, place) VALUES
+-- Info about DOI 10.1101/2023.08.25.554687 (article 3)
+INSERT INTO article_to_author (article_id, author_id, place) VALUES
 (
-    "10.1101/2023.08.25.554687",
+    3,
     0,
     1
 ),
 (
-    "10.1101/2023.08.25.554687",
+    3,
     3,
     2
 ),
 (
-    "10.1101/2023.08.25.554687",
+    3,
     12,
     3
 ),
 (
-    "10.1101/2023.08.25.554687",
+    3,
     13,
     4
 ),
 (
-    "10.1101/2023.08.25.554687",
+    3,
     4,
     5
 ),
 (
-    "10.1101/2023.08.25.554687",
+    3,
     5,
     6
 );
 
--- Info about DOI 10.1101/2022.03.21.485146
-INSERT INTO article_to_author (doi, author_id, place) VALUES
+-- Info about DOI 10.1101/2022.03.21.485146 (article 4)
+INSERT INTO article_to_author (article_id, author_id, place) VALUES
 (
-    "10.1101/2022.03.21.485146",
+    4,
     14,
     1
 ),
 (
-    "10.1101/2022.03.21.485146",
+    4,
     3,
     2
 ),
 (
-    "10.1101/2022.03.21.485146",
+    4,
     4,
     3
 ),
 (
-    "10.1101/2022.03.21.485146",
+    4,
     15,
     4
 ),
 (
-    "10.1101/2022.03.21.485146",
+    4,
     16,
     5
 ),
 (
-    "10.1101/2022.03.21.485146",
+    4,
     17,
     6
 ),
 (
-    "10.1101/2022.03.21.485146",
+    4,
     18,
     7
 ),
 (
-    "10.1101/2022.03.21.485146",
+    4,
     19,
     8
 ),
 (
-    "10.1101/2022.03.21.485146",
+    4,
     20,
     9
 ),
 (
-    "10.1101/2022.03.21.485146",
+    4,
     5,
     10
 );
 
--- Info about DOI 10.1101/2021.11.25.470000
-INSERT INTO article_to_author (doi, author_id, place) VALUES
+-- Info about DOI 10.1101/2021.11.25.470000 (article 5)
+INSERT INTO article_to_author (article_id, author_id, place) VALUES
 (
-    "10.1101/2021.11.25.470000",
+    5,
     4,
     1
 ),
 (
-    "10.1101/2021.11.25.470000",
+    5,
     21,
     2
 ),
 (
-    "10.1101/2021.11.25.470000",
+    5,
     12,
     3
 ),
 (
-    "10.1101/2021.11.25.470000",
+    5,
     15,
     4
 ),
 (
-    "10.1101/2021.11.25.470000",
+    5,
     5,
     5
 );
 
--- Info about DOi 10.1101/2020.05.05.078600
-INSERT INTO article_to_author (doi, author_id, place) VALUES
+-- Info about DOI 10.1101/2020.05.05.078600 (article 6)
+INSERT INTO article_to_author (article_id, author_id, place) VALUES
 (
-    "10.1101/2020.05.05.078600",
+    6,
     19,
     1
 ),
 (
-    "10.1101/2020.05.05.078600",
+    6,
     22,
     2
 ),
 (
-    "10.1101/2020.05.05.078600",
+    6,
     23,
     3
 ),
 (
-    "10.1101/2020.05.05.078600",
+    6,
     24,
     4
 ),
 (
-    "10.1101/2020.05.05.078600",
+    6,
     12,
     5
 ),
 (
-    "10.1101/2020.05.05.078600",
+    6,
     25,
     6
 ),
 (
-    "10.1101/2020.05.05.078600",
+    6,
     4,
     7
 ),
 (
-    "10.1101/2020.05.05.078600",
+    6,
     15,
     8
 ),
 (
-    "10.1101/2020.05.05.078600",
+    6,
     21,
     9
 ),
 (
-    "10.1101/2020.05.05.078600",
+    6,
     26,
     10
 ),
 (
-    "10.1101/2020.05.05.078600",
+    6,
     5,
     11
 );